@@ -1,3 +1,12 @@
 from .rivian_api import Rivian
+from .rivian_state import VehicleState
 
-__all__ = ["Rivian"]
\ No newline at end of file
+__all__ = ["Rivian", "AsyncRivian", "VehicleState"]
+
+
+def __getattr__(name):
+    # AsyncRivian needs aiohttp, only import it when asked for
+    if name == "AsyncRivian":
+        from .rivian_async import AsyncRivian
+        return AsyncRivian
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,7 +1,35 @@
+import base64
+import json
 import logging
 import requests
+import threading
 import uuid
 import time
+from http.cookiejar import DefaultCookiePolicy
+from types import MappingProxyType
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError
+
+try:
+    from . import rivian_queries as queries
+    from .rivian_batch import merge_results, plan_batches
+    from .rivian_cache import account_key
+    from .rivian_limit import RATE_LIMIT_CODES, RATE_LIMIT_STATUS
+    from .rivian_metrics import error_codes
+    from .rivian_retry import classify, retryable
+    from .rivian_state import VehicleState
+    from .rivian_timeout import DEFAULT_TIMEOUT, DeadlineExceeded, current_deadline, track_connection
+except ImportError:
+    import rivian_queries as queries
+    from rivian_batch import merge_results, plan_batches
+    from rivian_cache import account_key
+    from rivian_limit import RATE_LIMIT_CODES, RATE_LIMIT_STATUS
+    from rivian_metrics import error_codes
+    from rivian_retry import classify, retryable
+    from rivian_state import VehicleState
+    from rivian_timeout import DEFAULT_TIMEOUT, DeadlineExceeded, current_deadline, track_connection
 
 RIVIAN_BASE_PATH = "https://rivian.com/api/gql"
 RIVIAN_GATEWAY_PATH = RIVIAN_BASE_PATH + "/gateway/graphql"
@@ -10,52 +38,385 @@ RIVIAN_ORDERS_PATH = RIVIAN_BASE_PATH + '/orders/graphql'
 RIVIAN_CONTENT_PATH = RIVIAN_BASE_PATH + '/content/graphql'
 RIVIAN_TRANSACTIONS_PATH = RIVIAN_BASE_PATH + '/t2d/graphql'
 
+# Endpoint name -> path below the base path, each gets its own connection pool
+ENDPOINT_PATHS = {
+    'gateway': '/gateway/graphql',
+    'chrg': '/chrg/user/graphql',
+    'orders': '/orders/graphql',
+    'content': '/content/graphql',
+    't2d': '/t2d/graphql',
+}
+DEFAULT_POOL_SIZE = 10
+
+# CSRF/app session tokens are reused until this age, or until the server rejects them
+CSRF_TOKEN_LIFETIME = 24 * 60 * 60
+CSRF_REJECTED_STATUS = (401, 403)
+CSRF_REJECTED_CODES = ('UNAUTHENTICATED', 'BAD_CURRENT_USER_SESSION', 'INVALID_CSRF_TOKEN')
+# Never replayed on a rejected handshake (retrying a login could count against the account)
+CSRF_NO_RETRY_OPERATIONS = ('CreateCSRFToken', 'Login', 'LoginWithOTP')
+# Access tokens are refreshed this long before they expire, a failed refresh is tried again after the delay
+ACCESS_TOKEN_REFRESH_MARGIN = 5 * 60
+ACCESS_TOKEN_REFRESH_RETRY = 60
+# Never answered by refreshing the access token (they don't use it or would refresh it themselves)
+TOKEN_NO_REFRESH_OPERATIONS = CSRF_NO_RETRY_OPERATIONS + ('RefreshToken',)
+
+# Automatic persisted query errors (Apollo codes and messages), see persisted_queries
+PERSISTED_QUERY_NOT_FOUND = ('PERSISTED_QUERY_NOT_FOUND', 'PersistedQueryNotFound')
+PERSISTED_QUERY_NOT_SUPPORTED = ('PERSISTED_QUERY_NOT_SUPPORTED', 'PersistedQueryNotSupported')
+
 log = logging.getLogger(__name__)
 
-HEADERS = {
+# Read only, each client builds its own headers from a copy
+HEADERS = MappingProxyType({
     "User-Agent": "RivianApp/1304 CFNetwork/1404.0.5 Darwin/22.3.0",
     "Accept": "application/json",
     "Content-Type": "application/json",
     "Apollographql-Client-Name": "com.rivian.ios.consumer-apollo-ios",
-}
+})
+
+
+def token_expiry(token):
+    # exp claim of a JWT access token (not verified, only used to plan refreshes), None for other tokens
+    try:
+        payload = token.split('.')[1]
+        return float(json.loads(base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4)))['exp'])
+    except (AttributeError, IndexError, KeyError, TypeError, ValueError):
+        return None
+
+
+def connection_failed(error):
+    # Whether a requests error means no connection was made, so nothing was sent (NewConnectionError and
+    # name resolution failures are ConnectTimeoutErrors too)
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], 'reason', None) if error.args else None
+    return isinstance(error, requests.ConnectionError) and isinstance(reason, ConnectTimeoutError)
+
+
+# Connections a Deadline can shut down while their request is in flight, see rivian_timeout.track_connection
+class CancellableHTTPConnection(HTTPConnection):
+    deadline = None
+
+    def request(self, *args, **kwargs):
+        # Owned by the current request's deadline (or none) until the next request takes over
+        self.deadline = None
+        self.deadline = track_connection(self)
+        return super().request(*args, **kwargs)
+
+
+class CancellableHTTPSConnection(CancellableHTTPConnection, HTTPSConnection):
+    pass
+
+
+class CancellableHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = CancellableHTTPConnection
+
+
+class CancellableHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = CancellableHTTPSConnection
+
+
+class CancellableAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': CancellableHTTPConnectionPool,
+            'https': CancellableHTTPSConnectionPool,
+        }
 
 
-class Rivian:
-    def __init__(self):
-        self._close_session = False
+def create_session(pool_size=DEFAULT_POOL_SIZE, pool_sizes=None, base_path=RIVIAN_BASE_PATH):
+    # Keep-alive session with one pool per endpoint, pool_sizes overrides pool_size by endpoint name
+    pool_sizes = pool_sizes or {}
+    session = requests.Session()
+    # Auth is carried in headers, never let the server pin cookies on a (possibly shared) session
+    session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+    for endpoint, path in ENDPOINT_PATHS.items():
+        size = pool_sizes.get(endpoint, pool_size)
+        session.mount(base_path + path, CancellableAdapter(pool_connections=1, pool_maxsize=size))
+    return session
+
+
+class RivianBase:
+    # Token state, headers and response handling shared by Rivian and AsyncRivian, no I/O here
+    def __init__(self, base_url=RIVIAN_BASE_PATH, persisted_queries=False, metrics=None, rate_limiter=None,
+                 retry_policy=None, circuit_breaker=None, timeout=DEFAULT_TIMEOUT, timeouts=None, cache=None,
+                 headers=None, account=None):
+        self.base_url = base_url
+        # Headers every request starts from (HEADERS plus overrides), never changed after this
+        self.headers = MappingProxyType(dict(HEADERS, **(headers or {})))
+        # rivian_metrics.Metrics recording every request, None to not record anything
+        self.metrics = metrics
+        # rivian_limit.RateLimiter every request waits on, share one between objects using the same account
+        self.rate_limiter = rate_limiter
+        # rivian_retry.RetryPolicy for failed requests and a CircuitBreaker (can be shared by many objects)
+        self.retry_policy = retry_policy
+        self.circuit_breaker = circuit_breaker
+        # rivian_cache.ResponseCache for slow changing account data, shared by objects with the same account
+        # (a name or username, login sets it). Without one the first user session token stands in for it.
+        self.cache = cache
+        self.account = account
+        self._cache_identity = ""
+        # Send query hashes instead of full documents, endpoints that turn out not to support it
+        # go back to sending the documents
+        self.persisted_queries = persisted_queries
+        self._persisted_unsupported = set()
         self._session_token = ""
         self._access_token = ""
         self._refresh_token = ""
         self._app_session_token = ""
         self._user_session_token = ""
+        # When the access token expires (0 when unknown) and when a failed refresh may be tried again
+        self._access_expires_at = 0
+        self._refresh_retry_at = 0
         self.client_id = ""
         self.client_secret = ""
-        self.request_timeout = ""
+        # (connect, read) seconds for every request, timeouts overrides it by endpoint name
+        self.request_timeout = timeout
+        self.timeouts = timeouts or {}
         self._csrf_token = ""
+        self._csrf_expires_at = 0
+
+        # Called with this object whenever tokens change so callers can persist them
+        self.token_callback = None
+        # Called with this object before its access token is refreshed, returns True after setting newer
+        # tokens itself (e.g. ones another process already refreshed, see rivian_credentials.attach)
+        self.refresh_callback = None
 
         self.otp_needed = False
         self._otp_token = ""
 
-    def login(self, username, password):
-        self.create_csrf_token()
-        url = RIVIAN_GATEWAY_PATH
-        headers = HEADERS
+    def endpoint_url(self, endpoint):
+        return self.base_url + ENDPOINT_PATHS[endpoint]
+
+    def endpoint_name(self, url):
+        for endpoint, path in ENDPOINT_PATHS.items():
+            if url.endswith(path):
+                return endpoint
+        return url
+
+    def record_request(self, url, query, response, latency, request_bytes=None):
+        if request_bytes is None:
+            request_bytes = len(json.dumps(query).encode())
+        content = response.content or b''
+        self.metrics.observe(query.get('operationName'), self.endpoint_name(url), latency, request_bytes,
+                             len(content), response.status_code, error_codes(content))
+
+    def rate_limited(self, response):
+        if response.status_code in RATE_LIMIT_STATUS:
+            return True
+        return any(code in RATE_LIMIT_CODES for code in error_codes(response.content or b''))
+
+    def check_rate_limit(self, response):
+        if self.rate_limited(response):
+            log.warning("Rate limited by Rivian, slowing down")
+            self.rate_limiter.limited()
+
+    def cached_response(self, operation):
+        if self.cache is None or not self.cache.cacheable(operation.query.get("operationName")):
+            return None
+        return self.cache.get(self.cache_account(), operation.query)
+
+    def cache_response(self, operation, response):
+        if self.cache is not None and self.cache.cacheable(operation.query.get("operationName")):
+            self.cache.put(self.cache_account(), operation.query, response)
+
+    def cache_account(self):
+        # Same before and after token refreshes
+        return account_key(self.account or self._cache_identity)
+
+    def before_attempt(self):
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.before_request()
+
+    def check_deadline(self, error):
+        # A request that failed because its Deadline ran out or was cancelled raises that instead
+        deadline = current_deadline()
+        if deadline is not None:
+            try:
+                deadline.check()
+            except DeadlineExceeded as e:
+                raise e from error
+
+    def timeout_for(self, url):
+        # Request timeout for this endpoint, capped by the enclosing Deadline
+        timeout = self.timeouts.get(self.endpoint_name(url), self.request_timeout)
+        if not isinstance(timeout, tuple):
+            timeout = (timeout, timeout)
+        deadline = current_deadline()
+        return deadline.limit(timeout) if deadline is not None else timeout
+
+    def after_attempt(self, query, attempt, started, response=None, error=None, sent=True):
+        # Delay before retrying this attempt, None when it's done (succeeded or given up on). sent is False
+        # when the request failed before it was sent.
+        kind = classify(response, error)
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.record(kind)
+        if kind is None or self.retry_policy is None:
+            return None
+        if not retryable(queries.repeatable(query), kind, sent):
+            log.warning(f"{query.get('operationName')} failed ({kind}) and may have reached Rivian, not retrying")
+            return None
+        delay = self.retry_policy.next_delay(kind, attempt, started)
+        deadline = current_deadline()
+        if delay is not None and deadline is not None and not deadline.allows(delay):
+            # No time left for another attempt
+            if error is not None:
+                raise DeadlineExceeded(f"Operation deadline exceeded: {error}") from error
+            return None
+        if delay is not None:
+            log.info(f"{query.get('operationName')} failed ({kind}), retrying in {delay:.1f} seconds")
+        return delay
+
+    def csrf_expired(self):
+        return not self._csrf_token or time.time() >= self._csrf_expires_at
+
+    # Header builders return a new dict each time, callers may change it
+    def login_headers(self):
+        return {
+            **self.headers,
+            "Csrf-Token": self._csrf_token,
+            "A-Sess": self._app_session_token,
+            "Apollographql-Client-Name": "com.rivian.ios.consumer-apollo-ios",
+            "Dc-Cid": f"m-ios-{uuid.uuid4()}",
+        }
+
+    def gateway_headers(self):
+        return {
+            **self.headers,
+            "Csrf-Token": self._csrf_token,
+            "A-Sess": self._app_session_token,
+            "U-Sess": self._user_session_token,
+            "Dc-Cid": f"m-ios-{uuid.uuid4()}",
+        }
+
+    def transaction_headers(self):
+        headers = self.gateway_headers()
         headers.update(
             {
-                "Csrf-Token": self._csrf_token,
-                "A-Sess": self._app_session_token,
-                "Apollographql-Client-Name": "com.rivian.ios.consumer-apollo-ios",
-                "Dc-Cid": f"m-ios-{uuid.uuid4()}",
+                "dc-cid": f"t2d--{uuid.uuid4()}--{uuid.uuid4()}",
+                "csrf-token": self._csrf_token,
+                "app-id": "t2d"
             }
         )
+        return headers
 
-        query = {
-            "operationName": "Login",
-            "query": "mutation Login($email: String!, $password: String!) {\n  login(email: $email, password: $password) {\n    __typename\n    ... on MobileLoginResponse {\n      __typename\n      accessToken\n      refreshToken\n      userSessionToken\n    }\n    ... on MobileMFALoginResponse {\n      __typename\n      otpToken\n    }\n  }\n}",
-            "variables": {"email": username, "password": password},
-        }
-
-        response = self.raw_graphql_query(url=url, query=query, headers=headers)
+    def headers_for(self, kind):
+        if kind == queries.GATEWAY_HEADERS:
+            return self.gateway_headers()
+        if kind == queries.TRANSACTION_HEADERS:
+            return self.transaction_headers()
+        if kind == queries.LOGIN_HEADERS:
+            return self.login_headers()
+        return dict(self.headers)
+
+    def update_csrf_headers(self, headers):
+        headers.update({"Csrf-Token": self._csrf_token, "A-Sess": self._app_session_token})
+        if "csrf-token" in headers:
+            headers["csrf-token"] = self._csrf_token
+
+    def csrf_rejected(self, response):
+        if response.status_code in CSRF_REJECTED_STATUS:
+            return True
+        try:
+            errors = response.json().get('errors') or []
+        except ValueError:
+            return False
+        for e in errors:
+            if (e.get('extensions') or {}).get('code') in CSRF_REJECTED_CODES:
+                return True
+        return False
+
+    def should_retry_csrf(self, query, headers, response):
+        return bool(headers.get("Csrf-Token")) and \
+            query.get("operationName") not in CSRF_NO_RETRY_OPERATIONS and \
+            self.csrf_rejected(response)
+
+    def use_persisted_query(self, operation):
+        return self.persisted_queries and operation.endpoint not in self._persisted_unsupported
+
+    def persisted_query_missed(self, operation, response):
+        # True when a hash only request wasn't run and has to be resent with the document
+        try:
+            response_json = response.json()
+        except ValueError:
+            response_json = None
+        if not isinstance(response_json, dict):
+            response_json = {}
+        # Servers without APQ typically reject a request without a document outright
+        unsupported = response.status_code == 400 and not response_json.get('data')
+        for e in response_json.get('errors') or []:
+            reason = (e.get('extensions') or {}).get('code') or e.get('message')
+            if reason in PERSISTED_QUERY_NOT_FOUND:
+                return True
+            if reason in PERSISTED_QUERY_NOT_SUPPORTED:
+                unsupported = True
+        if unsupported:
+            log.info(f"Persisted queries not supported on {operation.endpoint}, sending documents")
+            self._persisted_unsupported.add(operation.endpoint)
+        return unsupported
+
+    def apply_csrf(self, response):
+        response_json = response.json()
+        csrf_data = response_json["data"]["createCsrfToken"]
+        self._csrf_token = csrf_data["csrfToken"]
+        self._app_session_token = csrf_data["appSessionToken"]
+        self._csrf_expires_at = time.time() + CSRF_TOKEN_LIFETIME
+        if self.token_callback:
+            self.token_callback(self)
+
+    def set_tokens(self, access_token, refresh_token, user_session_token):
+        self._access_token = access_token
+        self._refresh_token = refresh_token
+        self._user_session_token = user_session_token
+        self._access_expires_at = token_expiry(access_token) or 0
+        self._refresh_retry_at = 0
+        # New tokens could be another account's, refreshed ones keep the identity (see apply_refresh)
+        self._cache_identity = user_session_token
+
+    def access_token_expiring(self):
+        # Whether to refresh before the next request: the access token expires soon (or did already)
+        now = time.time()
+        return bool(self._refresh_token) and bool(self._access_expires_at) and \
+            now >= self._access_expires_at - ACCESS_TOKEN_REFRESH_MARGIN and now >= self._refresh_retry_at
+
+    def should_refresh_access(self, query, headers, response):
+        # A session rejected even with a fresh handshake, the access token may have run out early
+        return bool(self._refresh_token) and bool(headers.get("U-Sess")) and \
+            query.get("operationName") not in TOKEN_NO_REFRESH_OPERATIONS and \
+            self.csrf_rejected(response)
+
+    def update_session_headers(self, headers):
+        headers["U-Sess"] = self._user_session_token
+
+    def refreshed_elsewhere(self):
+        # Whether refresh_callback supplied tokens that make refreshing unnecessary
+        if self.refresh_callback is None or not self.refresh_callback(self):
+            return False
+        log.info("Using access token refreshed elsewhere")
+        return not self.access_token_expiring()
+
+    def refresh_failed(self, error):
+        log.warning(f"Access token refresh failed, trying again in {ACCESS_TOKEN_REFRESH_RETRY} seconds: {error}")
+        self._refresh_retry_at = time.time() + ACCESS_TOKEN_REFRESH_RETRY
+
+    def apply_refresh(self, response):
+        response_json = response.json()
+        data = response_json.get("data") or {}
+        if response.status_code != 200 or not data.get("refreshToken"):
+            raise Exception(f"Status: {response.status_code}: Details: {response_json}")
+        refresh_data = data["refreshToken"]
+        identity = self._cache_identity
+        # Whatever the response leaves out stays as it is
+        self.set_tokens(refresh_data.get("accessToken") or self._access_token,
+                        refresh_data.get("refreshToken") or self._refresh_token,
+                        refresh_data.get("userSessionToken") or self._user_session_token)
+        self._cache_identity = identity
+        log.info("Access token refreshed")
+        if self.token_callback:
+            self.token_callback(self)
+
+    def apply_login(self, response, username=None):
         response_json = response.json()
         if response.status_code == 200 and response_json["data"] and "login" in response_json["data"]:
             login_data = response_json["data"]["login"]
@@ -63,591 +424,307 @@ class Rivian:
                 self.otp_needed = True
                 self._otp_token = login_data["otpToken"]
             else:
-                self._access_token = login_data["accessToken"]
-                self._refresh_token = login_data["refreshToken"]
-                self._user_session_token = login_data["userSessionToken"]
+                self.set_tokens(login_data["accessToken"], login_data["refreshToken"], login_data["userSessionToken"])
+                self.account = self.account or username
         else:
             message = f"Status: {response.status_code}: Details: {response_json}"
             print(f"Login failed: {message}")
             raise Exception(message)
-        return response
-
-    def login_with_otp(self, username, otpCode, otpToken=None):
-        if self._csrf_token == "":
-            self.create_csrf_token()
-        url = RIVIAN_GATEWAY_PATH
-        headers = HEADERS
-        headers.update(
-            {
-                "Csrf-Token": self._csrf_token,
-                "A-Sess": self._app_session_token,
-                "Apollographql-Client-Name": "com.rivian.ios.consumer-apollo-ios",
-            }
-        )
 
-        query = {
-            "operationName": "LoginWithOTP",
-            "query": "mutation LoginWithOTP($email: String!, $otpCode: String!, $otpToken: String!) {\n  loginWithOTP(email: $email, otpCode: $otpCode, otpToken: $otpToken) {\n    __typename\n    ... on MobileLoginResponse {\n      __typename\n      accessToken\n      refreshToken\n      userSessionToken\n    }\n  }\n}",
-            "variables": {
-                "email": username,
-                "otpCode": otpCode,
-                "otpToken": otpToken or self._otp_token,
-            },
-        }
-
-        response = self.raw_graphql_query(url=url, query=query, headers=headers)
+    def apply_login_with_otp(self, response, username=None):
         response_json = response.json()
         if response.status_code == 200 and response_json["data"] and "loginWithOTP" in response_json["data"]:
             login_data = response_json["data"]["loginWithOTP"]
-            self._access_token = login_data["accessToken"]
-            self._refresh_token = login_data["refreshToken"]
-            self._user_session_token = login_data["userSessionToken"]
+            self.set_tokens(login_data["accessToken"], login_data["refreshToken"], login_data["userSessionToken"])
+            self.account = self.account or username
         else:
             message = f"Status: {response.status_code}: Details: {response_json}"
             print(f"Login with otp failed: {message}")
             raise Exception(message)
+
+
+class Rivian(RivianBase):
+    def __init__(self, pool_size=DEFAULT_POOL_SIZE, pool_sizes=None, session=None, base_url=RIVIAN_BASE_PATH,
+                 persisted_queries=False, metrics=None, rate_limiter=None, retry_policy=None, circuit_breaker=None,
+                 timeout=DEFAULT_TIMEOUT, timeouts=None, cache=None, headers=None, account=None):
+        super().__init__(base_url=base_url, persisted_queries=persisted_queries, metrics=metrics,
+                         rate_limiter=rate_limiter, retry_policy=retry_policy, circuit_breaker=circuit_breaker,
+                         timeout=timeout, timeouts=timeouts, cache=cache, headers=headers, account=account)
+        if session is None:
+            session = create_session(pool_size=pool_size, pool_sizes=pool_sizes, base_path=base_url)
+            self._close_session = True
+        else:
+            self._close_session = False
+        self._session = session
+        self._csrf_lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+
+    def close(self):
+        if self._close_session:
+            self._session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def login(self, username, password):
+        self.create_csrf_token()
+        response = self.execute(queries.login(username, password))
+        self.apply_login(response, username)
+        return response
+
+    def login_with_otp(self, username, otpCode, otpToken=None):
+        self.ensure_csrf_token()
+        response = self.execute(queries.login_with_otp(username, otpCode, otpToken or self._otp_token))
+        self.apply_login_with_otp(response, username)
         return response
 
     def create_csrf_token(self):
-        url = RIVIAN_GATEWAY_PATH
-        headers = HEADERS
+        response = self.execute(queries.create_csrf_token())
+        self.apply_csrf(response)
+        return response
 
-        query = {
-            "operationName": "CreateCSRFToken",
-            "query": "mutation CreateCSRFToken {createCsrfToken {__typename csrfToken appSessionToken}}",
-            "variables": None,
-        }
+    def ensure_csrf_token(self):
+        if not self.csrf_expired():
+            return
+        # Concurrent callers wait for one handshake instead of each minting a token
+        with self._csrf_lock:
+            if self.csrf_expired():
+                self.create_csrf_token()
+
+    def refresh_access_token(self):
+        # The RefreshToken response, None when refresh_callback had newer tokens
+        if self.refreshed_elsewhere():
+            return None
+        response = self.execute(queries.refresh_token(self._refresh_token))
+        self.apply_refresh(response)
+        return response
 
-        response = self.raw_graphql_query(url=url, query=query, headers=headers)
-        response_json = response.json()
-        csrf_data = response_json["data"]["createCsrfToken"]
-        self._csrf_token = csrf_data["csrfToken"]
-        self._app_session_token = csrf_data["appSessionToken"]
+    def ensure_access_token(self, rejected=None):
+        # Refreshes the access token ahead of its expiry, or once a request sent with the user session
+        # token `rejected` was turned away. Concurrent callers wait for one refresh instead of each
+        # spending the refresh token. True when the session changed since.
+        if rejected is None and not self.access_token_expiring():
+            return False
+        with self._refresh_lock:
+            if rejected is None:
+                # Someone else may have refreshed it while this caller waited for the lock
+                if not self.access_token_expiring():
+                    return False
+            else:
+                if rejected != self._user_session_token:
+                    # Someone else refreshed it while this request was in flight
+                    return True
+                if time.time() < self._refresh_retry_at:
+                    # A refresh failed moments ago, don't try again yet
+                    return False
+            session = self._user_session_token
+            try:
+                self.refresh_access_token()
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                # The current tokens may still work for a while, requests go on with them
+                self.refresh_failed(e)
+                return False
+            return session != self._user_session_token or rejected is not None
+
+    def post(self, url, query, headers):
+        # One request, retried as the retry policy says
+        started = self.retry_policy.clock() if self.retry_policy else 0
+        attempt = 0
+        while True:
+            attempt += 1
+            self.before_attempt()
+            response = error = None
+            try:
+                response = self.send(url, query, headers)
+            except requests.RequestException as e:
+                error = e
+            delay = self.after_attempt(query, attempt, started, response, error,
+                                       sent=error is None or not connection_failed(error))
+            if delay is None:
+                if error is not None:
+                    self.check_deadline(error)
+                    raise error
+                return response
+            self.pause(delay, self.retry_policy.sleep)
+
+    def pause(self, seconds, sleep):
+        # Waits that a Deadline can cut short
+        deadline = current_deadline()
+        if deadline is not None:
+            deadline.wait(seconds)
+        else:
+            sleep(seconds)
+
+    def send(self, url, query, headers):
+        if self.rate_limiter is not None:
+            delay = self.rate_limiter.reserve()
+            if delay > 0:
+                self.pause(delay, self.rate_limiter.sleep)
+        timeout = self.timeout_for(url)
+        deadline = current_deadline()
+        start = time.perf_counter()
+        if deadline is not None:
+            # cancel() from another thread shuts the connection down instead of waiting for the read timeout
+            with deadline.cancelling():
+                response = self._session.post(url, json=query, headers=headers, timeout=timeout)
+        else:
+            response = self._session.post(url, json=query, headers=headers, timeout=timeout)
+        if self.metrics is not None:
+            # Size of the body as sent when requests kept the prepared request
+            body = getattr(getattr(response, 'request', None), 'body', None)
+            self.record_request(url, query, response, time.perf_counter() - start,
+                                len(body) if body is not None else None)
+        if self.rate_limiter is not None:
+            self.check_rate_limit(response)
         return response
 
     def raw_graphql_query(self, url, query, headers):
-        response = requests.post(url, json=query, headers=headers)
+        response = self.post(url, query, headers)
+        if self.should_retry_csrf(query, headers, response):
+            # Cached handshake went stale server side, mint a new one and retry once
+            log.info("CSRF token rejected, creating a new one")
+            self.create_csrf_token()
+            self.update_csrf_headers(headers)
+            response = self.post(url, query, headers)
+        if self.should_refresh_access(query, headers, response) and self.ensure_access_token(headers["U-Sess"]):
+            log.info("Session rejected, retrying with refreshed tokens")
+            self.update_session_headers(headers)
+            response = self.post(url, query, headers)
         if response.status_code != 200:
             log.warning(f"Graphql error: Response status: {response.status_code} Reason: {response.reason}")
         return response
 
     def gateway_headers(self):
-        headers = HEADERS
-        headers.update(
-            {
-                "Csrf-Token": self._csrf_token,
-                "A-Sess": self._app_session_token,
-                "U-Sess": self._user_session_token,
-                "Dc-Cid": f"m-ios-{uuid.uuid4()}",
-            }
-        )
-        return headers
+        self.ensure_access_token()
+        self.ensure_csrf_token()
+        return super().gateway_headers()
+
+    def execute(self, operation):
+        cached = self.cached_response(operation)
+        if cached is not None:
+            return cached
+        response = self.send_operation(operation)
+        self.cache_response(operation, response)
+        return response
 
-    def transaction_headers(self):
-        headers = self.gateway_headers()
-        headers.update(
-            {
-                "dc-cid": f"t2d--{uuid.uuid4()}--{uuid.uuid4()}",
-                "csrf-token": self._csrf_token,
-                "app-id": "t2d"
-            }
-        )
-        return headers
+    def send_operation(self, operation):
+        headers = self.headers_for(operation.headers)
+        url = self.endpoint_url(operation.endpoint)
+        query = operation.query
+        if self.use_persisted_query(operation):
+            hashed, query = queries.persisted_request(operation.query)
+            response = self.raw_graphql_query(url=url, query=hashed, headers=headers)
+            if not self.persisted_query_missed(operation, response):
+                return response
+            if not self.use_persisted_query(operation):
+                # Servers without APQ reject the extension even next to the document
+                query = operation.query
+        return self.raw_graphql_query(url=url, query=query, headers=headers)
+
+    def batch(self, operations):
+        # Runs rivian_queries operations merging compatible ones into a single request,
+        # returns the decoded response for each operation in order
+        batches = plan_batches(operations)
+        responses = [self.execute(b.operation()).json() for b in batches]
+        return merge_results(batches, responses, len(operations))
 
     def vehicle_orders(self):
-        headers = self.gateway_headers()
-        query = {
-            "operationName": "vehicleOrders",
-            "query": "query vehicleOrders { orders(input: {orderTypes: [PRE_ORDER, VEHICLE], pageInfo: {from: 0, size: 10000}}) { __typename data { __typename id orderDate state configurationStatus fulfillmentSummaryStatus items { __typename sku } consumerStatuses { __typename isConsumerFlowComplete } } } }",
-            "variables": {},
-        }
-        response = self.raw_graphql_query(url=RIVIAN_GATEWAY_PATH, query=query, headers=headers)
-        return response.json()
+        return self.execute(queries.vehicle_orders()).json()
 
     def delivery(self, order_id):
-        headers = self.gateway_headers()
-        query = {
-            "operationName": "delivery",
-            "query": "query delivery($orderId: ID!) { delivery(orderId: $orderId) { __typename status carrier deliveryAddress { __typename addressLine1 addressLine2 city state country zipcode } appointmentDetails { __typename appointmentId startDateTime endDateTime timeZone } vehicleVIN } }",
-            "variables": {
-                "orderId": order_id,
-            },
-        }
-        response = self.raw_graphql_query(url=RIVIAN_GATEWAY_PATH, query=query, headers=headers)
-        return response.json()
+        return self.execute(queries.delivery(order_id)).json()
 
     def transaction_status(self, order_id):
-        headers = self.transaction_headers()
-        query = {
-            "operationName": "transactionStatus",
-            "query": "query transactionStatus($orderId: ID!) { transactionStatus(orderId: $orderId) { titleAndReg { sourceStatus { status details } consumerStatus { displayOrder current complete locked inProgress notStarted error } } tradeIn { sourceStatus { status details } consumerStatus { displayOrder current complete locked inProgress notStarted error } } finance { sourceStatus { status details } consumerStatus { displayOrder current complete locked inProgress notStarted error } } delivery { sourceStatus { status details } consumerStatus { displayOrder current complete locked inProgress notStarted error } } insurance { sourceStatus { status details } consumerStatus { displayOrder current complete locked inProgress notStarted error } } documentUpload { sourceStatus { status details } consumerStatus { displayOrder current complete locked inProgress notStarted error } } contracts { sourceStatus { status details } consumerStatus { displayOrder current complete locked inProgress notStarted error } } payment { sourceStatus { status details } consumerStatus { displayOrder current complete locked inProgress notStarted error } } } }",
-            "variables": {
-                "orderId": order_id
-            },
-        }
-        response = self.raw_graphql_query(url=RIVIAN_TRANSACTIONS_PATH, query=query, headers=headers)
-        return response.json()
+        return self.execute(queries.transaction_status(order_id)).json()
 
     def finance_summary(self, order_id):
-        headers = self.transaction_headers()
-        query = {
-            "operationName": "financeSummary",
-            "query": "query financeSummary($orderId: ID!) { ...FinanceSummaryFragment } fragment FinanceSummaryFragment on Query { financeSummary(orderId: $orderId) { orderId status financeChoice { financeChoice institutionName paymentMethod trackingNumber preApprovedAmount loanOfficerName loanOfficerContact downPayment rate term rateAndTermSkipped } } }",
-            "variables": {"orderId": order_id},
-        }
-        response = self.raw_graphql_query(url=RIVIAN_TRANSACTIONS_PATH, query=query, headers=headers)
-        return response.json()
+        return self.execute(queries.finance_summary(order_id)).json()
 
     def order(self, order_id):
-        headers = self.transaction_headers()
-        query = {
-            "operationName": "order",
-            "query": "query order($id: String!) { order(id: $id) { vin state billingAddress { firstName lastName line1 line2 city state country postalCode } shippingAddress { firstName lastName line1 line2 city state country postalCode } orderCancelDate orderEmail currency locale storeId type subtotal discountTotal taxTotal feesTotal paidTotal remainingTotal outstandingBalance costAfterCredits total payments { id intent date method amount referenceNumber status card { last4 expiryDate brand } bank { bankName country last4 } transactionNotes } tradeIns { tradeInReferenceId amount } vehicle { vehicleId vin modelYear model make } items { id discounts { total items {  amount  title  code } } subtotal quantity title productId type unitPrice fees { items {  description  amount  code  type } total } taxes { items {  description  amount  code  rate  type } total } sku shippingAddress { firstName lastName line1 line2 city state country postalCode } configuration { ruleset {  meta {  rulesetId  storeId  country  vehicle  version  effectiveDate  currency  locale  availableLocales  }  defaults {  basePrice  initialSelection  }  groups  options  specs  rules } basePrice version options {  optionId  optionName  optionDetails {  name  attrs  price  visualExterior  visualInterior  hidden  disabled  required  }  groupId  groupName  groupDetails {  name  attrs  multiselect  required  options  }  price } } } }}",
-            "variables": {"id": order_id},
-        }
-        response = self.raw_graphql_query(url=RIVIAN_ORDERS_PATH, query=query, headers=headers)
-        return response.json()
+        return self.execute(queries.order(order_id)).json()
 
     def retail_orders(self):
-        headers = self.transaction_headers()
-        query = {
-            "operationName": "searchOrders",
-            "query": "query searchOrders($input: UserOrderSearchInput!) { searchOrders(input: $input) { total data { id type orderDate state fulfillmentSummaryStatus items { id title type sku __typename } __typename } __typename }}",
-            "variables": {
-                "input": {
-                    "orderTypes": ["RETAIL"],
-                    "orderStates": None,
-                    "pageInfo": {
-                        "from": 0,
-                        "size": 5
-                    },
-                    "dateRange": None,
-                    "sortFields": {
-                        "orderDate": "DESC"
-                    }
-                }
-            },
-        }
-        response = self.raw_graphql_query(url=RIVIAN_ORDERS_PATH, query=query, headers=headers)
-        return response.json()
+        return self.execute(queries.retail_orders()).json()
 
     def get_order(self, order_id):
-        headers = self.transaction_headers()
-        query = {
-            "operationName": "getOrder",
-            "query": "query getOrder($orderId: String!) { order(id: $orderId) { id storeId userId orderDate orderCancelDate type state currency locale subtotal discountTotal taxTotal total shippingAddress { firstName lastName line1 line2 city state country postalCode __typename } payments { method currency status type card { last4 expiryDate brand __typename } __typename } items { id title type sku unitPrice quantity state productDetails { ... on ChildProduct { dimensionValues { name valueName localizedStrings __typename } __typename } __typename } __typename } fulfillmentSummaryStatus fulfillmentInfo { fulfillments { fulfillmentId fulfillmentStatus fulfillmentMethod fulfillmentVendor tracking { status carrier number url shipDate deliveredDate serviceType __typename } estimatedDeliveryWindow { startDate endDate __typename } items { orderItemId quantityFulfilled isPartialFulfillment __typename } __typename } pendingFulfillmentItems { orderItemId quantity __typename } __typename } __typename }}",
-            "variables": {
-                "orderId": order_id
-            },
-        }
-        response = self.raw_graphql_query(url=RIVIAN_ORDERS_PATH, query=query, headers=headers)
-        return response.json()
+        return self.execute(queries.get_order(order_id)).json()
 
     def payment_methods(self):
-        headers = self.transaction_headers()
-        query = {
-            "operationName": "paymentMethods",
-            "query": "query paymentMethods { paymentMethods { id type default card { lastFour brand expiration postalCode } } }",
-            "variables": {},
-        }
-        response = self.raw_graphql_query(url=RIVIAN_ORDERS_PATH, query=query, headers=headers)
-        return response.json()
+        return self.execute(queries.payment_methods()).json()
 
     def get_user_information(self):
-        headers = self.gateway_headers()
-        query = {
-            "operationName": "getUserInfo",
-            "query": "query getUserInfo { currentUser { __typename id firstName lastName email address { __typename country } vehicles { __typename id name owner roles vin vas { __typename vasVehicleId vehiclePublicKey } state createdAt updatedAt vehicle { __typename id vin modelYear make model expectedBuildDate plannedBuildDate expectedGeneralAssemblyStartDate actualGeneralAssemblyDate mobileConfiguration { __typename trimOption { __typename optionId optionName } exteriorColorOption { __typename optionId optionName } interiorColorOption { __typename optionId optionName } } vehicleState { __typename supportedFeatures { __typename name status } } otaEarlyAccessStatus } settings { __typename name { __typename value } } } enrolledPhones { __typename vas { __typename vasPhoneId publicKey } enrolled { __typename deviceType deviceName vehicleId identityId shortName } } pendingInvites { __typename id invitedByFirstName role status vehicleId vehicleModel email } } }",
-            # "query": "query getUserInfo {currentUser {__typename id firstName lastName email address { __typename country } vehicles {id name owner roles vin vas {__typename vasVehicleId vehiclePublicKey } state createdAt updatedAt vehicle { __typename id vin modelYear make model expectedBuildDate plannedBuildDate expectedGeneralAssemblyStartDate actualGeneralAssemblyDate } } }}",
-            "variables": None,
-        }
-        response = self.raw_graphql_query(url=RIVIAN_GATEWAY_PATH, query=query, headers=headers)
-        return response.json()
+        return self.execute(queries.get_user_information()).json()
 
-    def get_vehicle_state(self, vehicle_id, minimal=False):
-        headers = self.gateway_headers()
-        if minimal:
-            query = "query GetVehicleState($vehicleID: String!) { vehicleState(id: $vehicleID) { " \
-                    "cloudConnection { lastSync } " \
-                    "powerState { value } " \
-                    "driveMode { value } " \
-                    "gearStatus { value } " \
-                    "vehicleMileage { value } " \
-                    "batteryLevel { value } " \
-                    "distanceToEmpty { value } " \
-                    "gnssLocation { latitude longitude } " \
-                    "gnssSpeed { value } " \
-                    "chargerStatus { value } " \
-                    "chargerState { value } " \
-                    "batteryLimit { value } " \
-                    "timeToEndOfCharge { value } " \
-                    "} }"
-        else:
-            query = "query GetVehicleState($vehicleID: String!) { " \
-                    "vehicleState(id: $vehicleID) { __typename " \
-                    "cloudConnection { __typename lastSync } " \
-                    "gnssLocation { __typename latitude longitude timeStamp } " \
-                    "gnssSpeed { __typename timeStamp value } " \
-                    "gnssBearing { __typename timeStamp value } " \
-                    "gnssAltitude { __typename timeStamp value } " \
-                    "gnssError { __typename timeStamp positionVertical positionHorizontal speed bearing } " \
-                    "alarmSoundStatus { __typename timeStamp value } " \
-                    "timeToEndOfCharge { __typename timeStamp value } " \
-                    "doorFrontLeftLocked { __typename timeStamp value } " \
-                    "doorFrontLeftClosed { __typename timeStamp value } " \
-                    "doorFrontRightLocked { __typename timeStamp value } " \
-                    "doorFrontRightClosed { __typename timeStamp value } " \
-                    "doorRearLeftLocked { __typename timeStamp value } " \
-                    "doorRearLeftClosed { __typename timeStamp value } " \
-                    "doorRearRightLocked { __typename timeStamp value } " \
-                    "doorRearRightClosed { __typename timeStamp value } " \
-                    "windowFrontLeftClosed { __typename timeStamp value } " \
-                    "windowFrontRightClosed { __typename timeStamp value } " \
-                    "windowRearLeftClosed { __typename timeStamp value } " \
-                    "windowRearRightClosed { __typename timeStamp value } " \
-                    "windowFrontLeftCalibrated { __typename timeStamp value } " \
-                    "windowFrontRightCalibrated { __typename timeStamp value } " \
-                    "windowRearLeftCalibrated { __typename timeStamp value } " \
-                    "windowRearRightCalibrated { __typename timeStamp value } " \
-                    "windowsNextAction { __typename timeStamp value } " \
-                    "closureFrunkLocked { __typename timeStamp value } " \
-                    "closureFrunkClosed { __typename timeStamp value } " \
-                    "closureFrunkNextAction { __typename timeStamp value } " \
-                    "gearGuardLocked { __typename timeStamp value } " \
-                    "closureLiftgateLocked { __typename timeStamp value } " \
-                    "closureLiftgateClosed { __typename timeStamp value } " \
-                    "closureLiftgateNextAction { __typename timeStamp value } " \
-                    "windowRearLeftClosed { __typename timeStamp value } " \
-                    "windowRearRightClosed { __typename timeStamp value } " \
-                    "closureSideBinLeftLocked { __typename timeStamp value } " \
-                    "closureSideBinLeftClosed { __typename timeStamp value } " \
-                    "closureSideBinRightLocked { __typename timeStamp value } " \
-                    "closureSideBinRightClosed { __typename timeStamp value } " \
-                    "closureTailgateLocked { __typename timeStamp value } " \
-                    "closureTailgateClosed { __typename timeStamp value } " \
-                    "closureTonneauLocked { __typename timeStamp value } " \
-                    "closureTonneauClosed { __typename timeStamp value } " \
-                    "wiperFluidState { __typename timeStamp value } " \
-                    "powerState { __typename timeStamp value } " \
-                    "batteryHvThermalEventPropagation { __typename timeStamp value } " \
-                    "vehicleMileage { __typename timeStamp value } " \
-                    "brakeFluidLow { __typename timeStamp value } " \
-                    "gearStatus { __typename timeStamp value } " \
-                    "tirePressureStatusFrontLeft { __typename timeStamp value } " \
-                    "tirePressureStatusValidFrontLeft { __typename timeStamp value } " \
-                    "tirePressureStatusFrontRight { __typename timeStamp value } " \
-                    "tirePressureStatusValidFrontRight { __typename timeStamp value } " \
-                    "tirePressureStatusRearLeft { __typename timeStamp value } " \
-                    "tirePressureStatusValidRearLeft { __typename timeStamp value } " \
-                    "tirePressureStatusRearRight { __typename timeStamp value } " \
-                    "tirePressureStatusValidRearRight { __typename timeStamp value } " \
-                    "batteryLevel { __typename timeStamp value } " \
-                    "chargerState { __typename timeStamp value } " \
-                    "batteryLimit { __typename timeStamp value } " \
-                    "batteryCapacity { __typename timeStamp value } " \
-                    "remoteChargingAvailable { __typename timeStamp value } " \
-                    "batteryHvThermalEvent { __typename timeStamp value } " \
-                    "rangeThreshold { __typename timeStamp value } " \
-                    "distanceToEmpty { __typename timeStamp value } " \
-                    "otaAvailableVersion { __typename timeStamp value } " \
-                    "otaAvailableVersionWeek { __typename timeStamp value } " \
-                    "otaAvailableVersionYear { __typename timeStamp value } " \
-                    "otaCurrentVersion { __typename timeStamp value } " \
-                    "otaCurrentVersionNumber { __typename timeStamp value } " \
-                    "otaCurrentVersionWeek { __typename timeStamp value } " \
-                    "otaCurrentVersionYear { __typename timeStamp value } " \
-                    "otaDownloadProgress { __typename timeStamp value } " \
-                    "otaInstallDuration { __typename timeStamp value } " \
-                    "otaInstallProgress { __typename timeStamp value } " \
-                    "otaInstallReady { __typename timeStamp value } " \
-                    "otaInstallTime { __typename timeStamp value } " \
-                    "otaInstallType { __typename timeStamp value } " \
-                    "otaStatus { __typename timeStamp value } " \
-                    "otaCurrentStatus { __typename timeStamp value } " \
-                    "cabinClimateInteriorTemperature { __typename timeStamp value } " \
-                    "cabinPreconditioningStatus { __typename timeStamp value } " \
-                    "cabinPreconditioningType { __typename timeStamp value } " \
-                    "petModeStatus { __typename timeStamp value } " \
-                    "petModeTemperatureStatus { __typename timeStamp value } " \
-                    "cabinClimateDriverTemperature { __typename timeStamp value } " \
-                    "gearGuardVideoStatus { __typename timeStamp value } " \
-                    "gearGuardVideoMode { __typename timeStamp value } " \
-                    "gearGuardVideoTermsAccepted { __typename timeStamp value } " \
-                    "defrostDefogStatus { __typename timeStamp value } " \
-                    "steeringWheelHeat { __typename timeStamp value } " \
-                    "seatFrontLeftHeat { __typename timeStamp value } " \
-                    "seatFrontRightHeat { __typename timeStamp value } " \
-                    "seatRearLeftHeat { __typename timeStamp value } " \
-                    "seatRearRightHeat { __typename timeStamp value } " \
-                    "chargerStatus { __typename timeStamp value } " \
-                    "seatFrontLeftVent { __typename timeStamp value } " \
-                    "seatFrontRightVent { __typename timeStamp value } " \
-                    "chargerDerateStatus { __typename timeStamp value } " \
-                    "driveMode { __typename timeStamp value } " \
-                    "limitedAccelCold { __typename timeStamp value } " \
-                    "limitedRegenCold { __typename timeStamp value } " \
-                    "twelveVoltBatteryHealth { __typename timeStamp value } " \
-                    "serviceMode { __typename timeStamp value } " \
-                    "trailerStatus { __typename timeStamp value } " \
-                    "btmFfHardwareFailureStatus { __typename timeStamp value } " \
-                    "btmIcHardwareFailureStatus { __typename timeStamp value } " \
-                    "btmLfdHardwareFailureStatus { __typename timeStamp value } " \
-                    "btmRfHardwareFailureStatus { __typename timeStamp value } " \
-                    "btmRfdHardwareFailureStatus { __typename timeStamp value } " \
-                    "carWashMode { __typename timeStamp value } " \
-                    "chargePortState { __typename timeStamp value } " \
-                    "chargingTimeEstimationValidity { __typename timeStamp value } " \
-                    "rearHitchStatus { __typename timeStamp value } " \
-                    "} }"
-
-        query = {
-            "operationName": "GetVehicleState",
-            "query": query,
-            "variables": {
-                'vehicleID': vehicle_id,
-            },
-        }
-        response = self.raw_graphql_query(url=RIVIAN_GATEWAY_PATH, query=query, headers=headers)
-        return response.json()
+    def get_vehicle_state(self, vehicle_id, minimal=False, fields=None):
+        return self.execute(queries.get_vehicle_state(vehicle_id, minimal, fields)).json()
+
+    def vehicle_state(self, vehicle_id, minimal=True, fields=None):
+        # VehicleState decoded on first use instead of the response dict
+        return VehicleState.from_response(self.execute(queries.get_vehicle_state(vehicle_id, minimal, fields)))
 
     def get_vehicle_last_connection(self, vehicle_id):
-        headers = self.gateway_headers()
-        query = {
-            "operationName": "GetVehicleLastConnection",
-            "query": "query GetVehicleLastConnection($vehicleID: String!) { vehicleState(id: $vehicleID) { __typename cloudConnection { __typename lastSync } } }",
-            "variables": {
-                'vehicleID': vehicle_id,
-            },
-        }
-        response = self.raw_graphql_query(url=RIVIAN_GATEWAY_PATH, query=query, headers=headers)
-        return response.json()
+        return self.execute(queries.get_vehicle_last_connection(vehicle_id)).json()
 
     def plan_trip(self, vehicle_id, starting_soc, starting_range_meters, origin_lat, origin_long, dest_lat, dest_long):
-        headers = self.gateway_headers()
-        query = {
-            "operationName": "planTrip",
-            "query": "query planTrip($origin: CoordinatesInput!, $destination: CoordinatesInput!, $bearing: Float!, $vehicleId: String!, $startingSoc: Float!, $startingRangeMeters: Float!) { planTrip(bearing: $bearing, vehicleId: $vehicleId, startingSoc: $startingSoc, origin: $origin, destination: $destination, startingRangeMeters: $startingRangeMeters) { routes { routeResponse destinationReached totalChargingDuration arrivalSOC arrivalReachableDistance waypoints { waypointType entityId name latitude longitude maxPower chargeDuration arrivalSOC arrivalReachableDistance departureSOC departureReachableDistance } energyConsumptionOnLeg batteryEmptyToDestinationDistance batteryEmptyLocationLatitude batteryEmptyLocationLongitude } tripPlanStatus chargeStationsAvailable socBelowLimit } }",
-            "variables": {
-                'origin': {
-                    'latitude': origin_lat,
-                    'longitude': origin_long,
-                },
-                'destination': {
-                    'latitude': dest_lat,
-                    'longitude': dest_long,
-                },
-                'bearing': 0,
-                'vehicleId': vehicle_id,
-                'startingRangeMeters': starting_range_meters,
-                'startingSoc': starting_soc,
-            },
-        }
-        response = self.raw_graphql_query(url=RIVIAN_GATEWAY_PATH, query=query, headers=headers)
-        return response.json()
+        return self.execute(queries.plan_trip(vehicle_id, starting_soc, starting_range_meters, origin_lat, origin_long, dest_lat, dest_long)).json()
 
     def get_ota_details(self, vehicle_id):
-        headers = self.gateway_headers()
-        query = {
-            "operationName": "GetVehicle",
-            "query": "query GetVehicle($vehicleId: String!) { getVehicle(id: $vehicleId) { availableOTAUpdateDetails { url version locale } currentOTAUpdateDetails { url version locale } } }",
-            "variables": {
-                'vehicleId': vehicle_id,
-            },
-        }
-        response = self.raw_graphql_query(url=RIVIAN_GATEWAY_PATH, query=query, headers=headers)
-        return response.json()
+        return self.execute(queries.get_ota_details(vehicle_id)).json()
 
     def check_by_rivian_id(self):
-        headers = self.transaction_headers()
-        query = {
-            "operationName": "CheckByRivianId",
-            "query": "query CheckByRivianId { chargepoint { checkByRivianId } }",
-            "variables": {},
-        }
-        response = self.raw_graphql_query(url=RIVIAN_CHARGING_PATH, query=query, headers=headers)
-        return response.json()
+        return self.execute(queries.check_by_rivian_id()).json()
 
     def get_linked_email_for_rivian_id(self):
-        headers = self.transaction_headers()
-        query = {
-            "operationName": "getLinkedEmailForRivianId",
-            "query": "query getLinkedEmailForRivianId { chargepoint { getLinkedEmailForRivianId { email } } }",
-            "variables": {},
-        }
-        response = self.raw_graphql_query(url=RIVIAN_CHARGING_PATH, query=query, headers=headers)
-        return response.json()
+        return self.execute(queries.get_linked_email_for_rivian_id()).json()
 
     def get_parameter_store_values(self):
-        headers = self.transaction_headers()
-        query = {
-            "operationName": "getParameterStoreValues",
-            "query": "query getParameterStoreValues($keys: [String!]!) { getParameterStoreValues(keys: $keys) { key value } }",
-            "variables": {
-                "keys": ["FF_ACCOUNT_ESTIMATED_DELIVERY_WINDOW_STATIC_MSG"]
-            },
-        }
-        response = self.raw_graphql_query(url=RIVIAN_ORDERS_PATH, query=query, headers=headers)
-        return response.json()
+        return self.execute(queries.get_parameter_store_values()).json()
 
     def get_vehicle(self, vehicle_id):
-        headers = self.gateway_headers()
-        query = {
-            "operationName": "GetVehicle",
-            "query": "query GetVehicle($getVehicleId: String) { getVehicle(id: $getVehicleId) { invitedUsers { __typename ... on ProvisionedUser { devices { type mappedIdentityId id hrid deviceName isPaired isEnabled } firstName lastName email roles userId } ... on UnprovisionedUser { email inviteId status } } } }",
-            "variables": {
-                "getVehicleId": vehicle_id
-            },
-        }
-        response = self.raw_graphql_query(url=RIVIAN_GATEWAY_PATH, query=query, headers=headers)
-        return response.json()
+        return self.execute(queries.get_vehicle(vehicle_id)).json()
 
     def get_registered_wallboxes(self):
-        headers = self.gateway_headers()
-        query = {
-            "operationName": "getRegisteredWallboxes",
-            "variables": {},
-            "query": "query getRegisteredWallboxes { getRegisteredWallboxes { __typename wallboxId userId wifiId name linked latitude longitude chargingStatus power currentVoltage currentAmps softwareVersion model serialNumber maxPower maxVoltage maxAmps } }"
-        }
-        response = self.raw_graphql_query(url=RIVIAN_CHARGING_PATH, query=query, headers=headers)
-        return response.json()
+        return self.execute(queries.get_registered_wallboxes()).json()
 
     def get_provisioned_camp_speakers(self):
-        headers = self.gateway_headers()
-        query = {
-            "operationName": "GetProvisionedCampSpeakers",
-            "query": "query GetProvisionedCampSpeakers { currentUser { __typename vehicles { __typename id connectedProducts { __typename ... on CampSpeaker { serialNumber id } } } } }",
-            "variables": {},
-        }
-        response = self.raw_graphql_query(url=RIVIAN_GATEWAY_PATH, query=query, headers=headers)
-        return response.json()
+        return self.execute(queries.get_provisioned_camp_speakers()).json()
 
     def get_vehicle_images(self):
-        headers = self.gateway_headers()
-        query = {
-            "operationName": "getVehicleImages",
-            "query": "query getVehicleImages($extension: String!, $resolution: String!) { getVehicleOrderMobileImages(resolution: $resolution, extension: $extension) { __typename orderId url resolution size design placement } getVehicleMobileImages(resolution: $resolution, extension: $extension) { __typename vehicleId url resolution size design placement } }",
-            "variables": {
-                "extension": "webp",
-                "resolution": "hdpi"
-            },
-        }
-        response = self.raw_graphql_query(url=RIVIAN_GATEWAY_PATH, query=query, headers=headers)
-        return response.json()
+        return self.execute(queries.get_vehicle_images()).json()
 
     def user(self):
-        headers = self.gateway_headers()
-        query = {
-            "operationName": "user",
-            # "query": "query user { user { email { email } phone { formatted } firstName lastName addresses { id type line1 line2 city state country postalCode } newsletterSubscription smsSubscription registrationChannels2FA userId vehicles {id highestPriorityRole __typename } orderSnapshots(filterTypes: [PRE_ORDER, VEHICLE]) { ...OrderSnapshotsFragment __typename } __typename }} fragment OrderSnapshotsFragment on OrderSnapshot { id total paidTotal subtotal state configurationStatus currency orderDate type fulfillmentSummaryStatus items { id total unitPrice quantity productDetails { ... on VehicleProduct { sku store { country __typename } __typename } ... on StandaloneProduct { sku store { country __typename } __typename } ... on ChildProduct { sku store { country __typename } __typename } __typename } configuration { basePrice ruleset { meta { locale currency country vehicle version rulesetId effectiveDate __typename } groups rules specs options defaults { basePrice initialSelection __typename } __typename } options { optionId groupId price optionDetails { name attrs price visualExterior visualInterior __typename } __typename } __typename } __typename } __typename } } } ",
-            "query": "query user { user { email { email } phone { formatted } firstName lastName addresses { id type line1 line2 city state country postalCode } newsletterSubscription smsSubscription registrationChannels2FA userId vehicles {id highestPriorityRole __typename } invites (filterStates: [PENDING]) {id inviteState vehicleModel vehicleId creatorFirstName} orderSnapshots(filterTypes: [PRE_ORDER, VEHICLE, RETAIL]) { ...OrderSnapshotsFragment } }} fragment OrderSnapshotsFragment on OrderSnapshot { id total paidTotal subtotal state configurationStatus currency orderDate type fulfillmentSummaryStatus }",
-            "variables": {},
-        }
-        response = self.raw_graphql_query(url=RIVIAN_ORDERS_PATH, query=query, headers=headers)
-        return response.json()
+        return self.execute(queries.user()).json()
 
     def get_charging_schedule(self, vehicle_id):
-        headers = self.gateway_headers()
-        query = {
-            "operationName": "GetChargingSchedule",
-            "query": "query GetChargingSchedule($vehicleId: String!) { getVehicle(id: $vehicleId) { chargingSchedules { startTime duration location { latitude longitude } amperage enabled weekDays } } }",
-            "variables": {
-                "vehicleId": vehicle_id
-            },
-        }
-        response = self.raw_graphql_query(url=RIVIAN_GATEWAY_PATH, query=query, headers=headers)
-        return response.json()
-
-
+        return self.execute(queries.get_charging_schedule(vehicle_id)).json()
 
     def get_completed_session_summaries(self):
-        headers = self.gateway_headers()
-        query = {
-            "operationName": "getCompletedSessionSummaries",
-            "query": "query getCompletedSessionSummaries { getCompletedSessionSummaries { chargerType currencyCode paidTotal startInstant endInstant totalEnergyKwh rangeAddedKm city transactionId vehicleId vehicleName vendor isRoamingNetwork isPublic isHomeCharger meta {  transactionIdGroupingKey  dataSources } }}",
-            "variables": {},
-        }
-        response = self.raw_graphql_query(url=RIVIAN_CHARGING_PATH, query=query, headers=headers)
-        return response.json()
-
+        return self.execute(queries.get_completed_session_summaries()).json()
 
     def get_charging_session_status(self, job_id, user_id):
-        headers = self.gateway_headers()
-        query = {
-            "operationName": "GetChargingSessionStatus",
-            "query": "query GetChargingSessionStatus($jobId: ID!, $userId: ID!) { getSessionStatus(jobId: $jobId, userId: $userId) { status errorMessage errorId sessionId } }",
-            "variables": {
-                "jobId": "123",
-                "userId": "123"
-            },
-        }
-        response = self.raw_graphql_query(url=RIVIAN_CHARGING_PATH, query=query, headers=headers)
-        return response.json()
-
+        return self.execute(queries.get_charging_session_status(job_id, user_id)).json()
 
     def get_non_rivian_user_session(self):
-        headers = self.gateway_headers()
-        query = {
-            "operationName": "getNonRivianUserSession",
-            "query": "query getNonRivianUserSession { getNonRivianUserSession { chargerId transactionId isRivianCharger vehicleChargerState { value updatedAt } } }",
-            "variables": {},
-        }
-        response = self.raw_graphql_query(url=RIVIAN_CHARGING_PATH, query=query, headers=headers)
-        return response.json()
+        return self.execute(queries.get_non_rivian_user_session()).json()
 
     def get_live_session_data(self, vehicle_id):
-        headers = self.gateway_headers()
-        query = {
-            "operationName": "getLiveSessionData",
-            "query": "query getLiveSessionData($vehicleId: ID) "
-                     "{ getLiveSessionData(vehicleId: $vehicleId) "
-                     "{ isRivianCharger isFreeSession vehicleChargerState { value updatedAt } "
-                     "chargerId startTime timeElapsed timeRemaining { value updatedAt } kilometersChargedPerHour "
-                     "{ value updatedAt } power { value updatedAt } rangeAddedThisSession { value updatedAt } "
-                     "totalChargedEnergy { value updatedAt } timeRemaining { value updatedAt } vehicleChargerState "
-                     "{ value updatedAt } kilometersChargedPerHour { value updatedAt } "
-                     "currentPrice soc { value } currentMiles { value } current { value } } }",
-            "variables": {
-                "vehicleId": vehicle_id
-            },
-        }
-        response = self.raw_graphql_query(url=RIVIAN_CHARGING_PATH, query=query, headers=headers)
-        return response.json()
-
+        return self.execute(queries.get_live_session_data(vehicle_id)).json()
 
     def get_live_session_history(self, vehicle_id):
-        headers = self.gateway_headers()
-        query = {
-            "operationName": "getLiveSessionHistory",
-            "query": "query getLiveSessionHistory($vehicleId: ID) { getLiveSessionHistory(vehicleId: $vehicleId) { chartData { kw time } } }",
-            "variables": {
-                "vehicleId": vehicle_id
-            },
-        }
-        response = self.raw_graphql_query(url=RIVIAN_CHARGING_PATH, query=query, headers=headers)
-        return response.json()
-
+        return self.execute(queries.get_live_session_history(vehicle_id)).json()
 
     # Vehicle commands require an HMAC signature to be sent with the request.
     # The HMAC is generated using the command name and the current timestamp,
     # using a shared key generated from the phone’s private key and the vehicle’s
     # public key. The vehicle’s public key is available in the vehiclePublicKey
     # field of the getUserInfo endpoint.
-    def send_vehicle_command(self, vehicle_id, command, vasPhoneId, deviceId, vehiclePublicKey):
-        headers = self.gateway_headers()
+    def get_adventure_feed(self, locale="en_US"):
+        return self.execute(queries.get_adventure_feed(locale)).json()
 
-        query = {
-            "operationName": "sendVehicleCommand",
-            "query": "mutation sendVehicleCommand($attrs: VehicleCommandAttributes!) { sendVehicleCommand(attrs: $attrs) { __typename id command state } }",
-            "variables": {
-                "attrs": {
-                    "command": command,
-                    "hmac": 0, #your-hmac
-                    "timestamp": time.time(),
-                    "vasPhoneId": vasPhoneId,
-                    "deviceId": deviceId,
-                    "vehicleId": vehicle_id,
-                }
-            },
-        }
-        response = self.raw_graphql_query(url=RIVIAN_GATEWAY_PATH, query=query, headers=headers)
-        return response.json()
+    def send_vehicle_command(self, vehicle_id, command, vasPhoneId, deviceId, vehiclePublicKey):
+        return self.execute(queries.send_vehicle_command(vehicle_id, command, vasPhoneId, deviceId, vehiclePublicKey)).json()
@@ -0,0 +1,334 @@
+import asyncio
+import json
+import time
+
+import aiohttp
+
+try:
+    from . import rivian_queries as queries
+    from .rivian_batch import merge_results, plan_batches
+    from .rivian_api import DEFAULT_POOL_SIZE, ENDPOINT_PATHS, RIVIAN_BASE_PATH, RivianBase, log
+    from .rivian_state import VehicleState
+    from .rivian_timeout import DEFAULT_TIMEOUT, DeadlineExceeded, current_deadline
+except ImportError:
+    import rivian_queries as queries
+    from rivian_batch import merge_results, plan_batches
+    from rivian_api import DEFAULT_POOL_SIZE, ENDPOINT_PATHS, RIVIAN_BASE_PATH, RivianBase, log
+    from rivian_state import VehicleState
+    from rivian_timeout import DEFAULT_TIMEOUT, DeadlineExceeded, current_deadline
+
+
+# Connecting failed, nothing was sent (ConnectionTimeoutError is only in newer aiohttp)
+CONNECTION_FAILED_ERRORS = (aiohttp.ClientConnectorError,) + \
+    ((aiohttp.ConnectionTimeoutError,) if hasattr(aiohttp, 'ConnectionTimeoutError') else ())
+
+
+class GraphQLResponse:
+    # Just enough of requests.Response for the handling shared with the sync client
+    def __init__(self, status_code, reason, content):
+        self.status_code = status_code
+        self.reason = reason
+        self.content = content
+
+    def json(self):
+        return json.loads(self.content)
+
+
+def create_client_session(pool_size=DEFAULT_POOL_SIZE):
+    # Auth is carried in headers, cookies are never kept (same as the sync session)
+    return aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=pool_size),
+                                 cookie_jar=aiohttp.DummyCookieJar())
+
+
+class AsyncRivian(RivianBase):
+    # asyncio version of Rivian, same methods as coroutines. Sessions are created lazily
+    # (one keep-alive pool per endpoint) so the object can be built outside of the event loop.
+    def __init__(self, pool_size=DEFAULT_POOL_SIZE, pool_sizes=None, session=None, base_url=RIVIAN_BASE_PATH,
+                 persisted_queries=False, metrics=None, rate_limiter=None, retry_policy=None, circuit_breaker=None,
+                 timeout=DEFAULT_TIMEOUT, timeouts=None, cache=None, headers=None, account=None):
+        super().__init__(base_url=base_url, persisted_queries=persisted_queries, metrics=metrics,
+                         rate_limiter=rate_limiter, retry_policy=retry_policy, circuit_breaker=circuit_breaker,
+                         timeout=timeout, timeouts=timeouts, cache=cache, headers=headers, account=account)
+        self._pool_size = pool_size
+        self._pool_sizes = pool_sizes or {}
+        self._shared_session = session
+        self._sessions = {}
+        self._csrf_lock = None
+        self._refresh_lock = None
+
+    def session_for(self, url):
+        if self._shared_session is not None:
+            return self._shared_session
+        session = self._sessions.get(url)
+        if session is None:
+            size = self._pool_size
+            for endpoint, path in ENDPOINT_PATHS.items():
+                if url.endswith(path):
+                    size = self._pool_sizes.get(endpoint, self._pool_size)
+            session = create_client_session(size)
+            self._sessions[url] = session
+        return session
+
+    async def close(self):
+        for session in self._sessions.values():
+            await session.close()
+        self._sessions = {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def login(self, username, password):
+        await self.create_csrf_token()
+        response = await self.execute(queries.login(username, password))
+        self.apply_login(response, username)
+        return response
+
+    async def login_with_otp(self, username, otpCode, otpToken=None):
+        await self.ensure_csrf_token()
+        response = await self.execute(queries.login_with_otp(username, otpCode, otpToken or self._otp_token))
+        self.apply_login_with_otp(response, username)
+        return response
+
+    async def create_csrf_token(self):
+        response = await self.execute(queries.create_csrf_token())
+        self.apply_csrf(response)
+        return response
+
+    async def ensure_csrf_token(self):
+        if not self.csrf_expired():
+            return
+        if self._csrf_lock is None:
+            self._csrf_lock = asyncio.Lock()
+        # Concurrent callers wait for one handshake instead of each minting a token
+        async with self._csrf_lock:
+            if self.csrf_expired():
+                await self.create_csrf_token()
+
+    async def refresh_access_token(self):
+        if self.refreshed_elsewhere():
+            return None
+        response = await self.execute(queries.refresh_token(self._refresh_token))
+        self.apply_refresh(response)
+        return response
+
+    async def ensure_access_token(self, rejected=None):
+        # See Rivian.ensure_access_token
+        if rejected is None and not self.access_token_expiring():
+            return False
+        if self._refresh_lock is None:
+            self._refresh_lock = asyncio.Lock()
+        async with self._refresh_lock:
+            if rejected is None:
+                # Someone else may have refreshed it while this caller waited for the lock
+                if not self.access_token_expiring():
+                    return False
+            else:
+                if rejected != self._user_session_token:
+                    # Someone else refreshed it while this request was in flight
+                    return True
+                if time.time() < self._refresh_retry_at:
+                    # A refresh failed moments ago, don't try again yet
+                    return False
+            session = self._user_session_token
+            try:
+                await self.refresh_access_token()
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                self.refresh_failed(e)
+                return False
+            return session != self._user_session_token or rejected is not None
+
+    async def post(self, url, query, headers):
+        # One request, retried as the retry policy says
+        started = self.retry_policy.clock() if self.retry_policy else 0
+        attempt = 0
+        while True:
+            attempt += 1
+            self.before_attempt()
+            response = error = None
+            try:
+                response = await self.send(url, query, headers)
+            except DeadlineExceeded:
+                raise
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = e
+            delay = self.after_attempt(query, attempt, started, response, error,
+                                       sent=not isinstance(error, CONNECTION_FAILED_ERRORS))
+            if delay is None:
+                if error is not None:
+                    self.check_deadline(error)
+                    raise error
+                return response
+            await self.pause(delay)
+
+    async def pause(self, seconds):
+        # Waits that a Deadline can cut short
+        deadline = current_deadline()
+        if deadline is not None:
+            await deadline.wait_async(seconds)
+        else:
+            await asyncio.sleep(seconds)
+
+    async def send(self, url, query, headers):
+        if self.rate_limiter is not None:
+            delay = self.rate_limiter.reserve()
+            if delay > 0:
+                await self.pause(delay)
+        connect, read = self.timeout_for(url)
+        timeout = aiohttp.ClientTimeout(sock_connect=connect, sock_read=read)
+        deadline = current_deadline()
+        start = time.perf_counter()
+        if deadline is not None:
+            # Cancellable from other threads and bounded by the time left
+            result = await deadline.run_async(self.request(url, query, headers, timeout))
+        else:
+            result = await self.request(url, query, headers, timeout)
+        if self.metrics is not None:
+            self.record_request(url, query, result, time.perf_counter() - start)
+        if self.rate_limiter is not None:
+            self.check_rate_limit(result)
+        return result
+
+    async def request(self, url, query, headers, timeout):
+        async with self.session_for(url).post(url, json=query, headers=headers, timeout=timeout) as response:
+            return GraphQLResponse(response.status, response.reason, await response.read())
+
+    async def raw_graphql_query(self, url, query, headers):
+        response = await self.post(url, query, headers)
+        if self.should_retry_csrf(query, headers, response):
+            log.info("CSRF token rejected, creating a new one")
+            await self.create_csrf_token()
+            self.update_csrf_headers(headers)
+            response = await self.post(url, query, headers)
+        if self.should_refresh_access(query, headers, response) and \
+                await self.ensure_access_token(headers["U-Sess"]):
+            log.info("Session rejected, retrying with refreshed tokens")
+            self.update_session_headers(headers)
+            response = await self.post(url, query, headers)
+        if response.status_code != 200:
+            log.warning(f"Graphql error: Response status: {response.status_code} Reason: {response.reason}")
+        return response
+
+    async def execute(self, operation):
+        cached = self.cached_response(operation)
+        if cached is not None:
+            return cached
+        response = await self.send_operation(operation)
+        self.cache_response(operation, response)
+        return response
+
+    async def send_operation(self, operation):
+        if operation.headers in (queries.GATEWAY_HEADERS, queries.TRANSACTION_HEADERS):
+            await self.ensure_access_token()
+            await self.ensure_csrf_token()
+        headers = self.headers_for(operation.headers)
+        url = self.endpoint_url(operation.endpoint)
+        query = operation.query
+        if self.use_persisted_query(operation):
+            hashed, query = queries.persisted_request(operation.query)
+            response = await self.raw_graphql_query(url=url, query=hashed, headers=headers)
+            if not self.persisted_query_missed(operation, response):
+                return response
+            if not self.use_persisted_query(operation):
+                # Servers without APQ reject the extension even next to the document
+                query = operation.query
+        return await self.raw_graphql_query(url=url, query=query, headers=headers)
+
+    async def batch(self, operations):
+        batches = plan_batches(operations)
+        responses = await asyncio.gather(*[self.execute(b.operation()) for b in batches])
+        return merge_results(batches, [r.json() for r in responses], len(operations))
+
+    async def vehicle_orders(self):
+        return (await self.execute(queries.vehicle_orders())).json()
+
+    async def delivery(self, order_id):
+        return (await self.execute(queries.delivery(order_id))).json()
+
+    async def transaction_status(self, order_id):
+        return (await self.execute(queries.transaction_status(order_id))).json()
+
+    async def finance_summary(self, order_id):
+        return (await self.execute(queries.finance_summary(order_id))).json()
+
+    async def order(self, order_id):
+        return (await self.execute(queries.order(order_id))).json()
+
+    async def retail_orders(self):
+        return (await self.execute(queries.retail_orders())).json()
+
+    async def get_order(self, order_id):
+        return (await self.execute(queries.get_order(order_id))).json()
+
+    async def payment_methods(self):
+        return (await self.execute(queries.payment_methods())).json()
+
+    async def get_user_information(self):
+        return (await self.execute(queries.get_user_information())).json()
+
+    async def get_vehicle_state(self, vehicle_id, minimal=False, fields=None):
+        return (await self.execute(queries.get_vehicle_state(vehicle_id, minimal, fields))).json()
+
+    async def vehicle_state(self, vehicle_id, minimal=True, fields=None):
+        return VehicleState.from_response(await self.execute(queries.get_vehicle_state(vehicle_id, minimal, fields)))
+
+    async def get_vehicle_last_connection(self, vehicle_id):
+        return (await self.execute(queries.get_vehicle_last_connection(vehicle_id))).json()
+
+    async def plan_trip(self, vehicle_id, starting_soc, starting_range_meters, origin_lat, origin_long, dest_lat, dest_long):
+        return (await self.execute(queries.plan_trip(vehicle_id, starting_soc, starting_range_meters, origin_lat, origin_long, dest_lat, dest_long))).json()
+
+    async def get_ota_details(self, vehicle_id):
+        return (await self.execute(queries.get_ota_details(vehicle_id))).json()
+
+    async def check_by_rivian_id(self):
+        return (await self.execute(queries.check_by_rivian_id())).json()
+
+    async def get_linked_email_for_rivian_id(self):
+        return (await self.execute(queries.get_linked_email_for_rivian_id())).json()
+
+    async def get_parameter_store_values(self):
+        return (await self.execute(queries.get_parameter_store_values())).json()
+
+    async def get_vehicle(self, vehicle_id):
+        return (await self.execute(queries.get_vehicle(vehicle_id))).json()
+
+    async def get_registered_wallboxes(self):
+        return (await self.execute(queries.get_registered_wallboxes())).json()
+
+    async def get_provisioned_camp_speakers(self):
+        return (await self.execute(queries.get_provisioned_camp_speakers())).json()
+
+    async def get_vehicle_images(self):
+        return (await self.execute(queries.get_vehicle_images())).json()
+
+    async def user(self):
+        return (await self.execute(queries.user())).json()
+
+    async def get_charging_schedule(self, vehicle_id):
+        return (await self.execute(queries.get_charging_schedule(vehicle_id))).json()
+
+    async def get_completed_session_summaries(self):
+        return (await self.execute(queries.get_completed_session_summaries())).json()
+
+    async def get_charging_session_status(self, job_id, user_id):
+        return (await self.execute(queries.get_charging_session_status(job_id, user_id))).json()
+
+    async def get_non_rivian_user_session(self):
+        return (await self.execute(queries.get_non_rivian_user_session())).json()
+
+    async def get_live_session_data(self, vehicle_id):
+        return (await self.execute(queries.get_live_session_data(vehicle_id))).json()
+
+    async def get_live_session_history(self, vehicle_id):
+        return (await self.execute(queries.get_live_session_history(vehicle_id))).json()
+
+    async def get_adventure_feed(self, locale="en_US"):
+        return (await self.execute(queries.get_adventure_feed(locale))).json()
+
+    async def send_vehicle_command(self, vehicle_id, command, vasPhoneId, deviceId, vehiclePublicKey):
+        return (await self.execute(queries.send_vehicle_command(vehicle_id, command, vasPhoneId, deviceId, vehiclePublicKey))).json()
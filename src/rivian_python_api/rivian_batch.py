@@ -0,0 +1,212 @@
+import re
+
+try:
+    from .rivian_queries import Operation
+except ImportError:
+    from rivian_queries import Operation
+
+# Merges compatible GraphQL operations into one aliased document and splits the
+# response back per operation. Only queries on the same endpoint with the same kind
+# of headers are merged; anything that can't be aliased safely is sent on its own.
+
+BATCH_OPERATION_NAME = "Batch"
+
+NAME_RE = re.compile(r'[_A-Za-z][_0-9A-Za-z]*')
+VARIABLE_RE = re.compile(r'\$([_A-Za-z][_0-9A-Za-z]*)')
+FRAGMENT_RE = re.compile(r'fragment\s+([_A-Za-z][_0-9A-Za-z]*)')
+
+
+def _skip_ignored(text, i):
+    while i < len(text) and (text[i].isspace() or text[i] == ','):
+        i += 1
+    return i
+
+
+def _skip_string(text, i):
+    i += 1
+    while text[i] != '"':
+        i += 2 if text[i] == '\\' else 1
+    return i + 1
+
+
+def _match(text, i, open_char, close_char):
+    # Index just past the bracket closing the one at text[i]
+    depth = 0
+    while i < len(text):
+        c = text[i]
+        if c == '"':
+            i = _skip_string(text, i)
+            continue
+        if c == open_char:
+            depth += 1
+        elif c == close_char:
+            depth -= 1
+            if depth == 0:
+                return i + 1
+        i += 1
+    raise ValueError(f"Unbalanced '{open_char}' in GraphQL document")
+
+
+def parse_document(document):
+    # Returns (operation type, variable definitions, selection set body, fragments text)
+    start = document.index('{')
+    header = document[:start].strip()
+    end = _match(document, start, '{', '}')
+    body = document[start + 1:end - 1]
+    fragments = document[end:].strip()
+    match = re.match(r'(query|mutation|subscription)\b[^(]*(?:\((.*)\))?\s*$', header, re.S)
+    if header and not match:
+        raise ValueError(f"Unsupported GraphQL operation header: {header}")
+    kind = match.group(1) if match else 'query'
+    variables = (match.group(2) or '').strip() if match else ''
+    return kind, variables, body, fragments
+
+
+def top_level_fields(body):
+    # Splits a selection set body into (response key, field text without alias) pairs
+    fields = []
+    i = _skip_ignored(body, 0)
+    while i < len(body):
+        if body.startswith('...', i):
+            raise ValueError("Fragment spreads can't be aliased")
+        name = NAME_RE.match(body, i)
+        if not name:
+            raise ValueError(f"Unexpected GraphQL at: {body[i:i + 20]}")
+        key = name.group(0)
+        i = _skip_ignored(body, name.end())
+        if i < len(body) and body[i] == ':':
+            i = _skip_ignored(body, i + 1)
+            name = NAME_RE.match(body, i)
+            i = _skip_ignored(body, name.end())
+        start = name.start()
+        if i < len(body) and body[i] == '(':
+            i = _skip_ignored(body, _match(body, i, '(', ')'))
+        while i < len(body) and body[i] == '@':
+            directive = NAME_RE.match(body, i + 1)
+            i = _skip_ignored(body, directive.end())
+            if i < len(body) and body[i] == '(':
+                i = _skip_ignored(body, _match(body, i, '(', ')'))
+        if i < len(body) and body[i] == '{':
+            i = _match(body, i, '{', '}')
+        fields.append((key, body[start:i].strip()))
+        i = _skip_ignored(body, i)
+    return fields
+
+
+def split_fragments(fragments):
+    # {name: text} for each fragment definition
+    result = {}
+    for match in FRAGMENT_RE.finditer(fragments):
+        end = _match(fragments, fragments.index('{', match.end()), '{', '}')
+        result[match.group(1)] = fragments[match.start():end]
+    return result
+
+
+class _Batch:
+    def __init__(self, endpoint, headers):
+        self.endpoint = endpoint
+        self.headers = headers
+        self.variable_definitions = []
+        self.selections = []
+        self.variables = {}
+        self.fragments = {}
+        # alias -> (index of the operation in the batch call, original response key)
+        self.aliases = {}
+        self.indexes = []
+        self.operations = []
+
+    def add(self, index, operation, parsed):
+        kind, variable_definitions, body, fragments = parsed
+        fragments = split_fragments(fragments)
+        for name, text in fragments.items():
+            if self.fragments.get(name, text) != text:
+                return False
+        prefix = f"op{len(self.indexes)}_"
+
+        def rename(text):
+            return VARIABLE_RE.sub(lambda m: f"${prefix}{m.group(1)}", text)
+
+        if variable_definitions:
+            self.variable_definitions.append(rename(variable_definitions))
+        for key, field in top_level_fields(body):
+            alias = prefix + key
+            self.selections.append(f"{alias}: {rename(field)}")
+            self.aliases[alias] = (index, key)
+        for name, value in (operation.query.get("variables") or {}).items():
+            self.variables[prefix + name] = value
+        self.fragments.update(fragments)
+        self.indexes.append(index)
+        self.operations.append(operation)
+        return True
+
+    def operation(self):
+        if len(self.operations) == 1:
+            return self.operations[0]
+        variables = f"({', '.join(self.variable_definitions)})" if self.variable_definitions else ""
+        document = f"query {BATCH_OPERATION_NAME}{variables} {{ {' '.join(self.selections)} }}"
+        if self.fragments:
+            document += " " + " ".join(self.fragments.values())
+        return Operation(self.endpoint, self.headers, {
+            "operationName": BATCH_OPERATION_NAME,
+            "query": document,
+            "variables": self.variables,
+        })
+
+    def split(self, response_json):
+        if len(self.operations) == 1:
+            return {self.indexes[0]: response_json}
+        results = {index: {"data": None if response_json.get("data") is None else {}} for index in self.indexes}
+        for alias, value in (response_json.get("data") or {}).items():
+            if alias in self.aliases:
+                index, key = self.aliases[alias]
+                results[index]["data"][key] = value
+        for error in response_json.get("errors") or []:
+            path = error.get("path") or []
+            if path and path[0] in self.aliases:
+                index, key = self.aliases[path[0]]
+                results[index].setdefault("errors", []).append(dict(error, path=[key] + list(path[1:])))
+            else:
+                # Not tied to one field (e.g. auth or rate limit), applies to every operation
+                for index in self.indexes:
+                    results[index].setdefault("errors", []).append(error)
+        if "extensions" in response_json:
+            for index in self.indexes:
+                results[index]["extensions"] = response_json["extensions"]
+        return results
+
+
+def plan_batches(operations):
+    # Groups operations into as few requests as possible, keeping incompatible ones separate
+    batches = []
+    open_batches = {}
+    for index, operation in enumerate(operations):
+        try:
+            parsed = parse_document(operation.query["query"])
+            if parsed[0] != 'query':
+                raise ValueError("Only queries are batched")
+            top_level_fields(parsed[2])
+            if VARIABLE_RE.search(parsed[3]):
+                raise ValueError("Fragments using variables can't be renamed")
+        except ValueError:
+            batch = _Batch(operation.endpoint, operation.headers)
+            batch.indexes.append(index)
+            batch.operations.append(operation)
+            batches.append(batch)
+            continue
+        key = (operation.endpoint, operation.headers)
+        batch = open_batches.get(key)
+        if batch is None or not batch.add(index, operation, parsed):
+            batch = _Batch(operation.endpoint, operation.headers)
+            batch.add(index, operation, parsed)
+            open_batches[key] = batch
+            batches.append(batch)
+    return batches
+
+
+def merge_results(batches, responses, count):
+    # responses[i] is the decoded response for batches[i], returns per operation results in call order
+    results = [None] * count
+    for batch, response_json in zip(batches, responses):
+        for index, result in batch.split(response_json).items():
+            results[index] = result
+    return results
@@ -0,0 +1,625 @@
+#!/usr/bin/env python
+# encoding: utf-8
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import queue
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import requests
+
+from rivian_api import *
+from rivian_charging import ChargingHistory, follow_charging_history
+from rivian_fleet import FleetPoller
+from rivian_limit import RateLimiter
+from rivian_pool import ClientPool
+from rivian_queries import VEHICLE_STATE_FIELDS, VEHICLE_STATE_MINIMAL_FIELDS
+from rivian_state import VehicleState
+from rivian_store import TimeSeriesStore
+from rivian_stub import AccountCheckHandler, StubServer, StubTransport, call_accounts
+
+# Every benchmark returns rows: {'benchmark': ..., 'name': ..., <metrics>}. Timings are in the metric
+# names (mean_ms, decode_us_per_poll, ...). --json saves them with the commit they ran on, --compare
+# shows the change of each metric against such a file.
+
+STATE_QUERY = {
+    "operationName": "GetVehicleState",
+    "query": "query GetVehicleState($vehicleID: String!) { vehicleState(id: $vehicleID) { powerState { value } } }",
+    "variables": {"vehicleID": "stub-vehicle"},
+}
+
+BENCHMARKS = ('transport', 'headers', 'decode', 'poll', 'sessions', 'polyline',
+              'pool', 'persisted', 'state', 'store', 'fleet', 'accounts', 'startup', 'daemon', 'charging')
+# Need the CLI's dependencies (plotly, polyline, ...)
+CLI_BENCHMARKS = ('poll', 'sessions', 'polyline', 'startup', 'daemon')
+
+CLI_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'rivian_cli.py')
+# CLI invocations whose startup is checked, --poll is stopped once it showed the first state
+STARTUP_COMMANDS = {
+    'query': ['--query', '--vehicle_id', 'stub-vehicle', '--no_daemon'],
+    'poll': ['--poll', '--vehicle_id', 'stub-vehicle'],
+}
+# Only for commands that need them (trip maps, geocoding, AsyncRivian)
+STARTUP_EXCLUDED_MODULES = ('plotly', 'geopy', 'polyline', 'aiohttp')
+DEFAULT_STARTUP_BUDGET_MS = 250
+
+
+def time_calls(call, iterations):
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        call()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def timing_row(benchmark, name, timings):
+    timings_ms = [t * 1000 for t in timings]
+    return {
+        'benchmark': benchmark,
+        'name': name,
+        'calls': len(timings_ms),
+        'mean_ms': statistics.mean(timings_ms),
+        'median_ms': statistics.median(timings_ms),
+        'max_ms': max(timings_ms),
+    }
+
+
+def stub_rivian(responses=None):
+    # Rivian over an in process transport with a valid handshake, no sockets or CreateCSRFToken calls
+    rivian = Rivian(session=StubTransport(responses))
+    rivian._csrf_token = "stub-csrf-token"
+    rivian._app_session_token = "stub-app-session-token"
+    rivian._csrf_expires_at = time.time() + CSRF_TOKEN_LIFETIME
+    return rivian
+
+
+def full_state_response(poll, fields=VEHICLE_STATE_FIELDS):
+    # A GetVehicleState response body with every field, values vary by poll like a real history
+    timestamp = f"2023-04-18T12:{poll // 60 % 60:02d}:{poll % 60:02d}.000Z"
+    state = {}
+    for i, (field, sub_fields) in enumerate(VEHICLE_STATE_FIELDS.items()):
+        if field not in fields:
+            continue
+        entry = {"__typename": "TimeStampedValue"}
+        for sub_field in sub_fields:
+            if sub_field in ('timeStamp', 'lastSync'):
+                entry[sub_field] = timestamp
+            elif i % 3 == 0:
+                entry[sub_field] = ('sleep', 'ready', 'go')[(poll + i) % 3]
+            else:
+                entry[sub_field] = poll * 0.5 + i
+        state[field] = entry
+    return json.dumps({"data": {"vehicleState": state}}).encode()
+
+
+def bench_transport(iterations):
+    # Client overhead of raw_graphql_query over the transport alone (no network either way)
+    rivian = stub_rivian()
+    url = rivian.endpoint_url('gateway')
+    transport = rivian._session
+    return [
+        timing_row('transport', 'transport.post', time_calls(
+            lambda: transport.post(url, json=STATE_QUERY, headers=HEADERS), iterations)),
+        timing_row('transport', 'raw_graphql_query', time_calls(
+            lambda: rivian.raw_graphql_query(url=url, query=STATE_QUERY, headers=HEADERS), iterations)),
+    ]
+
+
+def bench_headers(iterations):
+    rivian = stub_rivian()
+    return [
+        timing_row('headers', 'gateway_headers', time_calls(rivian.gateway_headers, iterations)),
+        timing_row('headers', 'transaction_headers', time_calls(rivian.transaction_headers, iterations)),
+    ]
+
+
+def bench_decode(iterations):
+    # get_vehicle_state end to end (build request, transport, json decode), full vs minimal fields
+    rows = []
+    for name, minimal, fields in (('full', False, VEHICLE_STATE_FIELDS), ('minimal', True, VEHICLE_STATE_MINIMAL_FIELDS)):
+        response_json = json.loads(full_state_response(1, fields))
+        rivian = stub_rivian({"GetVehicleState": response_json})
+        rows.append(timing_row('decode', f"get_vehicle_state {name}", time_calls(
+            lambda: rivian.get_vehicle_state("stub-vehicle", minimal=minimal), iterations)))
+        rows.append(timing_row('decode', f"vehicle_state {name}", time_calls(
+            lambda: rivian.vehicle_state("stub-vehicle", minimal=minimal).powerState, iterations)))
+    return rows
+
+
+@contextlib.contextmanager
+def cli_rivian(responses=None):
+    # rivian_cli with its shared Rivian object swapped for a stub one and output discarded
+    import rivian_cli
+    account = rivian_cli._account.get()
+    saved = rivian_cli._rivians.get(account)
+    rivian = rivian_cli._rivians[account] = stub_rivian(responses)
+    # The CLI always has a limiter, one that never waits
+    rivian.rate_limiter = RateLimiter(rate=1e9, burst=1e9)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            yield rivian_cli
+    finally:
+        if saved is None:
+            rivian_cli._rivians.pop(account, None)
+        else:
+            rivian_cli._rivians[account] = saved
+
+
+def bench_poll(iterations):
+    # One iteration of the CLI poll loop: fetch, decode, diff, format the line
+    args = argparse.Namespace(poll=False, query=True, all=False, poll_adaptive=False, poll_frequency=30,
+                              poll_fast_frequency=10, poll_max_sleep_frequency=600, poll_show_all=False,
+                              poll_inactivity_wait=0, poll_sleep_wait=40 * 60, privacy=False, verbose=False,
+                              metric=False)
+    ctx = {'vehicle_id': "stub-vehicle", 'distance_units_string': 'mph', 'store': None}
+    with cli_rivian() as rivian_cli:
+        return [timing_row('poll', 'section_poll', time_calls(lambda: rivian_cli.section_poll(args, ctx), iterations))]
+
+
+def bench_sessions(iterations, sessions=1000):
+    # charging_sessions building and sorting a long history that arrives out of order
+    summaries = []
+    for i in range(sessions):
+        start = 1640995200 + i * 86400
+        summaries.append({
+            'startInstant': time.strftime('%Y-%m-%dT%H:%M:%S.000Z', time.gmtime(start)),
+            'endInstant': time.strftime('%Y-%m-%dT%H:%M:%S.000Z', time.gmtime(start + 3600)),
+            'totalEnergyKwh': 50.5,
+            'vendor': None,
+            'rangeAddedKm': 200,
+            'transactionId': f"transaction-{i}",
+        })
+    random.Random(0).shuffle(summaries)
+    responses = {"getCompletedSessionSummaries": {"data": {"getCompletedSessionSummaries": summaries}}}
+    with cli_rivian(responses) as rivian_cli:
+        return [timing_row('sessions', f"charging_sessions {sessions}", time_calls(
+            lambda: rivian_cli.charging_sessions(False), iterations))]
+
+
+def bench_polyline(iterations, points=5000):
+    # decode_and_map up to drawing: parse the route response and decode its polyline
+    import polyline
+    import rivian_map
+    route = [(40.5112 + i * 0.0001, -89.0559 - i * 0.0003) for i in range(points)]
+    planned_trip = {"data": {"planTrip": {"routes": [{
+        "routeResponse": json.dumps({"geometry": polyline.encode(route, 6)}),
+        "waypoints": [],
+    }]}}}
+    # Without a key show_map returns before plotting
+    mapbox_api_key = os.environ.pop('MAPBOX_API_KEY', None)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            timings = time_calls(lambda: rivian_map.decode_and_map(planned_trip), iterations)
+    finally:
+        if mapbox_api_key is not None:
+            os.environ['MAPBOX_API_KEY'] = mapbox_api_key
+    return [timing_row('polyline', f"decode_and_map {points} points", timings)]
+
+
+def bench_pool(iterations):
+    with StubServer() as stub:
+        url = stub.base_url + ENDPOINT_PATHS['gateway']
+
+        def unpooled():
+            requests.post(url, json=STATE_QUERY, headers=HEADERS).json()
+
+        session = create_session(base_path=stub.base_url)
+        with Rivian(session=session) as rivian:
+            def pooled():
+                rivian.raw_graphql_query(url=url, query=STATE_QUERY, headers=HEADERS).json()
+
+            rows = [
+                timing_row('pool', 'unpooled', time_calls(unpooled, iterations)),
+                timing_row('pool', 'pooled', time_calls(pooled, iterations)),
+            ]
+        session.close()
+    return rows
+
+
+def bench_persisted(iterations):
+    # Full GetVehicleState document on every request vs automatic persisted queries
+    rows = []
+    for name, persisted in (('documents', False), ('persisted', True)):
+        with StubServer() as stub:
+            with Rivian(base_url=stub.base_url, persisted_queries=persisted) as rivian:
+                rivian.ensure_csrf_token()
+                start_bytes = stub.bytes_received
+                start_requests = stub.requests
+                row = timing_row('persisted', name, time_calls(lambda: rivian.get_vehicle_state("stub-vehicle"),
+                                                               iterations))
+                row['mean_request_bytes'] = (stub.bytes_received - start_bytes) / (stub.requests - start_requests)
+                rows.append(row)
+    return rows
+
+
+def bench_state(polls):
+    # Memory retained by a history of full vehicle states and time to decode one, dicts vs VehicleState
+    def as_dict(raw):
+        return json.loads(raw)['data']['vehicleState']
+
+    def as_model(raw):
+        return VehicleState(raw)
+
+    def as_decoded_model(raw):
+        state = VehicleState(raw)
+        state.powerState
+        return state
+
+    raws = [full_state_response(i) for i in range(polls)]
+    rows = []
+    for name, decode in (('dict', as_dict), ('VehicleState lazy', as_model), ('VehicleState decoded', as_decoded_model)):
+        tracemalloc.start()
+        # Bodies built inside the trace, as if each came off the network and was only kept if decode keeps it
+        history = [decode(full_state_response(i)) for i in range(polls)]
+        retained = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del history
+        start = time.perf_counter()
+        for raw in raws:
+            decode(raw)
+        elapsed = time.perf_counter() - start
+        rows.append({
+            'benchmark': 'state',
+            'name': name,
+            'polls': polls,
+            'retained_bytes_per_poll': retained / polls,
+            'decode_us_per_poll': elapsed / polls * 1000000,
+        })
+    return rows
+
+
+def bench_store(rows, vehicles):
+    # Time a poller spends handing rows to the store vs the time until they're all on disk
+    states = [VehicleState(full_state_response(i)) for i in range(vehicles)]
+    for state in states:
+        state.powerState
+    with tempfile.TemporaryDirectory() as directory:
+        with TimeSeriesStore(os.path.join(directory, 'bench.db')) as store:
+            start = time.perf_counter()
+            for i in range(rows):
+                store.add_state(f"vehicle-{i % vehicles}", states[i % vehicles], i)
+            queued = time.perf_counter() - start
+            store.flush()
+            written = time.perf_counter() - start
+            start = time.perf_counter()
+            store.states('vehicle-0', rows // 2, rows)
+            query = time.perf_counter() - start
+            dropped = store.dropped
+    return [{
+        'benchmark': 'store',
+        'name': f"{vehicles} vehicles",
+        'rows': rows,
+        'add_us_per_row': queued / rows * 1000000,
+        'rows_per_second': rows / written,
+        'dropped': dropped,
+        'query_ms': query * 1000,
+    }]
+
+
+def bench_fleet(sizes, duration, interval, concurrency):
+    # Throughput of the fleet poller by fleet size, 10 vehicles per account, one shared pool
+    rows = []
+    with StubServer() as stub:
+        for size in sizes:
+            session = create_session(pool_size=concurrency, base_path=stub.base_url)
+            accounts = [Rivian(session=session, base_url=stub.base_url) for _ in range(max(1, size // 10))]
+            targets = [(accounts[i % len(accounts)], f"vehicle-{i}") for i in range(size)]
+            polls = 0
+            latencies = []
+            with FleetPoller(targets, interval=interval, concurrency=concurrency) as poller:
+                end = time.monotonic() + duration
+                while time.monotonic() < end:
+                    try:
+                        result = poller.results.get(timeout=0.1)
+                    except queue.Empty:
+                        continue
+                    polls += 1
+                    latencies.append(result.latency)
+            session.close()
+            rows.append({
+                'benchmark': 'fleet',
+                'name': f"{size} vehicles",
+                'polls': polls,
+                'polls_per_second': polls / duration,
+                'mean_latency_ms': statistics.mean(latencies) * 1000 if latencies else 0,
+            })
+    return rows
+
+
+def bench_accounts(accounts, threads, calls):
+    # Many threads calling many accounts of one ClientPool, no request may carry tokens of another
+    # account or of another account's handshake (wrong_account, session_errors, shared_sessions stay 0)
+    with StubServer(handler=AccountCheckHandler, check_sessions=True) as stub:
+        with ClientPool(pool_size=threads, base_url=stub.base_url) as pool:
+            for i in range(accounts):
+                pool.add(i, access_token=f"access-{i}", user_session_token=f"user-session-{i}")
+            start = time.perf_counter()
+            failures = call_accounts(pool, accounts, threads, calls)
+            elapsed = time.perf_counter() - start
+        return [{
+            'benchmark': 'accounts',
+            'name': f"{accounts} accounts {threads} threads",
+            'requests': stub.requests,
+            'requests_per_second': stub.requests / elapsed,
+            'failures': len(failures),
+            'wrong_account': stub.wrong_account,
+            'session_errors': stub.session_errors,
+            'shared_sessions': stub.shared_sessions,
+        }]
+
+
+def imported_modules(importtime_output):
+    # {top level module: cumulative microseconds} from python -X importtime output, and every module seen
+    top_level = {}
+    modules = set()
+    for line in importtime_output.splitlines():
+        if not line.startswith('import time:') or line.endswith('| imported package'):
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if not cumulative.strip().isdigit():
+            continue
+        modules.add(name.strip())
+        if not name[1:].startswith(' '):
+            top_level[name.strip()] = int(cumulative)
+    return top_level, modules
+
+
+def run_cli_startup(args, cwd, env):
+    # importtime output of one CLI run, wall time until it answered
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, '-X', 'importtime', CLI_PATH] + args, cwd=cwd, env=env,
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    if '--poll' in args:
+        for line in process.stdout:
+            if line[:1].isdigit():
+                break
+        elapsed = time.perf_counter() - start
+        process.terminate()
+        _, stderr = process.communicate()
+    else:
+        _, stderr = process.communicate()
+        elapsed = time.perf_counter() - start
+        if process.returncode:
+            raise RuntimeError(f"rivian_cli {' '.join(args)} failed: {stderr[-2000:]}")
+    return stderr, elapsed
+
+
+def bench_startup(runs, budget_ms):
+    # Import time of the CLI's cron paths against the stub (interpreter startup itself not counted), with
+    # a budget and no heavy modules those paths don't need
+    from rivian_credentials import Credentials, FileCredentialStore
+    from rivian_cli import CREDENTIALS_FILE
+    interpreter, _ = imported_modules(subprocess.run([sys.executable, '-X', 'importtime', '-c', 'pass'],
+                                                     capture_output=True, text=True).stderr)
+    rows = []
+    with StubServer() as stub, tempfile.TemporaryDirectory() as directory:
+        FileCredentialStore(os.path.join(directory, CREDENTIALS_FILE)).save(
+            'default', Credentials("stub-access-token", "stub-refresh-token", "stub-user-session-token"))
+        env = dict(os.environ, RIVIAN_BASE_URL=stub.base_url)
+        for name, args in STARTUP_COMMANDS.items():
+            import_ms, wall_ms = [], []
+            for _ in range(runs):
+                stderr, elapsed = run_cli_startup(args, directory, env)
+                top_level, modules = imported_modules(stderr)
+                import_ms.append(sum(us for module, us in top_level.items() if module not in interpreter) / 1000)
+                wall_ms.append(elapsed * 1000)
+            excluded = sorted(m for m in STARTUP_EXCLUDED_MODULES if m in modules)
+            rows.append({
+                'benchmark': 'startup',
+                'name': name,
+                'import_ms': statistics.median(import_ms),
+                'wall_ms': statistics.median(wall_ms),
+                'budget_ms': budget_ms,
+                'over_budget': int(statistics.median(import_ms) > budget_ms),
+                'heavy_modules': ','.join(excluded),
+            })
+    return rows
+
+
+def bench_daemon(runs, latency=0.05):
+    # Wall time of a cron style rivian_cli --query run by itself and by a warm --daemon, against a stub
+    # answering after `latency` seconds like the real API would
+    from rivian_credentials import Credentials, FileCredentialStore
+    from rivian_cli import CREDENTIALS_FILE
+    from rivian_daemon import DEFAULT_SOCKET
+    rows = []
+    with StubServer(latency=latency) as stub, tempfile.TemporaryDirectory() as directory:
+        FileCredentialStore(os.path.join(directory, CREDENTIALS_FILE)).save(
+            'default', Credentials("stub-access-token", "stub-refresh-token", "stub-user-session-token"))
+        env = dict(os.environ, RIVIAN_BASE_URL=stub.base_url)
+        env.pop('RIVIAN_DAEMON_SOCKET', None)
+        query = [sys.executable, CLI_PATH, '--query', '--vehicle_id', 'stub-vehicle']
+        daemon = subprocess.Popen([sys.executable, CLI_PATH, '--daemon'], cwd=directory, env=env,
+                                  stdout=subprocess.PIPE, text=True)
+        try:
+            # Up once it says so
+            daemon.stdout.readline()
+            for name, args in (('direct', query + ['--no_daemon']), ('daemon', query)):
+                requests_before = stub.requests
+                timings = []
+                for _ in range(runs):
+                    start = time.perf_counter()
+                    subprocess.run(args, cwd=directory, env=env, capture_output=True, check=True)
+                    timings.append(time.perf_counter() - start)
+                row = timing_row('daemon', f"query {name}", timings)
+                row['requests_per_run'] = (stub.requests - requests_before) / runs
+                rows.append(row)
+        finally:
+            daemon.terminate()
+            daemon.wait()
+        if os.path.exists(os.path.join(directory, DEFAULT_SOCKET)):
+            raise RuntimeError("Daemon left its socket behind")
+    return rows
+
+
+def charging_history_response(points, start=0):
+    # getLiveSessionHistory body of a session `points` seconds long, in the (unsorted) order it comes in
+    chart_data = [{"time": f"2023-04-18T{(start + i) // 3600 % 24:02d}:{(start + i) // 60 % 60:02d}:"
+                           f"{(start + i) % 60:02d}.000Z", "kw": 150 - i % 50} for i in range(points)]
+    random.Random(points).shuffle(chart_data)
+    return {"data": {"getLiveSessionHistory": {"chartData": chart_data}}}
+
+
+def bench_charging(points, polls):
+    # Following a session that grows by a point a second, polled every 30 seconds: re-fetching and sorting
+    # the whole history (as live_charging_history does) against follow_charging_history. Both decode the
+    # full response, the follower only sorts and keeps what's new.
+    rows = []
+    responses = [charging_history_response(points + poll * 30) for poll in range(polls)]
+    for name in ('full sort', 'follow'):
+        rivian = stub_rivian()
+        transport = rivian._session
+        answers = iter(responses)
+
+        def next_response():
+            transport.responses['getLiveSessionHistory'] = next(answers)
+            transport._bodies.clear()
+
+        if name == 'follow':
+            history = ChargingHistory(maxlen=1000)
+            follower = follow_charging_history(rivian, "stub-vehicle", interval=0, history=history,
+                                               sleep=lambda seconds: next_response())
+            next_response()
+            # The first poll hands out the whole session so far, every further one the 30 new points
+            for _ in range(points):
+                next(follower)
+            poll = lambda: [next(follower) for _ in range(30)]
+        else:
+            def poll():
+                next_response()
+                history = rivian.get_live_session_history("stub-vehicle")['data']['getLiveSessionHistory']['chartData']
+                history.sort(key=lambda x: x['time'])
+        row = timing_row('charging', f"{name} {points} points", time_calls(poll, polls - 1))
+        # What a dashboard holds on to between polls
+        row['points_kept'] = len(history.points) if name == 'follow' else points + (polls - 1) * 30
+        rows.append(row)
+    return rows
+
+
+def format_value(value):
+    return f"{value:.3f}" if isinstance(value, float) else str(value)
+
+
+def report(rows):
+    for row in rows:
+        metrics = ' '.join(f"{key}={format_value(value)}" for key, value in row.items()
+                           if key not in ('benchmark', 'name'))
+        print(f"{row['benchmark']} {row['name']}: {metrics}")
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save(path, rows):
+    with open(path, 'w') as f:
+        json.dump({
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'time': time.time(),
+            'results': rows,
+        }, f, indent=2)
+
+
+def compare(path, rows):
+    # Change of every metric that's also in the saved results, e.g. a baseline from another commit
+    with open(path) as f:
+        baseline = json.load(f)
+    previous = {(row['benchmark'], row['name']): row for row in baseline['results']}
+    print(f"Compared to {baseline.get('commit') or path}:")
+    for row in rows:
+        old = previous.get((row['benchmark'], row['name']))
+        if not old:
+            continue
+        changes = []
+        for key, value in row.items():
+            if isinstance(value, (int, float)) and isinstance(old.get(key), (int, float)) and old[key]:
+                changes.append(f"{key} {(value - old[key]) / old[key] * 100:+.1f}%")
+        print(f"{row['benchmark']} {row['name']}: {' '.join(changes)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rivian API benchmarks (offline, against a local stub)')
+    parser.add_argument('benchmarks', help=f"Benchmarks to run ({', '.join(BENCHMARKS)}), defaults to all",
+                        nargs='*')
+    parser.add_argument('--iterations', help='Calls per benchmark', required=False, default=500, type=int)
+    parser.add_argument('--state_polls', help='Vehicle states kept for the state benchmark', required=False,
+                        default=2000, type=int)
+    parser.add_argument('--store_rows', help='Rows written by the store benchmark', required=False,
+                        default=50000, type=int)
+    parser.add_argument('--fleet_sizes', help='Comma separated fleet sizes', required=False, default='1,10,100,1000')
+    parser.add_argument('--fleet_duration', help='Seconds to run each fleet size', required=False, default=5, type=float)
+    parser.add_argument('--fleet_interval', help='Poll interval per vehicle in seconds', required=False, default=1, type=float)
+    parser.add_argument('--fleet_concurrency', help='Fleet poller concurrency', required=False, default=32, type=int)
+    parser.add_argument('--accounts', help='Accounts for the accounts benchmark', required=False, default=50, type=int)
+    parser.add_argument('--threads', help='Threads for the accounts benchmark', required=False, default=16, type=int)
+    parser.add_argument('--charging_points', help='Points in the session the charging benchmark follows',
+                        required=False, default=3600, type=int)
+    parser.add_argument('--startup_runs', help='CLI runs per startup path', required=False, default=5, type=int)
+    parser.add_argument('--startup_budget_ms', help='Import time budget of the CLI startup paths', required=False,
+                        default=DEFAULT_STARTUP_BUDGET_MS, type=float)
+    parser.add_argument('--json', help='Save results to this file', required=False)
+    parser.add_argument('--compare', help='Show changes against results saved with --json', required=False)
+    args = parser.parse_args()
+    benchmarks = args.benchmarks or BENCHMARKS
+    for name in benchmarks:
+        if name not in BENCHMARKS:
+            parser.error(f"Unknown benchmark: {name}")
+    runs = {
+        'transport': lambda: bench_transport(args.iterations),
+        'headers': lambda: bench_headers(args.iterations),
+        'decode': lambda: bench_decode(args.iterations),
+        'poll': lambda: bench_poll(args.iterations),
+        'sessions': lambda: bench_sessions(args.iterations),
+        'polyline': lambda: bench_polyline(args.iterations),
+        'pool': lambda: bench_pool(args.iterations),
+        'persisted': lambda: bench_persisted(args.iterations),
+        'state': lambda: bench_state(args.state_polls),
+        'store': lambda: bench_store(args.store_rows, 1000),
+        'fleet': lambda: bench_fleet([int(s) for s in args.fleet_sizes.split(',')], args.fleet_duration,
+                                     args.fleet_interval, args.fleet_concurrency),
+        'accounts': lambda: bench_accounts(args.accounts, args.threads, args.iterations),
+        'startup': lambda: bench_startup(args.startup_runs, args.startup_budget_ms),
+        'daemon': lambda: bench_daemon(args.startup_runs),
+        'charging': lambda: bench_charging(args.charging_points, 50),
+    }
+    rows = []
+    for name in BENCHMARKS:
+        if name not in benchmarks:
+            continue
+        try:
+            results = runs[name]()
+        except ImportError as e:
+            if name not in CLI_BENCHMARKS:
+                raise
+            print(f"Skipping {name}, CLI dependencies missing: {e}")
+            continue
+        report(results)
+        rows.extend(results)
+    if args.json:
+        save(args.json, rows)
+    if args.compare:
+        compare(args.compare, rows)
+    # Requests sent with another account's tokens are a bug, not a slowdown
+    if any(row.get(key) for row in rows for key in ('failures', 'wrong_account', 'session_errors', 'shared_sessions')):
+        sys.exit("Requests failed or mixed up account sessions")
+    if any(row.get('over_budget') or row.get('heavy_modules') for row in rows):
+        sys.exit("CLI startup over its import time budget or loading modules it doesn't need")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: no advisory locks, writes are still atomic
+    fcntl = None
+
+# TTL cache of responses for account data that rarely changes. Entries are keyed by account,
+# operationName and variables and kept in memory, and in a JSON file when a path is given so later
+# runs can use them too, readable by the user only (they hold addresses and payment details). Only
+# successful responses (status 200, no errors) are cached. Processes sharing the file apply their
+# changes to what's in it under an advisory lock, so they don't drop each other's entries.
+
+HOUR = 60 * 60
+# operationName -> seconds a response stays valid
+DEFAULT_TTLS = {
+    'vehicleOrders': 24 * HOUR,
+    'order': 24 * HOUR,
+    'getUserInfo': 24 * HOUR,
+    'user': 24 * HOUR,
+    'paymentMethods': 24 * HOUR,
+    'getRegisteredWallboxes': 24 * HOUR,
+    'GetProvisionedCampSpeakers': 24 * HOUR,
+    'getVehicleImages': 7 * 24 * HOUR,
+}
+
+
+class CachedResponse:
+    # Just enough of requests.Response for the client methods
+    reason = 'OK'
+    status_code = 200
+
+    def __init__(self, content):
+        self.content = content
+
+    def json(self):
+        return json.loads(self.content)
+
+
+def account_key(identity):
+    # Accounts are told apart by a hash of their identity (name, username or session token), never stored as is
+    return hashlib.sha256(identity.encode()).hexdigest()[:16]
+
+
+def cache_key(account, operation_name, variables):
+    return f"{account}:{operation_name}:{json.dumps(variables or {}, sort_keys=True)}"
+
+
+class ResponseCache:
+    def __init__(self, path=None, ttls=None, clock=time.time):
+        self.path = path
+        self.ttls = dict(DEFAULT_TTLS if ttls is None else ttls)
+        self.clock = clock
+        self.hits = {}
+        self.misses = {}
+        self._lock = threading.Lock()
+        # key -> (operationName, expires at, response body)
+        self._entries = {}
+        # (mtime, size) of the file as this object last wrote it
+        self._written = None
+        if path and os.path.exists(path):
+            self._load()
+
+    @contextmanager
+    def _locked(self):
+        # Advisory lock shared with other processes, on its own file since the data file gets replaced
+        if fcntl is None:
+            yield
+            return
+        fd = os.open(f"{self.path}.lock", os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)
+
+    def _read(self):
+        # Unexpired entries of the file, None when it's unchanged since this object wrote it
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return {}
+        if self._written == (stat.st_mtime_ns, stat.st_size):
+            return None
+        try:
+            with open(self.path) as f:
+                entries = json.load(f)
+        except ValueError:
+            return {}
+        now = self.clock()
+        return {key: tuple(entry) for key, entry in entries.items() if entry[1] > now}
+
+    def _load(self):
+        self._entries = self._read()
+        # Written by earlier versions with the umask's permissions
+        os.chmod(self.path, 0o600)
+
+    def _save(self, changed=(), dropped=None):
+        # Writes this object's changed keys over the file as it is now, without the entries dropped(key, entry)
+        # is true for. Entries other processes wrote meanwhile are kept (and picked up), expired ones dropped.
+        if not self.path:
+            return
+        with self._locked():
+            entries = self._read()
+            if entries is None:
+                now = self.clock()
+                entries = {key: entry for key, entry in self._entries.items() if entry[1] > now}
+            else:
+                if dropped:
+                    entries = {key: entry for key, entry in entries.items() if not dropped(key, entry)}
+                for key in changed:
+                    entries[key] = self._entries[key]
+            self._entries = entries
+            # Written aside and renamed so a concurrent reader never sees half a file
+            temporary = f"{self.path}.{os.getpid()}.tmp"
+            fd = os.open(temporary, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w') as f:
+                json.dump(entries, f)
+            os.replace(temporary, self.path)
+            stat = os.stat(self.path)
+            self._written = (stat.st_mtime_ns, stat.st_size)
+
+    def cacheable(self, operation_name):
+        return operation_name in self.ttls
+
+    def get(self, account, query):
+        # CachedResponse for a fresh entry, None otherwise
+        operation_name = query.get('operationName')
+        key = cache_key(account, operation_name, query.get('variables'))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] <= self.clock():
+                self.misses[operation_name] = self.misses.get(operation_name, 0) + 1
+                return None
+            self.hits[operation_name] = self.hits.get(operation_name, 0) + 1
+        return CachedResponse(entry[2].encode())
+
+    def put(self, account, query, response):
+        operation_name = query.get('operationName')
+        if response.status_code != 200 or b'"errors"' in response.content:
+            return
+        key = cache_key(account, operation_name, query.get('variables'))
+        with self._lock:
+            self._entries[key] = (operation_name, self.clock() + self.ttls[operation_name],
+                                  response.content.decode())
+            self._save(changed=[key])
+
+    def invalidate(self, operation_name=None, account=None):
+        # Drops entries of one operation and/or account, everything without arguments
+        def dropped(key, entry):
+            return (operation_name is None or entry[0] == operation_name) and \
+                (account is None or key.startswith(f"{account}:"))
+
+        with self._lock:
+            self._entries = {key: entry for key, entry in self._entries.items() if not dropped(key, entry)}
+            self._save(dropped=dropped)
+
+    def stats(self):
+        # {operationName: (hits, misses)}
+        with self._lock:
+            return {name: (self.hits.get(name, 0), self.misses.get(name, 0))
+                    for name in set(self.hits) | set(self.misses)}
@@ -0,0 +1,132 @@
+import time
+from collections import deque, namedtuple
+from datetime import datetime, timezone
+
+try:
+    from . import rivian_queries as queries
+except ImportError:
+    import rivian_queries as queries
+
+# Follows the live charging history of a session as it grows. getLiveSessionHistory always answers
+# with every point of the session, ChargingHistory keeps a watermark (the latest time seen) so each
+# response is scanned once and only the points after it are sorted, kept and handed out:
+#
+#     for point in follow_charging_history(rivian, vehicle_id, interval=30):
+#         print(point.time, point.kw)
+#
+# Points keep the API's ISO 8601 time strings. Strings laid out like the watermark (same length, date/time
+# separator and offset, as the API's all are) sort like the times they stand for and are compared as they
+# are, anything else ('...00Z' against '...00.000Z', other offsets) is parsed first.
+
+DEFAULT_INTERVAL = 30
+
+ChargePoint = namedtuple('ChargePoint', ['time', 'kw'])
+
+
+def point_time(value):
+    # A chartData time (or epoch seconds) as an aware datetime, times without an offset are UTC
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value, timezone.utc)
+    # Any ISO 8601 variant (fromisoformat only takes some of them before Python 3.11), only needed here
+    from dateutil.parser import isoparse
+    parsed = isoparse(value)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def time_layout(value):
+    # (length, date/time separator, offset) of an ISO time whose strings sort like their times when these
+    # match, None when it has no offset
+    if value.endswith('Z'):
+        offset = 'Z'
+    elif len(value) > 19 and value[-6] in '+-' and value[-3] == ':':
+        offset = value[-6:]
+    else:
+        return None
+    return len(value), value[10:11], offset
+
+
+def chart_data(response_json):
+    # chartData points of a getLiveSessionHistory response, none when there's no session
+    history = ((response_json or {}).get('data') or {}).get('getLiveSessionHistory') or {}
+    return history.get('chartData') or []
+
+
+class ChargingHistory:
+    def __init__(self, maxlen=None, watermark=None):
+        # maxlen: points kept in `points` (the latest ones), None keeps all of them. watermark: time of
+        # the last point already seen (ISO string or epoch seconds), e.g. from an earlier run.
+        self.points = deque(maxlen=maxlen)
+        self.watermark = None
+        if watermark is not None:
+            self._set_watermark(watermark if isinstance(watermark, str) else point_time(watermark).isoformat())
+
+    def _set_watermark(self, value):
+        self.watermark = value
+        self._watermark_time = None
+        self._layout = time_layout(value)
+
+    def _after_watermark(self, value):
+        # Slow path for times laid out differently than the watermark
+        if self._watermark_time is None:
+            self._watermark_time = point_time(self.watermark)
+        return point_time(value) > self._watermark_time
+
+    def update(self, data):
+        # New points (after the watermark) in time order from a full chartData list
+        watermark = self.watermark
+        if watermark is None:
+            new = [ChargePoint(p['time'], p['kw']) for p in data]
+        elif self._layout is None:
+            new = [ChargePoint(p['time'], p['kw']) for p in data if self._after_watermark(p['time'])]
+        else:
+            length, separator, offset = self._layout
+            new = []
+            for p in data:
+                value = p['time']
+                if len(value) == length and value.endswith(offset) and value[10:11] == separator:
+                    if value > watermark:
+                        new.append(ChargePoint(value, p['kw']))
+                elif self._after_watermark(value):
+                    new.append(ChargePoint(value, p['kw']))
+        if not new:
+            return new
+        layout = time_layout(new[0].time)
+        if layout is not None and all(time_layout(p.time) == layout for p in new):
+            new.sort()
+        else:
+            new.sort(key=lambda p: point_time(p.time))
+        self.points.extend(new)
+        self._set_watermark(new[-1].time)
+        return new
+
+
+def follow_charging_history(rivian, vehicle_id, interval=DEFAULT_INTERVAL, history=None, max_idle=None,
+                            sleep=time.sleep):
+    # Yields new ChargePoints as a Rivian object polls the session every `interval` seconds. Ends after
+    # max_idle polls in a row without new points (e.g. once charging stopped), None follows until closed.
+    # Waits are cut short by an enclosing rivian_timeout.Deadline.
+    history = history or ChargingHistory()
+    idle = 0
+    while True:
+        new = history.update(chart_data(rivian.execute(queries.get_live_session_history(vehicle_id)).json()))
+        yield from new
+        idle = 0 if new else idle + 1
+        if max_idle is not None and idle >= max_idle:
+            return
+        rivian.pause(interval, sleep)
+
+
+async def follow_charging_history_async(rivian, vehicle_id, interval=DEFAULT_INTERVAL, history=None,
+                                        max_idle=None):
+    # follow_charging_history for AsyncRivian, an async iterator
+    history = history or ChargingHistory()
+    idle = 0
+    while True:
+        response = await rivian.execute(queries.get_live_session_history(vehicle_id))
+        new = history.update(chart_data(response.json()))
+        for point in new:
+            yield point
+        idle = 0 if new else idle + 1
+        if max_idle is not None and idle >= max_idle:
+            return
+        await rivian.pause(interval)
@@ -1,60 +1,135 @@
 #!/usr/bin/env python
 # encoding: utf-8
+import os
 import sys
+
+if __name__ == '__main__':
+    # Answered by a running daemon (see --daemon) when there is one, before the slow imports below
+    from rivian_daemon import forward
+    status = forward(sys.argv[1:])
+    if status is not None:
+        sys.exit(status)
+
 import argparse
+import contextlib
+import contextvars
+import io
+import traceback
 from rivian_api import *
-from rivian_map import *
-import pickle
-from dateutil.parser import parse
-from dateutil import tz
+from rivian_schedule import AdaptivePolicy, FixedPolicy, PollScheduler
+from rivian_diff import DEFAULT_IGNORED, StateDiff
+from rivian_limit import DEFAULT_RATE, RateLimiter
+from rivian_retry import CircuitBreaker, RetryPolicy
+from rivian_cache import ResponseCache, account_key
+from rivian_charging import ChargingHistory, follow_charging_history
+from rivian_credentials import DEFAULT_ACCOUNT, FileCredentialStore, Credentials, attach, credentials_of, tokens
 import time
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime, timedelta
 
-from dotenv import load_dotenv
-load_dotenv()
+# Cron runs this every minute, so startup counts: modules only some commands need (maps and geocoding,
+# dateutil, dotenv, the store, recorder and metrics server) are imported by those commands.
+# bin/rivian_bench startup checks the import time of the common paths.
 
+CREDENTIALS_FILE = 'rivian_auth.json'
+# Where earlier versions kept the tokens, read once to fill CREDENTIALS_FILE
 PICKLE_FILE = 'rivian_auth.pickle'
+# Account data that rarely changes (orders, user info, ...), see rivian_cache.py
+CACHE_FILE = 'rivian_cache.json'
+# RIVIAN_BASE_URL points the CLI at a stub (see rivian_stub.py), RIVIAN_RECORD saves responses to replay there
+BASE_URL = os.getenv('RIVIAN_BASE_URL', RIVIAN_BASE_PATH)
+# Settings as the process started, before load_env adds the .env file's (a daemon compares them with the CLI's)
+_environment = dict(os.environ)
+
+# One authenticated object per account and process so the CSRF handshake is shared by every command
+# (and by every command a daemon runs)
+_rivians = {}
+_rivian_lock = threading.Lock()
+# Set up with the first Rivian object when RIVIAN_METRICS_PORT is set, shared by all of them
+_metrics = None
+# Set up by main unless --no_cache
+_cache = None
+# --follow_charging stops after this many polls without new points
+FOLLOW_CHARGING_MAX_IDLE = 10
+# Account in CREDENTIALS_FILE used by the command, set by main (--account). A context variable so a
+# daemon's commands, and the section threads each of them starts, have their own
+_account = contextvars.ContextVar('account', default=DEFAULT_ACCOUNT)
+_credential_store = FileCredentialStore(CREDENTIALS_FILE)
 
 
 def save_state(rivian):
-    state = {
-        "_access_token": rivian._access_token,
-        "_refresh_token": rivian._refresh_token,
-        "_user_session_token": rivian._user_session_token,
-    }
-    with open(PICKLE_FILE, 'wb') as f:
-        pickle.dump(state, f)
+    _credential_store.save(_account.get(), credentials_of(rivian))
 
 
-def restore_state(rivian):
-    while True:
-        try:
-            rivian.create_csrf_token()
-            break
-        except Exception as e:
-            time.sleep(5)
+def import_pickle():
+    # Copies tokens saved by earlier versions into the credential store, the old file is left alone
+    if not os.path.exists(PICKLE_FILE) or _credential_store.load(DEFAULT_ACCOUNT) is not None:
+        return
+    import pickle
+    with open(PICKLE_FILE, 'rb') as f:
+        obj = pickle.load(f)
+    _credential_store.save(DEFAULT_ACCOUNT, Credentials(
+        obj['_access_token'], obj['_refresh_token'], obj['_user_session_token'], obj.get('_csrf_token', ""),
+        obj.get('_app_session_token', ""), obj.get('_csrf_expires_at', 0)))
+
 
+def restore_state(rivian):
     RIVIAN_AUTHORIZATION = os.getenv('RIVIAN_AUTHORIZATION')
     if RIVIAN_AUTHORIZATION:
-        rivian._access_token, rivian._refresh_token, rivian._user_session_token = RIVIAN_AUTHORIZATION.split(';')
-    elif os.path.exists(PICKLE_FILE):
-        with open(PICKLE_FILE, 'rb') as f:
-            obj = pickle.load(f)
-        rivian._access_token = obj['_access_token']
-        rivian._refresh_token = obj['_refresh_token']
-        rivian._user_session_token = obj['_user_session_token']
+        rivian.set_tokens(*RIVIAN_AUTHORIZATION.split(';'))
     else:
-        raise Exception("Please log in first")
+        import_pickle()
+        # Refreshed handshakes and access tokens are saved as they change, so the next invocation can
+        # skip CreateCSRFToken and doesn't have to log in again
+        if attach(rivian, _credential_store, _account.get()) is None:
+            raise Exception("Please log in first")
+
+    # Retried by the object's own policy, failures that aren't worth retrying end the command right away
+    rivian.ensure_csrf_token()
 
 
 def get_rivian_object():
-    rivian = Rivian()
-    restore_state(rivian)
+    global _metrics
+    account = _account.get()
+    with _rivian_lock:
+        rivian = _rivians.get(account)
+        if rivian is None:
+            if os.getenv('RIVIAN_METRICS_PORT') and _metrics is None:
+                # Prometheus endpoint for the request metrics, mostly useful with --poll
+                from rivian_metrics import Metrics
+                _metrics = Metrics()
+                _metrics.serve(port=int(os.getenv('RIVIAN_METRICS_PORT')))
+            # Requests per second, the limiter also slows down on its own when Rivian answers RATE_LIMIT
+            rate_limiter = RateLimiter(rate=float(os.getenv('RIVIAN_RATE_LIMIT', DEFAULT_RATE)))
+            # Cached data is the account's, tokens given in RIVIAN_AUTHORIZATION are their own account
+            rivian = Rivian(base_url=BASE_URL, persisted_queries=os.getenv('RIVIAN_PERSISTED_QUERIES') == '1',
+                            metrics=_metrics, rate_limiter=rate_limiter, retry_policy=RetryPolicy(),
+                            circuit_breaker=CircuitBreaker(), cache=_cache,
+                            account=None if os.getenv('RIVIAN_AUTHORIZATION') else account)
+            if os.getenv('RIVIAN_RECORD'):
+                from rivian_stub import Recorder
+                Recorder(os.getenv('RIVIAN_RECORD')).attach(rivian)
+            restore_state(rivian)
+            _rivians[account] = rivian
     return rivian
 
 
+def drop_stale_clients():
+    # Objects whose account was saved with other tokens (a new --login, another process refreshing
+    # them) are set up again from the store on next use
+    if os.getenv('RIVIAN_AUTHORIZATION'):
+        return
+    with _rivian_lock:
+        for account, rivian in list(_rivians.items()):
+            stored = _credential_store.load(account)
+            if stored is None or tokens(stored) != tokens(credentials_of(rivian)):
+                # Not closed, commands still running with it finish first (its connections go with it)
+                del _rivians[account]
+
+
 def login_with_password(verbose):
-    rivian = Rivian()
+    rivian = Rivian(base_url=BASE_URL)
     try:
         rivian.login(os.getenv('RIVIAN_USERNAME'), os.getenv('RIVIAN_PASSWORD'))
     except Exception as e:
@@ -66,7 +141,7 @@ def login_with_password(verbose):
 
 def login_with_otp(verbose, otp_token):
     otpCode = input('Enter OTP: ')
-    rivian = Rivian()
+    rivian = Rivian(base_url=BASE_URL)
     try:
         rivian.login_with_otp(
             username=os.getenv('RIVIAN_USERNAME'),
@@ -89,6 +164,9 @@ def login(verbose):
     if rivian:
         print("Login successful")
         save_state(rivian)
+        if _cache is not None:
+            # The account name could now belong to someone else
+            _cache.invalidate(account=account_key(_account.get()))
     return
 
 
@@ -264,6 +342,23 @@ def get_vehicle_state(vehicle_id, verbose, minimal=False):
         return None
 
 
+def get_vehicle_state_model(vehicle_id, verbose):
+    rivian = get_rivian_object()
+    try:
+        state = rivian.vehicle_state(vehicle_id=vehicle_id)
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        return None
+    if verbose:
+        print(f"get_vehicle_state:\n{state if state.ok else state.errors}")
+    return state if state.ok else None
+
+
+def parse(timestamp):
+    from dateutil.parser import parse as parse_timestamp
+    return parse_timestamp(timestamp)
+
+
 def get_vehicle_last_seen(vehicle_id, verbose):
     rivian = get_rivian_object()
     try:
@@ -519,15 +614,7 @@ def vehicle_command(command, vehicle_id=None, verbose=False):
 
 def test_graphql(verbose):
     rivian = get_rivian_object()
-    query = {
-        "operationName": "GetAdventureFeed",
-        "query": 'query GetAdventureFeed($locale: String!, $slug: String!) { egAdventureFeedCollection(locale: $locale, limit: 1, where: { slug: $slug } ) { items { slug entryTitle cardsCollection(limit: 15) { items { __typename ... on EgAdventureFeedStoryCard { slug entryTitle title subtitle cover { entryTitle sourcesCollection(limit: 1) { items { entryTitle media auxiliaryData { __typename ... on EgImageAuxiliaryData { altText } } } } } slidesCollection { items { entryTitle duration theme gradient mediaCollection(limit: 2) { items { __typename ... on EgCloudinaryMedia { entryTitle sourcesCollection(limit: 1) { items { entryTitle media auxiliaryData { __typename ... on EgImageAuxiliaryData { altText } } } } } ... on EgLottieAnimation { entryTitle altText media mode } } } } } } ... on EgAdventureFeedEditorialCard { slug entryTitle title subtitle cover { entryTitle sourcesCollection(limit: 1) { items { entryTitle media auxiliaryData { __typename ... on EgImageAuxiliaryData { altText } } } } } sectionsCollection { items { entryTitle theme mediaCollection(limit: 2) { items { __typename ... on EgCloudinaryMedia { entryTitle sourcesCollection(limit: 1) { items { entryTitle media auxiliaryData { __typename ... on EgImageAuxiliaryData { altText } } } } } ... on EgLottieAnimation { entryTitle altText media mode } } } } } } } } } } }',
-        "variables": {
-            "locale": "en_US",
-        },
-    }
-    response = rivian.raw_graphql_query(url=RIVIAN_CONTENT_PATH, query=query, headers=rivian.gateway_headers())
-    response_json = response.json()
+    response_json = rivian.get_adventure_feed()
     if verbose:
         print(f"test_graphql:\n{response_json}")
 
@@ -540,6 +627,7 @@ def get_local_time(ts):
             return
     else:
         t = ts
+    from dateutil import tz
     to_zone = tz.tzlocal()
     if t:
         t = t.astimezone(to_zone)
@@ -588,110 +676,9 @@ def get_elapsed_time_string(elapsed_time_in_seconds):
     return f"{hours} hours, {minutes} minutes, {seconds} seconds"
 
 
-def main():
-    parser = argparse.ArgumentParser(description='Rivian CLI')
-    parser.add_argument('--login', help='Login to account', required=False, action='store_true')
-    parser.add_argument('--user', help='Display user info', required=False, action='store_true')
-    parser.add_argument('--vehicles', help='Display vehicles', required=False, action='store_true')
-    parser.add_argument('--chargers', help='Display chargers', required=False, action='store_true')
-    parser.add_argument('--speakers', help='Display Speakers', required=False, action='store_true')
-    parser.add_argument('--images', help='Display Image URLs', required=False, action='store_true')
-    parser.add_argument('--vehicle_orders', help='Display vehicle orders', required=False, action='store_true')
-    parser.add_argument('--retail_orders', help='Display retail orders', required=False, action='store_true')
-    parser.add_argument('--payment_methods', help='Show payment methods', required=False, action='store_true')
-    parser.add_argument('--test', help='For testing graphql queries', required=False, action='store_true')
-    parser.add_argument('--charge_ids', help='Show charge_ids', required=False, action='store_true')
-    parser.add_argument('--verbose', help='Verbose output', required=False, action='store_true')
-    parser.add_argument('--privacy', help='Fuzz order/vin info', required=False, action='store_true')
-    parser.add_argument('--state', help='Get vehicle state', required=False, action='store_true')
-    parser.add_argument('--vehicle', help='Get vehicle access info', required=False, action='store_true')
-    parser.add_argument('--vehicle_id', help='Vehicle to query (defaults to first one found)', required=False)
-    parser.add_argument('--last_seen', help='Timestamp vehicle was last seen', required=False, action='store_true')
-    parser.add_argument('--user_info', help='Show user information', required=False, action='store_true')
-    parser.add_argument('--ota', help='Show user information', required=False, action='store_true')
-    parser.add_argument('--poll', help='Poll vehicle state', required=False, action='store_true')
-    parser.add_argument('--poll_frequency', help='Poll frequency', required=False, default=30, type=int)
-    parser.add_argument('--poll_show_all', help='Show all poll results even if no changes occurred', required=False, action='store_true')
-    parser.add_argument('--poll_inactivity_wait',
-                        help='If not sleeping and nothing changes for this period of time '
-                             'then do a poll_sleep_wait. Defaults to 0 for continual polling '
-                             'at poll_frequency',
-                        required=False, default=0, type=int)
-    parser.add_argument('--poll_sleep_wait',
-                        help='# How long to stop polling to let car go to sleep (depends on poll_inactivity_wait)',
-                        required=False, default=40*60, type=int)
-    parser.add_argument('--query', help='Single poll instance (quick poll)', required=False, action='store_true')
-    parser.add_argument('--metric', help='Use metric vs imperial units', required=False, action='store_true')
-    parser.add_argument('--plan_trip', help='Plan a trip - starting soc, starting range in meters, origin lat,origin long,dest lat,dest long', required=False)
-
-    parser.add_argument('--charging_schedule', help='Get charging schedule', required=False, action='store_true')
-    parser.add_argument('--charge_sessions', help='Get charging sessions', required=False, action='store_true')
-    parser.add_argument('--last_charge', help='Get last charge session', required=False, action='store_true')
-    parser.add_argument('--charge_session', help='Get current charging session', required=False, action='store_true')
-    parser.add_argument('--live_charging_session', help='Get live charging session', required=False, action='store_true')
-    parser.add_argument('--live_charging_history', help='Get live charging session history', required=False, action='store_true')
-
-    parser.add_argument('--all', help='Run all commands silently as a sort of test of all commands', required=False, action='store_true')
-    parser.add_argument('--command', help='Send vehicle a command', required=False,
-                        choices=['WAKE_VEHICLE',
-                                 'OPEN_FRUNK',
-                                 'CLOSE_FRUNK',
-                                 'OPEN_ALL_WINDOWS',
-                                 'CLOSE_ALL_WINDOWS',
-                                 'UNLOCK_ALL_CLOSURES',
-                                 'LOCK_ALL_CLOSURES',
-                                 'ENABLE_GEAR_GUARD_VIDEO',
-                                 'DISABLE_GEAR_GUARD_VIDEO',
-                                 'HONK_AND_FLASH_LIGHTS',
-                                 'OPEN_TONNEAU_COVER',
-                                 'CLOSE_TONNEAU_COVER',
-                                 ]
-                        )
-    args = parser.parse_args()
-    original_stdout = sys.stdout
-
-    if args.all:
-        print("Running all commands silently")
-        f = open(os.devnull, 'w')
-        sys.stdout = f
-
-    if args.login:
-        login(args.verbose)
-
-    rivian_info = {
-        'vehicle_orders': [],
-        'retail_orders': [],
-        'vehicles': [],
-    }
-
-    if args.metric:
-        distance_units = "km"
-        distance_units_string = "kph"
-        temp_units_string = "C"
-    else:
-        distance_units = "mi"
-        distance_units_string = "mph"
-        temp_units_string = "F"
-
-    vehicle_id = None
-    if args.vehicle_id:
-        vehicle_id = args.vehicle_id
-
-    needs_vehicle = args.vehicles or \
-                    args.vehicle or \
-                    args.state or \
-                    args.last_seen or \
-                    args.ota or \
-                    args.poll or \
-                    args.query or \
-                    args.plan_trip or \
-                    args.user_info or \
-                    args.charge_session or \
-                    args.live_charging_session or \
-                    args.live_charging_history or \
-                    args.charging_schedule or \
-                    args.all
-
+def section_vehicle_orders(args, ctx):
+    rivian_info = ctx['rivian_info']
+    needs_vehicle = ctx['needs_vehicle']
     if args.vehicle_orders or (needs_vehicle and not args.vehicle_id):
         verbose = args.vehicle_orders and args.verbose
         rivian_info['vehicle_orders'] = vehicle_orders(verbose)
@@ -752,6 +739,9 @@ def main():
         else:
             print("No Vehicle Orders found")
 
+
+def section_retail_orders(args, ctx):
+    rivian_info = ctx['rivian_info']
     if args.retail_orders or args.all:
         rivian_info['retail_orders'] = retail_orders(args.verbose)
         if len(rivian_info['retail_orders']):
@@ -767,6 +757,11 @@ def main():
         else:
             print("No Retail Orders found")
 
+
+def section_vehicles(args, ctx):
+    rivian_info = ctx['rivian_info']
+    vehicle_id = ctx['vehicle_id']
+    needs_vehicle = ctx['needs_vehicle']
     if args.vehicles or args.all or (needs_vehicle and not args.vehicle_id):
         found_vehicle = False
         verbose = args.vehicles and args.verbose
@@ -794,6 +789,7 @@ def main():
         if not found_vehicle:
             print(f"Didn't find vehicle ID {args.vehicle_id}")
             return -1
+    ctx['vehicle_id'] = vehicle_id
 
     if args.vehicles or args.all:
         if len(rivian_info['vehicles']):
@@ -805,6 +801,8 @@ def main():
         else:
             print("No Vehicles found")
 
+
+def section_payment_methods(args, ctx):
     if args.payment_methods or args.all:
         pmt = payment_methods(args.verbose)
         print("Payment Methods:")
@@ -819,6 +817,8 @@ def main():
         else:
             print("No Payment Methods found")
 
+
+def section_charge_ids(args, ctx):
     if args.charge_ids or args.all:
         print("Charge IDs:")
         data = check_by_rivian_id(args.verbose)
@@ -829,6 +829,8 @@ def main():
             print(f"{i}: {data[i]}")
         print("\n")
 
+
+def section_test(args, ctx):
     # No value?
     # get_parameter_store_values(args.verbose)
 
@@ -836,6 +838,9 @@ def main():
     if args.test:
         test_graphql(args.verbose)
 
+
+def section_chargers(args, ctx):
+    rivian_info = ctx['rivian_info']
     if args.chargers or args.all:
         rivian_info['chargers'] = chargers(args.verbose)
         if len(rivian_info['chargers']):
@@ -847,6 +852,9 @@ def main():
         else:
             print("No Chargers found")
 
+
+def section_speakers(args, ctx):
+    rivian_info = ctx['rivian_info']
     if args.speakers or args.all:
         rivian_info['speakers'] = speakers(args.verbose)
         if len(rivian_info['speakers']):
@@ -858,6 +866,9 @@ def main():
         else:
             print("No Speakers found")
 
+
+def section_ota(args, ctx):
+    vehicle_id = ctx['vehicle_id']
     if args.ota or args.all:
         ota = get_ota_info(vehicle_id, args.verbose)
         if len(ota):
@@ -870,6 +881,9 @@ def main():
         else:
             print("No OTA info available")
 
+
+def section_images(args, ctx):
+    rivian_info = ctx['rivian_info']
     # Basic images for vehicle
     if args.images or args.all:
         rivian_info['images'] = images(args.verbose)
@@ -882,6 +896,9 @@ def main():
         else:
             print("No Images found")
 
+
+def section_user_info(args, ctx):
+    vehicle_id = ctx['vehicle_id']
     if args.user_info or args.all:
         print("User Vehicles:")
         user_info = user_information(args.verbose)
@@ -910,6 +927,8 @@ def main():
             print(f"   vasPhoneId: {p['vas']['vasPhoneId']}")
             print(f"   publicKey: {p['vas']['publicKey']}")
 
+
+def section_user(args, ctx):
     if (args.user or args.all) and not args.privacy:
         user = get_user(args.verbose)
         print("User details:")
@@ -931,6 +950,11 @@ def main():
                 print(f"{i}: {user[i]}")
         print("\n")
 
+
+def section_state(args, ctx):
+    vehicle_id = ctx['vehicle_id']
+    distance_units = ctx['distance_units']
+    temp_units_string = ctx['temp_units_string']
     if args.state or args.all:
         state = get_vehicle_state(vehicle_id, args.verbose)
         if not state:
@@ -1068,13 +1092,30 @@ def main():
             if state['btmRfdHardwareFailureStatus']:
                 print(f"   btmRfd Hardware Failure Status {state['btmRfdHardwareFailureStatus']['value']}")
 
+
+def section_poll(args, ctx):
+    vehicle_id = ctx['vehicle_id']
+    distance_units_string = ctx['distance_units_string']
     if args.poll or args.query or args.all:
         single_poll = args.query or args.all
         # Power state = ready, go, sleep, standby,
         # Charge State = charging_ready or charging_active
         # Charger Status = chrgr_sts_not_connected, chrgr_sts_connected_charging, chrgr_sts_connected_no_chrg
+        if args.poll_adaptive:
+            policy = AdaptivePolicy(fast=args.poll_fast_frequency,
+                                    normal=args.poll_frequency,
+                                    sleep=args.poll_frequency,
+                                    sleep_max=args.poll_max_sleep_frequency)
+        else:
+            policy = FixedPolicy(args.poll_frequency)
+        scheduler = PollScheduler(policy)
         if not single_poll:
-            print(f"Polling car every {args.poll_frequency} seconds, only showing changes in data.")
+            if args.poll_adaptive:
+                print(f"Polling car every {args.poll_fast_frequency} seconds while driving or charging, "
+                      f"{args.poll_frequency} seconds while awake, backing off up to "
+                      f"{args.poll_max_sleep_frequency} seconds while asleep, only showing changes in data.")
+            else:
+                print(f"Polling car every {args.poll_frequency} seconds, only showing changes in data.")
             if args.poll_inactivity_wait:
                 print(f"If 'ready' and inactive for {args.poll_inactivity_wait / 60:.0f} minutes will pause polling once for "
                       f"every ready state cycle for {args.poll_sleep_wait / 60:.0f} minutes to allow car to go to sleep.")
@@ -1086,7 +1127,8 @@ def main():
             lat_long_title = 'Latitude,Longitude,'
         print(f"timestamp,Power,Drive Mode,Gear,Mileage,Battery,Range,Speed,{lat_long_title}Charger Status,Charge State,Battery Limit,Charge End")
         last_state_change = time.time()
-        last_state = None
+        # Location changes aren't shown with --privacy so they don't count as changes either
+        differ = StateDiff(ignore=DEFAULT_IGNORED + (('gnssLocation',) if args.privacy else ()))
         last_power_state = None
         long_sleep_completed = False
         last_mileage = None
@@ -1094,66 +1136,78 @@ def main():
         elapsed_time = None
         speed = 0
         found_bad_response = False
+        rate_limiter = get_rivian_object().rate_limiter
+        rate_limited = rate_limiter.rate_limited
         while True:
-            state = get_vehicle_state(vehicle_id, args.verbose, minimal=True)
+            state = get_vehicle_state_model(vehicle_id, args.verbose)
+            if rate_limiter.rate_limited > rate_limited:
+                rate_limited = rate_limiter.rate_limited
+                print(f"{datetime.now().strftime('%m/%d/%Y, %H:%M:%S %p %Z').strip()} Rivian API rate limit reached, "
+                      f"slowing down to {rate_limiter.rate * 60:.1f} requests per minute")
+                found_bad_response = True
             if not state:
                 if not found_bad_response:
                     print(f"{datetime.now().strftime('%m/%d/%Y, %H:%M:%S %p %Z').strip()} Rivian API appears offline")
                 found_bad_response = True
-                last_state = None
-                time.sleep(args.poll_frequency)
+                differ.reset()
+                scheduler.wait(scheduler.next_due(vehicle_id, None))
                 continue
             found_bad_response = False
-            if last_power_state != 'ready' and state['powerState']['value'] == 'ready':
+            if last_power_state != 'ready' and state.powerState == 'ready':
                 # Allow one long sleep per ready state cycle to allow car to sleep
                 long_sleep_completed = False
-            last_power_state = state['powerState']['value']
+            last_power_state = state.powerState
             if distance_time:
                 elapsed_time = (datetime.now() - distance_time).total_seconds()
             if last_mileage and elapsed_time:
-                distance_meters = state['vehicleMileage']['value'] - last_mileage
+                distance_meters = state.vehicleMileage - last_mileage
                 distance = meters_to_distance_units(distance_meters, args.metric)
                 speed = distance * (60 * 60 / elapsed_time)
-            last_mileage = state['vehicleMileage']['value']
+            last_mileage = state.vehicleMileage
             distance_time = datetime.now()
-            current_state = \
-                f"{state['powerState']['value']}," \
-                f"{state['driveMode']['value']}," \
-                f"{state['gearStatus']['value']}," \
-                f"{meters_to_distance_units(state['vehicleMileage']['value'], args.metric):.1f}," \
-                f"{state['batteryLevel']['value']:.1f}%," \
-                f"{kilometers_to_distance_units(state['distanceToEmpty']['value'], args.metric):.1f}," \
-                f"{speed:.1f} {distance_units_string},"
-            if not args.privacy:
-                current_state += \
-                    f"{state['gnssLocation']['latitude']}," \
-                    f"{state['gnssLocation']['longitude']},"
-            if state['chargerStatus']:
-                current_state += \
-                    f"{state['chargerStatus']['value']}," \
-                    f"{state['chargerState']['value']}," \
-                    f"{state['batteryLimit']['value']:.1f}%," \
-                    f"{state['timeToEndOfCharge']['value'] // 60}h{state['timeToEndOfCharge']['value'] % 60}m"
-            if args.poll_show_all or single_poll or current_state != last_state:
+            changes = differ.update(state)
+            if ctx['store']:
+                ctx['store'].add_state(vehicle_id, state)
+            if args.poll_show_all or single_poll or changes:
+                current_state = \
+                    f"{state.powerState}," \
+                    f"{state.driveMode}," \
+                    f"{state.gearStatus}," \
+                    f"{meters_to_distance_units(state.vehicleMileage, args.metric):.1f}," \
+                    f"{state.batteryLevel:.1f}%," \
+                    f"{kilometers_to_distance_units(state.distanceToEmpty, args.metric):.1f}," \
+                    f"{speed:.1f} {distance_units_string},"
+                if not args.privacy:
+                    current_state += \
+                        f"{state.gnssLocation.latitude}," \
+                        f"{state.gnssLocation.longitude},"
+                if state.chargerStatus:
+                    current_state += \
+                        f"{state.chargerStatus}," \
+                        f"{state.chargerState}," \
+                        f"{state.batteryLimit:.1f}%," \
+                        f"{state.timeToEndOfCharge // 60}h{state.timeToEndOfCharge % 60}m"
                 print(f"{datetime.now().strftime('%m/%d/%Y, %H:%M:%S %p %Z').strip()}," + current_state)
+                if args.verbose and changes:
+                    print(f"Changed: {', '.join(c.field for c in changes)}")
                 last_state_change = datetime.now()
-            last_state = current_state
             if single_poll:
                 break
-            if state['powerState']['value'] == 'sleep':
-                time.sleep(args.poll_frequency)
+            delta = (datetime.now() - last_state_change).total_seconds()
+            if state.powerState != 'sleep' and \
+                    args.poll_inactivity_wait and not long_sleep_completed and delta >= args.poll_inactivity_wait:
+                print(f"{datetime.now().strftime('%m/%d/%Y, %H:%M:%S %p %Z').strip()} "
+                      f"Sleeping for {args.poll_sleep_wait / 60:.0f} minutes")
+                scheduler.wait(scheduler.delay(vehicle_id, args.poll_sleep_wait))
+                print(f"{datetime.now().strftime('%m/%d/%Y, %H:%M:%S %p %Z').strip()} "
+                      f"Back to polling every {args.poll_frequency} seconds, showing changes only")
+                long_sleep_completed = True
             else:
-                delta = (datetime.now() - last_state_change).total_seconds()
-                if args.poll_inactivity_wait and not long_sleep_completed and delta >= args.poll_inactivity_wait:
-                    print(f"{datetime.now().strftime('%m/%d/%Y, %H:%M:%S %p %Z').strip()} "
-                          f"Sleeping for {args.poll_sleep_wait / 60:.0f} minutes")
-                    time.sleep(args.poll_sleep_wait)
-                    print(f"{datetime.now().strftime('%m/%d/%Y, %H:%M:%S %p %Z').strip()} "
-                          f"Back to polling every {args.poll_frequency} seconds, showing changes only")
-                    long_sleep_completed = True
-                else:
-                    time.sleep(args.poll_frequency)
+                scheduler.wait(scheduler.next_due(vehicle_id, state))
 
+
+def section_vehicle(args, ctx):
+    vehicle_id = ctx['vehicle_id']
     if args.vehicle or args.all:
         vehicle = get_vehicle(vehicle_id, args.verbose)
         print("Vehicle Users:")
@@ -1165,11 +1219,18 @@ def main():
             for d in u['devices']:
                 print(f"      {d['deviceName']}, Paired: {d['isPaired']}, Enabled: {d['isEnabled']}, ID: {d['id']}")
 
+
+def section_last_seen(args, ctx):
+    vehicle_id = ctx['vehicle_id']
     if args.last_seen or args.all:
         last_seen = get_vehicle_last_seen(vehicle_id, args.verbose)
         print(f"Vehicle last seen: {show_local_time(last_seen)}")
 
+
+def section_plan_trip(args, ctx):
+    vehicle_id = ctx['vehicle_id']
     if args.plan_trip or args.all:
+        from rivian_map import decode_and_map, extract_lat_long
         if args.all:
             starting_soc, starting_range, origin_lat, origin_long, dest_lat, dest_long = \
                 ["85.0", "360", "42.0772", "-71.6303", "42.1399", "-71.5163"]
@@ -1194,6 +1255,9 @@ def main():
         )
         decode_and_map(planned_trip)
 
+
+def section_charging_schedule(args, ctx):
+    vehicle_id = ctx['vehicle_id']
     if args.charging_schedule or args.all:
         schedules = charging_schedule(vehicle_id, args.verbose)
         for s in schedules:
@@ -1206,6 +1270,8 @@ def main():
             print(f"Weekdays: {s['weekDays']}")
 
 
+def section_charge_sessions(args, ctx):
+    distance_units = ctx['distance_units']
     if args.charge_sessions or args.last_charge or args.all:
         sessions = charging_sessions(args.verbose)
         if args.last_charge:
@@ -1228,6 +1294,8 @@ def main():
                 print(f"Range added rate: {rph:.1f} {distance_units}/h")
             print()
 
+
+def section_charge_session(args, ctx):
     if args.charge_session or args.all:
         session = charging_session(args.verbose)
         print(f"Charger ID: {session['chargerId']}")
@@ -1236,6 +1304,11 @@ def main():
         print(f"Charging Active: {session['vehicleChargerState']['value'] == 'charging_active'}")
         print(f"Charging Updated: {show_local_time(session['vehicleChargerState']['updatedAt'])}")
 
+
+def section_live_charging_session(args, ctx):
+    vehicle_id = ctx['vehicle_id']
+    distance_units = ctx['distance_units']
+    distance_units_string = ctx['distance_units_string']
     if args.live_charging_session or args.all:
         state = get_vehicle_state(vehicle_id, args.verbose)
         s = live_charging_session(vehicle_id=vehicle_id,
@@ -1266,9 +1339,14 @@ def main():
         print(f"currentMiles: {kilometers_to_distance_units(s['currentMiles']['value'], args.metric):.1f} {distance_units}")
         print(f"current: {s['current']['value']}")
 
+
+def section_live_charging_history(args, ctx):
+    vehicle_id = ctx['vehicle_id']
     if args.live_charging_history or args.all:
         s = live_charging_history(vehicle_id=vehicle_id,
                                   verbose=args.verbose)
+        if ctx['store']:
+            ctx['store'].add_charging_history(vehicle_id, s)
         start_time = None
         end_time = None
         for d in s:
@@ -1280,10 +1358,411 @@ def main():
             elapsed = get_elapsed_time_string((end_time - start_time).total_seconds())
             print(f"Elapsed Time: {elapsed}")
 
+
+def section_follow_charging(args, ctx):
+    vehicle_id = ctx['vehicle_id']
+    if args.follow_charging:
+        # Only the points added since the last poll are shown (and stored)
+        start_time = None
+        for point in follow_charging_history(get_rivian_object(), vehicle_id, interval=args.poll_frequency,
+                                             history=ChargingHistory(maxlen=1), max_idle=FOLLOW_CHARGING_MAX_IDLE):
+            print(f"{show_local_time(point.time)}: {point.kw} kW", flush=True)
+            if ctx['store']:
+                ctx['store'].add_charging_history(vehicle_id, [point._asdict()])
+            start_time = start_time or get_local_time(point.time)
+            elapsed = get_elapsed_time_string((get_local_time(point.time) - start_time).total_seconds())
+        if start_time:
+            print(f"No new data for {FOLLOW_CHARGING_MAX_IDLE} polls, charging ended after {elapsed}")
+
+
+def section_command(args, ctx):
     # Work in progress - TODO
     if args.command:
         vehicle_command(args.command, args.vehicle_id, args.verbose)
 
+
+# (name, function, sections it needs finished first), output is always shown in this order
+SECTIONS = [
+    ('vehicle_orders', section_vehicle_orders, []),
+    ('retail_orders', section_retail_orders, []),
+    ('vehicles', section_vehicles, ['vehicle_orders']),
+    ('payment_methods', section_payment_methods, []),
+    ('charge_ids', section_charge_ids, []),
+    ('test', section_test, []),
+    ('chargers', section_chargers, []),
+    ('speakers', section_speakers, []),
+    ('ota', section_ota, ['vehicles']),
+    ('images', section_images, []),
+    ('user_info', section_user_info, ['vehicles']),
+    ('user', section_user, []),
+    ('state', section_state, ['vehicles']),
+    ('poll', section_poll, ['vehicles']),
+    ('vehicle', section_vehicle, ['vehicles']),
+    ('last_seen', section_last_seen, ['vehicles']),
+    ('plan_trip', section_plan_trip, ['vehicles']),
+    ('charging_schedule', section_charging_schedule, ['vehicles']),
+    ('charge_sessions', section_charge_sessions, []),
+    ('charge_session', section_charge_session, []),
+    ('live_charging_session', section_live_charging_session, ['vehicles']),
+    ('live_charging_history', section_live_charging_history, ['vehicles']),
+    ('follow_charging', section_follow_charging, ['vehicles']),
+    ('command', section_command, []),
+]
+
+
+# Output of the current context, see output_to
+_stdout = contextvars.ContextVar('stdout', default=None)
+_stderr = contextvars.ContextVar('stderr', default=None)
+
+
+class ContextOutput:
+    # sys.stdout/sys.stderr replacement writing to the stream output_to set for the current context, the
+    # original stream when there's none. Commands run by a daemon at the same time each have their own.
+    def __init__(self, stream, var):
+        self.stream = stream
+        self.var = var
+
+    @property
+    def current(self):
+        stream = self.var.get()
+        return self.stream if stream is None else stream
+
+    def write(self, text):
+        return self.current.write(text)
+
+    def flush(self):
+        self.current.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.current, name)
+
+
+def install_output():
+    # Once, from the main thread before commands run in others
+    if not isinstance(sys.stdout, ContextOutput):
+        sys.stdout = ContextOutput(sys.stdout, _stdout)
+    if not isinstance(sys.stderr, ContextOutput):
+        sys.stderr = ContextOutput(sys.stderr, _stderr)
+
+
+@contextlib.contextmanager
+def output_to(var, stream):
+    # What this context prints (to sys.stdout for _stdout, sys.stderr for _stderr) goes to stream, other
+    # threads' output is left alone. Threads started for it need contextvars.copy_context().run.
+    install_output()
+    token = var.set(stream)
+    try:
+        yield stream
+    finally:
+        var.reset(token)
+
+
+class OrderedOutput:
+    # sys.stdout replacement for concurrent sections: each section's output is buffered and shown
+    # in SECTIONS order, the earliest unfinished section writes straight through (so --poll streams)
+    def __init__(self, stream, names):
+        self.stream = stream
+        self.order = list(names)
+        self.buffers = {name: [] for name in self.order}
+        self.done = set()
+        self.head = 0
+        # Nothing after the first section that failed or returned an exit code is shown
+        self.stop_at = len(self.order)
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    def write(self, text):
+        section = getattr(self.local, 'section', None)
+        with self.lock:
+            if section is None or (self.head <= self.stop_at and section == self.order[self.head]):
+                self.stream.write(text)
+            elif section in self.buffers:
+                self.buffers[section].append(text)
+
+    def flush(self):
+        self.stream.flush()
+
+    def run(self, name, func, *args):
+        self.local.section = name
+        stop = True
+        try:
+            result = func(*args)
+            stop = result is not None
+            return result
+        finally:
+            self.finish(name, stop)
+            self.local.section = None
+
+    def finish(self, name, stop=False):
+        with self.lock:
+            if stop:
+                self.stop_at = min(self.stop_at, self.order.index(name))
+            self.done.add(name)
+            while self.head < len(self.order) and self.head <= self.stop_at and self.order[self.head] in self.done:
+                self.head += 1
+                if self.head < len(self.order) and self.head <= self.stop_at:
+                    self.stream.write(''.join(self.buffers.pop(self.order[self.head])))
+
+
+def run_sections(args, ctx, workers):
+    # Runs SECTIONS on a pool as soon as their dependencies are done, output stays in SECTIONS order
+    names = [name for name, _, _ in SECTIONS]
+    install_output()
+    output = OrderedOutput(sys.stdout.current, names)
+    pending = list(SECTIONS)
+    finished = set()
+    running = {}
+    results = {}
+    errors = {}
+    with output_to(_stdout, output):
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            while True:
+                for section in list(pending):
+                    name, func, deps = section
+                    if names.index(name) >= output.stop_at:
+                        pending.remove(section)
+                    elif all(d in finished for d in deps):
+                        pending.remove(section)
+                        # Sections see the command's output and account
+                        context = contextvars.copy_context()
+                        running[executor.submit(context.run, output.run, name, func, args, ctx)] = name
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    finished.add(name)
+                    try:
+                        results[name] = future.result()
+                    except Exception as e:
+                        errors[name] = e
+    for name in names[:output.stop_at + 1]:
+        if name in errors:
+            raise errors[name]
+        if results.get(name) is not None:
+            return results[name]
+    return None
+
+
+def open_store(path):
+    from rivian_store import TimeSeriesStore
+    return TimeSeriesStore(path)
+
+
+def load_env():
+    # Settings from a .env file, BASE_URL is read again in case it's set there
+    global BASE_URL
+    from dotenv import load_dotenv
+    load_dotenv()
+    BASE_URL = os.getenv('RIVIAN_BASE_URL', RIVIAN_BASE_PATH)
+
+
+def run_command(argv):
+    # One CLI command for the daemon: (exit status, stdout, stderr) like running rivian_cli itself.
+    # Commands run at the same time, each in its own context (--account, output)
+    return contextvars.copy_context().run(_run_command, argv)
+
+
+def _run_command(argv):
+    drop_stale_clients()
+    stdout, stderr = io.StringIO(), io.StringIO()
+    status = 0
+    with output_to(_stdout, stdout), output_to(_stderr, stderr):
+        try:
+            main(argv)
+        except SystemExit as e:
+            if isinstance(e.code, str):
+                print(e.code, file=sys.stderr)
+            status = e.code if isinstance(e.code, int) else int(e.code is not None)
+        except Exception:
+            traceback.print_exc()
+            status = 1
+    return status, stdout.getvalue(), stderr.getvalue()
+
+
+def serve_daemon():
+    import signal
+    from rivian_daemon import CLIDaemon, environment
+    # Logged in and handshake done before the first command, fails right away without saved credentials
+    get_rivian_object()
+    install_output()
+    # Answers CLIs started with the same settings, the .env file they'd read is this one
+    daemon = CLIDaemon(run_command, env=environment(_environment))
+    # Stopped by a service manager too, the socket is removed either way
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    print(f"Serving CLI commands on {daemon.path}, stop with Ctrl-C", flush=True)
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+def main(argv=None):
+    load_env()
+    parser = argparse.ArgumentParser(description='Rivian CLI')
+    parser.add_argument('--login', help='Login to account', required=False, action='store_true')
+    parser.add_argument('--account', help=f"Name of the saved account to use (or log in as) in {CREDENTIALS_FILE}",
+                        required=False, default=os.getenv('RIVIAN_ACCOUNT', DEFAULT_ACCOUNT))
+    parser.add_argument('--user', help='Display user info', required=False, action='store_true')
+    parser.add_argument('--vehicles', help='Display vehicles', required=False, action='store_true')
+    parser.add_argument('--chargers', help='Display chargers', required=False, action='store_true')
+    parser.add_argument('--speakers', help='Display Speakers', required=False, action='store_true')
+    parser.add_argument('--images', help='Display Image URLs', required=False, action='store_true')
+    parser.add_argument('--vehicle_orders', help='Display vehicle orders', required=False, action='store_true')
+    parser.add_argument('--retail_orders', help='Display retail orders', required=False, action='store_true')
+    parser.add_argument('--payment_methods', help='Show payment methods', required=False, action='store_true')
+    parser.add_argument('--test', help='For testing graphql queries', required=False, action='store_true')
+    parser.add_argument('--charge_ids', help='Show charge_ids', required=False, action='store_true')
+    parser.add_argument('--verbose', help='Verbose output', required=False, action='store_true')
+    parser.add_argument('--privacy', help='Fuzz order/vin info', required=False, action='store_true')
+    parser.add_argument('--state', help='Get vehicle state', required=False, action='store_true')
+    parser.add_argument('--vehicle', help='Get vehicle access info', required=False, action='store_true')
+    parser.add_argument('--vehicle_id', help='Vehicle to query (defaults to first one found)', required=False)
+    parser.add_argument('--last_seen', help='Timestamp vehicle was last seen', required=False, action='store_true')
+    parser.add_argument('--user_info', help='Show user information', required=False, action='store_true')
+    parser.add_argument('--ota', help='Show user information', required=False, action='store_true')
+    parser.add_argument('--poll', help='Poll vehicle state', required=False, action='store_true')
+    parser.add_argument('--poll_frequency', help='Poll frequency', required=False, default=30, type=int)
+    parser.add_argument('--poll_adaptive',
+                        help='Poll faster while driving or charging and back off while asleep',
+                        required=False, action='store_true')
+    parser.add_argument('--poll_fast_frequency', help='Adaptive poll frequency while driving or charging',
+                        required=False, default=10, type=int)
+    parser.add_argument('--poll_max_sleep_frequency', help='Adaptive poll frequency limit while asleep',
+                        required=False, default=30*60, type=int)
+    parser.add_argument('--poll_show_all', help='Show all poll results even if no changes occurred', required=False, action='store_true')
+    parser.add_argument('--poll_inactivity_wait',
+                        help='If not sleeping and nothing changes for this period of time '
+                             'then do a poll_sleep_wait. Defaults to 0 for continual polling '
+                             'at poll_frequency',
+                        required=False, default=0, type=int)
+    parser.add_argument('--poll_sleep_wait',
+                        help='# How long to stop polling to let car go to sleep (depends on poll_inactivity_wait)',
+                        required=False, default=40*60, type=int)
+    parser.add_argument('--query', help='Single poll instance (quick poll)', required=False, action='store_true')
+    parser.add_argument('--metric', help='Use metric vs imperial units', required=False, action='store_true')
+    parser.add_argument('--plan_trip', help='Plan a trip - starting soc, starting range in meters, origin lat,origin long,dest lat,dest long', required=False)
+
+    parser.add_argument('--charging_schedule', help='Get charging schedule', required=False, action='store_true')
+    parser.add_argument('--charge_sessions', help='Get charging sessions', required=False, action='store_true')
+    parser.add_argument('--last_charge', help='Get last charge session', required=False, action='store_true')
+    parser.add_argument('--charge_session', help='Get current charging session', required=False, action='store_true')
+    parser.add_argument('--live_charging_session', help='Get live charging session', required=False, action='store_true')
+    parser.add_argument('--live_charging_history', help='Get live charging session history', required=False, action='store_true')
+    parser.add_argument('--follow_charging', help='Show live charging history as it grows, polling every '
+                        '--poll_frequency seconds', required=False, action='store_true')
+
+    parser.add_argument('--all', help='Run all commands silently as a sort of test of all commands', required=False, action='store_true')
+    parser.add_argument('--store', help='Also save poll results and live charging history to this SQLite file',
+                        required=False)
+    parser.add_argument('--no_cache', help='Always fetch account data instead of using the cached copy',
+                        required=False, action='store_true')
+    parser.add_argument('--refresh', help='Clear cached account data (orders, user info, ...) first',
+                        required=False, action='store_true')
+    parser.add_argument('--daemon', help='Keep running and serve CLI commands over a local socket, CLI commands '
+                        'started meanwhile are run by it with warm connections and caches', required=False,
+                        action='store_true')
+    parser.add_argument('--no_daemon', help='Run here even when a daemon is running', required=False,
+                        action='store_true')
+    parser.add_argument('--workers', help='Maximum number of commands run concurrently', required=False, default=8, type=int)
+    parser.add_argument('--command', help='Send vehicle a command', required=False,
+                        choices=['WAKE_VEHICLE',
+                                 'OPEN_FRUNK',
+                                 'CLOSE_FRUNK',
+                                 'OPEN_ALL_WINDOWS',
+                                 'CLOSE_ALL_WINDOWS',
+                                 'UNLOCK_ALL_CLOSURES',
+                                 'LOCK_ALL_CLOSURES',
+                                 'ENABLE_GEAR_GUARD_VIDEO',
+                                 'DISABLE_GEAR_GUARD_VIDEO',
+                                 'HONK_AND_FLASH_LIGHTS',
+                                 'OPEN_TONNEAU_COVER',
+                                 'CLOSE_TONNEAU_COVER',
+                                 ]
+                        )
+    args = parser.parse_args(argv)
+    original_stdout = sys.stdout
+
+    global _cache
+    _account.set(args.account)
+    if args.no_cache:
+        _cache = None
+    else:
+        # Kept by a daemon, the file is only read once
+        if _cache is None:
+            _cache = ResponseCache(CACHE_FILE)
+        if args.refresh:
+            _cache.invalidate()
+    for rivian in _rivians.values():
+        rivian.cache = _cache
+
+    if args.daemon:
+        serve_daemon()
+        return
+
+    if args.all:
+        print("Running all commands silently")
+        f = open(os.devnull, 'w')
+        sys.stdout = f
+
+    if args.login:
+        login(args.verbose)
+
+    rivian_info = {
+        'vehicle_orders': [],
+        'retail_orders': [],
+        'vehicles': [],
+    }
+
+    if args.metric:
+        distance_units = "km"
+        distance_units_string = "kph"
+        temp_units_string = "C"
+    else:
+        distance_units = "mi"
+        distance_units_string = "mph"
+        temp_units_string = "F"
+
+    vehicle_id = None
+    if args.vehicle_id:
+        vehicle_id = args.vehicle_id
+
+    needs_vehicle = args.vehicles or \
+                    args.vehicle or \
+                    args.state or \
+                    args.last_seen or \
+                    args.ota or \
+                    args.poll or \
+                    args.query or \
+                    args.plan_trip or \
+                    args.user_info or \
+                    args.charge_session or \
+                    args.live_charging_session or \
+                    args.live_charging_history or \
+                    args.follow_charging or \
+                    args.charging_schedule or \
+                    args.all
+
+    ctx = {
+        'rivian_info': rivian_info,
+        'vehicle_id': vehicle_id,
+        'needs_vehicle': needs_vehicle,
+        'distance_units': distance_units,
+        'distance_units_string': distance_units_string,
+        'temp_units_string': temp_units_string,
+        'store': open_store(args.store) if args.store else None,
+    }
+    try:
+        result = run_sections(args, ctx, args.workers)
+    finally:
+        if ctx['store']:
+            ctx['store'].close()
+    if args.verbose and _cache:
+        for name, (hits, misses) in sorted(_cache.stats().items()):
+            print(f"Cache {name}: {hits} hits, {misses} misses")
+    if result is not None:
+        return result
+
     if args.all:
         sys.stdout = original_stdout
         print("All commands ran and no exceptions encountered")
@@ -1291,4 +1770,3 @@ def main():
 
 if __name__ == '__main__':
     main()
-
@@ -0,0 +1,192 @@
+import json
+import os
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: no advisory locks, writes are still atomic
+    fcntl = None
+
+# Credential stores for one or more named accounts. FileCredentialStore keeps them in a JSON file that
+# several processes (cron jobs, a poller, ...) can share: writes go to a temporary file renamed over the
+# old one under an advisory lock, so readers never see half a file and writers don't lose each other's
+# accounts. MemoryCredentialStore is the same without a file, e.g. for tests.
+#
+# attach() loads an account into a Rivian object and saves it back whenever its tokens change.
+
+DEFAULT_ACCOUNT = 'default'
+FORMAT_VERSION = 1
+
+Credentials = namedtuple('Credentials', ['access_token', 'refresh_token', 'user_session_token', 'csrf_token',
+                                         'app_session_token', 'csrf_expires_at'], defaults=('', '', 0))
+
+
+def credentials_of(rivian):
+    return Credentials(rivian._access_token, rivian._refresh_token, rivian._user_session_token, rivian._csrf_token,
+                       rivian._app_session_token, rivian._csrf_expires_at)
+
+
+def apply_credentials(rivian, credentials):
+    rivian.set_tokens(credentials.access_token, credentials.refresh_token, credentials.user_session_token)
+    rivian._csrf_token = credentials.csrf_token
+    rivian._app_session_token = credentials.app_session_token
+    rivian._csrf_expires_at = credentials.csrf_expires_at
+
+
+def tokens(credentials):
+    # The part a login or refresh changes, the rest is the CSRF handshake
+    return credentials[:3]
+
+
+def merge(stored, credentials, expected):
+    # What to save when `credentials` were derived from `expected`: if only the handshake changed here but
+    # another process refreshed the tokens meanwhile, its tokens are kept
+    if stored is None or expected is None:
+        return credentials
+    if tokens(credentials) == tokens(expected) and tokens(stored) != tokens(expected):
+        return Credentials(*tokens(stored), *credentials[3:])
+    return credentials
+
+
+class MemoryCredentialStore:
+    def __init__(self, accounts=None):
+        self._accounts = dict(accounts or {})
+        self._lock = threading.Lock()
+
+    def accounts(self):
+        with self._lock:
+            return sorted(self._accounts)
+
+    def load(self, account=DEFAULT_ACCOUNT):
+        with self._lock:
+            return self._accounts.get(account)
+
+    def save(self, account, credentials, expected=None):
+        # Saves and returns what was saved, see merge for `expected`
+        with self._lock:
+            credentials = merge(self._accounts.get(account), credentials, expected)
+            self._accounts[account] = credentials
+            return credentials
+
+    def delete(self, account=DEFAULT_ACCOUNT):
+        with self._lock:
+            self._accounts.pop(account, None)
+
+
+class FileCredentialStore:
+    def __init__(self, path):
+        self.path = path
+        self.lock_path = f"{path}.lock"
+        self._lock = threading.Lock()
+        # (mtime, size, accounts) of the last read, the file is only parsed again once it changed
+        self._cached = None
+
+    @contextmanager
+    def locked(self, exclusive):
+        # Advisory lock shared with other processes, on its own file since the data file gets replaced
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+                yield
+            finally:
+                os.close(fd)
+
+    def _read(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            self._cached = None
+            return {}
+        if self._cached is not None and self._cached[:2] == (stat.st_mtime_ns, stat.st_size):
+            return self._cached[2]
+        with open(self.path) as f:
+            data = json.load(f)
+        accounts = {name: Credentials(**{field: values[field] for field in Credentials._fields if field in values})
+                    for name, values in data.get('accounts', {}).items()}
+        self._cached = (stat.st_mtime_ns, stat.st_size, accounts)
+        return accounts
+
+    def _write(self, accounts):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        temporary = os.path.join(directory, f".{os.path.basename(self.path)}.{os.getpid()}.tmp")
+        # Tokens are secrets, only the owner may read them
+        fd = os.open(temporary, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'version': FORMAT_VERSION,
+                       'accounts': {name: credentials._asdict() for name, credentials in accounts.items()}},
+                      f, indent=2, sort_keys=True)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, self.path)
+        stat = os.stat(self.path)
+        self._cached = (stat.st_mtime_ns, stat.st_size, accounts)
+
+    def accounts(self):
+        with self.locked(exclusive=False):
+            return sorted(self._read())
+
+    def load(self, account=DEFAULT_ACCOUNT):
+        with self.locked(exclusive=False):
+            return self._read().get(account)
+
+    def save(self, account, credentials, expected=None):
+        # Saves and returns what was saved, see merge for `expected`. Read again under the lock so accounts
+        # saved by other processes meanwhile are kept.
+        with self.locked(exclusive=True):
+            accounts = dict(self._read())
+            credentials = merge(accounts.get(account), credentials, expected)
+            accounts[account] = credentials
+            self._write(accounts)
+            return credentials
+
+    def delete(self, account=DEFAULT_ACCOUNT):
+        with self.locked(exclusive=True):
+            accounts = dict(self._read())
+            if accounts.pop(account, None) is not None:
+                self._write(accounts)
+
+
+def attach(rivian, store, account=DEFAULT_ACCOUNT):
+    # Loads the account into a Rivian object (None when it isn't in the store) and saves it whenever its
+    # tokens change. Before refreshing the access token the store is checked first: another process
+    # sharing it may have refreshed already, spending the refresh token this object knows.
+    credentials = store.load(account)
+    if credentials is None:
+        return None
+    apply_credentials(rivian, credentials)
+    # Cached responses follow the account, not its current tokens
+    rivian.account = rivian.account or account
+    last = [credentials]
+    lock = threading.Lock()
+
+    def adopt(stored):
+        # Tokens another process saved replace ours, our CSRF handshake stays
+        rivian.set_tokens(*tokens(stored))
+        last[0] = stored
+
+    def save(rivian):
+        with lock:
+            current = credentials_of(rivian)
+            saved = store.save(account, current, expected=last[0])
+            if tokens(saved) != tokens(current):
+                adopt(saved)
+            last[0] = saved
+
+    def refresh_from_store(rivian):
+        with lock:
+            stored = store.load(account)
+            if stored is None or tokens(stored) == tokens(last[0]):
+                return False
+            adopt(stored)
+            return True
+
+    rivian.token_callback = save
+    rivian.refresh_callback = refresh_from_store
+    return credentials
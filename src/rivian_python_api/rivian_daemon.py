@@ -0,0 +1,180 @@
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+
+# Warm daemon for the CLI. `rivian_cli --daemon` keeps its authenticated Rivian objects (handshake,
+# connection pools, response cache) and answers CLI commands over a Unix domain socket. A CLI started
+# while it runs sends its arguments there and prints the answer, without importing the API or talking
+# to Rivian itself. One JSON line each way:
+#
+#     {"argv": ["--query", ...], "cwd": "...", "env": {...}}  ->  {"status": 0, "stdout": "...", "stderr": "..."}
+#
+# The socket is in the current directory like the CLI's other files (RIVIAN_DAEMON_SOCKET to move it)
+# and only the user running the daemon can connect.
+#
+# Commands read RIVIAN_* settings and open files relative to the working directory (credentials, cache,
+# --store, RIVIAN_RECORD), so the daemon only answers CLIs started in its directory with the same RIVIAN_*
+# variables it was started with. Others get {"refused": "..."} and run the command themselves.
+
+DEFAULT_SOCKET = 'rivian_cli.sock'
+# Interactive, long running or showing windows, always run by the CLI itself
+# (or changing what the daemon's other commands share: --no_cache drops its response cache)
+LOCAL_OPTIONS = ('--daemon', '--no_daemon', '--login', '--poll', '--plan_trip', '--all', '--follow_charging',
+                 '--no_cache')
+CONNECT_TIMEOUT = 5
+
+
+def environment(environ=None):
+    # The RIVIAN_* variables a command sees, where the socket is doesn't matter
+    environ = os.environ if environ is None else environ
+    return {k: v for k, v in environ.items() if k.startswith('RIVIAN_') and k != 'RIVIAN_DAEMON_SOCKET'}
+
+
+def socket_path():
+    return os.getenv('RIVIAN_DAEMON_SOCKET', DEFAULT_SOCKET)
+
+
+def runs_locally(argv):
+    # argparse takes unambiguous prefixes too (--pol for --poll)
+    for arg in argv:
+        option = arg.split('=', 1)[0]
+        if option.startswith('--') and len(option) > 2 and any(o.startswith(option) for o in LOCAL_OPTIONS):
+            return True
+    return False
+
+
+def running(path=None):
+    # Whether a daemon answers on the socket, checked by connecting without sending a command
+    path = path or socket_path()
+    if not hasattr(socket, 'AF_UNIX') or not os.path.exists(path):
+        return False
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.settimeout(CONNECT_TIMEOUT)
+        try:
+            client.connect(path)
+        except OSError:
+            return False
+    return True
+
+
+def request(argv, path=None):
+    # The daemon's answer to a command (sent with this process's directory and settings), None when no
+    # daemon is running
+    path = path or socket_path()
+    if not hasattr(socket, 'AF_UNIX') or not os.path.exists(path):
+        return None
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.settimeout(CONNECT_TIMEOUT)
+        try:
+            client.connect(path)
+        except OSError:
+            # Left behind by a daemon that's gone
+            return None
+        # Commands take as long as they take once the daemon has them
+        client.settimeout(None)
+        message = {'argv': argv, 'cwd': os.getcwd(), 'env': environment()}
+        client.sendall(json.dumps(message).encode() + b'\n')
+        with client.makefile('rb') as f:
+            line = f.readline()
+    finally:
+        client.close()
+    if not line:
+        return None
+    return json.loads(line)
+
+
+def forward(argv):
+    # Runs a CLI command in the daemon, its exit status or None to run it here
+    if runs_locally(argv):
+        return None
+    try:
+        answer = request(argv)
+    except (OSError, ValueError):
+        return None
+    if answer is None or 'refused' in answer:
+        return None
+    sys.stdout.write(answer['stdout'])
+    sys.stderr.write(answer['stderr'])
+    return answer['status']
+
+
+class DaemonHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline()
+        try:
+            message = json.loads(line)
+            argv = message['argv']
+        except (ValueError, KeyError, TypeError):
+            return
+        refused = self.refused(message)
+        if refused:
+            answer = {'refused': refused}
+        else:
+            # Commands run concurrently, each writes to its own output (see run)
+            status, stdout, stderr = self.server.run(argv)
+            answer = {'status': status, 'stdout': stdout, 'stderr': stderr}
+        self.wfile.write(json.dumps(answer).encode() + b'\n')
+
+    def refused(self, message):
+        # Why the command would run differently here than in the CLI that sent it, None when it wouldn't
+        if message.get('cwd') != self.server.cwd:
+            return f"The daemon runs in {self.server.cwd}"
+        if message.get('env') != self.server.env:
+            return "The daemon runs with other RIVIAN_* settings"
+        return None
+
+
+class DaemonSocketServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class CLIDaemon:
+    def __init__(self, run, path=None, env=None):
+        # run(argv) -> (exit status, stdout, stderr), called from several threads at once.
+        # env: the RIVIAN_* settings commands run with, this process's by default
+        self.path = path or socket_path()
+        if os.path.exists(self.path):
+            if running(self.path):
+                raise RuntimeError(f"A daemon is already running on {self.path}")
+            os.unlink(self.path)
+        # Created accessible to this user only, it runs commands with their Rivian account
+        umask = os.umask(0o177)
+        try:
+            self.server = DaemonSocketServer(self.path, DaemonHandler)
+        finally:
+            os.umask(umask)
+        self.server.run = run
+        self.server.cwd = os.getcwd()
+        self.server.env = environment() if env is None else env
+
+    def serve_forever(self):
+        try:
+            self.server.serve_forever()
+        finally:
+            self.close()
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.close()
+
+    def close(self):
+        self.server.server_close()
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
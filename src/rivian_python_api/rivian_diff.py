@@ -0,0 +1,74 @@
+from collections import namedtuple
+
+try:
+    from .rivian_queries import VEHICLE_STATE_FIELDS
+    from .rivian_state import field_value
+except ImportError:
+    from rivian_queries import VEHICLE_STATE_FIELDS
+    from rivian_state import field_value
+
+# Field by field change detection between successive vehicle states. Numeric fields can have a
+# tolerance, a change is only reported once a value moved more than that from the last reported
+# value (so slow drift still shows up eventually). Compound fields (gnssLocation, gnssError) apply
+# their tolerance to each number.
+
+DEFAULT_TOLERANCES = {
+    'gnssLocation': 0.0001,  # degrees, about 10m
+    'gnssSpeed': 0.5,
+    'gnssBearing': 5,
+    'gnssAltitude': 5,
+    'gnssError': 1,
+    'batteryLevel': 0.5,
+    'distanceToEmpty': 1,
+    'cabinClimateInteriorTemperature': 0.5,
+    'cabinClimateDriverTemperature': 0.5,
+}
+# Changes on every sync, not a change of the vehicle
+DEFAULT_IGNORED = ('cloudConnection',)
+
+Change = namedtuple('Change', ['field', 'old', 'new'])
+
+
+def _number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def changed(old, new, tolerance=0):
+    if old is None or new is None or not tolerance:
+        return old != new
+    if isinstance(new, tuple):
+        return len(old) != len(new) or any(changed(o, n, tolerance) for o, n in zip(old, new))
+    if _number(old) and _number(new):
+        return abs(new - old) > tolerance
+    return old != new
+
+
+def state_values(state):
+    # {field: value} for a VehicleState or a decoded vehicleState dict
+    if isinstance(state, dict):
+        return {field: field_value(field, entry) for field, entry in state.items() if field in VEHICLE_STATE_FIELDS}
+    return {field: getattr(state, field) for field in VEHICLE_STATE_FIELDS}
+
+
+class StateDiff:
+    def __init__(self, tolerances=None, ignore=DEFAULT_IGNORED):
+        self.tolerances = dict(DEFAULT_TOLERANCES, **(tolerances or {}))
+        self.ignore = set(ignore)
+        # field -> last reported value
+        self._last = {}
+
+    def reset(self):
+        # Next update reports every field again (e.g. after a gap in polling)
+        self._last = {}
+
+    def update(self, state):
+        # Changes since the last reported values, every field with a value on the first update
+        changes = []
+        for field, value in state_values(state).items():
+            if field in self.ignore:
+                continue
+            old = self._last.get(field)
+            if changed(old, value, self.tolerances.get(field, 0)):
+                changes.append(Change(field, old, value))
+                self._last[field] = value
+        return changes
@@ -0,0 +1,156 @@
+import heapq
+import itertools
+import queue
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from .rivian_diff import StateDiff
+    from .rivian_timeout import Deadline
+except ImportError:
+    from rivian_diff import StateDiff
+    from rivian_timeout import Deadline
+
+# Polls vehicle state for many (account, vehicle) pairs. Each pair has its own interval, all of
+# them share one worker pool (the concurrency limit) and results come back through one stream.
+# Give the Rivian objects a shared session (see create_session) to share connection pools too, and
+# one rivian_limit.RateLimiter per account to keep each account under its request limit.
+
+DEFAULT_INTERVAL = 30
+DEFAULT_CONCURRENCY = 16
+
+PollTarget = namedtuple('PollTarget', ['rivian', 'vehicle_id', 'interval'])
+# changes: rivian_diff.Change list since the target's last result, when the poller diffs states
+PollResult = namedtuple('PollResult', ['target', 'timestamp', 'latency', 'state', 'error', 'changes'],
+                        defaults=(None,))
+
+
+class FleetPoller:
+    def __init__(self, targets, interval=DEFAULT_INTERVAL, concurrency=DEFAULT_CONCURRENCY, minimal=True,
+                 clock=time.monotonic, policy=None, fields=None, diff=False, deadline=None):
+        # targets: (rivian, vehicle_id) or (rivian, vehicle_id, interval) tuples. With a policy
+        # (see rivian_schedule) intervals follow each vehicle's state instead of being fixed.
+        # fields narrows the polled vehicleState further (see rivian_queries.vehicle_state_query).
+        # With diff results carry the fields that changed since the target's previous poll.
+        # deadline bounds each poll (seconds, retries included), stop() cancels polls in flight.
+        self.targets = [PollTarget(*t) if len(t) == 3 else PollTarget(t[0], t[1], interval) for t in targets]
+        self.concurrency = concurrency
+        self.minimal = minimal
+        self.fields = fields
+        self.deadline = deadline
+        self._deadlines = set()
+        # Per target state is kept by position in targets, equal targets listed twice are still polled apart
+        self._diffs = [StateDiff() for _ in self.targets] if diff else None
+        self.clock = clock
+        self.policy = policy
+        self._intervals = [None] * len(self.targets)
+        self.results = queue.Queue()
+        self._schedule = []
+        self._sequence = itertools.count()
+        self._lock = threading.Condition()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._executor = None
+
+    def start(self):
+        now = self.clock()
+        with self._lock:
+            for index in range(len(self.targets)):
+                self._push(now, index)
+        self._executor = ThreadPoolExecutor(max_workers=self.concurrency)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        with self._lock:
+            self._lock.notify_all()
+            deadlines = list(self._deadlines)
+        for deadline in deadlines:
+            deadline.cancel()
+        if self._thread:
+            self._thread.join()
+        if self._executor:
+            self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def __iter__(self):
+        # Blocks for the next result until stopped
+        while not self._stopped.is_set():
+            try:
+                yield self.results.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+    def _push(self, due, index):
+        heapq.heappush(self._schedule, (due, next(self._sequence), index))
+        self._lock.notify()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            with self._lock:
+                if not self._schedule:
+                    self._lock.wait(0.1)
+                    continue
+                due, _, index = self._schedule[0]
+                delay = due - self.clock()
+                if delay > 0:
+                    self._lock.wait(delay)
+                    continue
+                heapq.heappop(self._schedule)
+                # An account out of requests would only hold a worker while it waits, poll it once it has one
+                limiter = getattr(self.targets[index].rivian, 'rate_limiter', None)
+                wait = limiter.wait_time() if limiter else 0
+                if wait > 0:
+                    self._push(self.clock() + wait, index)
+                    continue
+            self._executor.submit(self._poll, due, index)
+
+    def _poll(self, due, index):
+        target = self.targets[index]
+        start = self.clock()
+        state = None
+        error = None
+        deadline = Deadline(self.deadline)
+        with self._lock:
+            self._deadlines.add(deadline)
+        try:
+            with deadline:
+                response_json = target.rivian.get_vehicle_state(target.vehicle_id, minimal=self.minimal,
+                                                                fields=self.fields)
+            if response_json.get('data') and response_json['data'].get('vehicleState'):
+                state = response_json['data']['vehicleState']
+            else:
+                error = response_json.get('errors') or 'No vehicle state returned'
+        except Exception as e:
+            error = e
+        finally:
+            with self._lock:
+                self._deadlines.discard(deadline)
+        finished = self.clock()
+        changes = None
+        if self._diffs is not None:
+            # Each target is polled by one worker at a time, its StateDiff isn't shared
+            if state is None:
+                self._diffs[index].reset()
+            else:
+                changes = self._diffs[index].update(state)
+        self.results.put(PollResult(target, time.time(), finished - start, state, error, changes))
+        if not self._stopped.is_set():
+            with self._lock:
+                if self.policy:
+                    interval = self.policy.next_interval(state, self._intervals[index])
+                    self._intervals[index] = interval
+                else:
+                    interval = target.interval
+                # Next poll is relative to when this one was due, so latency doesn't add drift.
+                # A poll that overran its interval is rescheduled right away rather than bunched up.
+                self._push(max(due + interval, finished), index)
@@ -0,0 +1,104 @@
+import threading
+import time
+from collections import namedtuple
+
+# Client side request limit per account. A token bucket that every request of a Rivian/AsyncRivian
+# object (or several objects logged into the same account) takes a token from. When Rivian answers
+# with RATE_LIMIT (or HTTP 429) requests pause for cooldown seconds and the rate is cut by backoff;
+# each recovery period without another RATE_LIMIT brings it back up towards the configured rate.
+
+DEFAULT_RATE = 2  # requests per second
+DEFAULT_BURST = 20
+DEFAULT_MIN_RATE = 1 / 60
+DEFAULT_BACKOFF = 0.5
+DEFAULT_COOLDOWN = 60
+DEFAULT_RECOVERY = 300
+
+RATE_LIMIT_CODES = ('RATE_LIMIT',)
+RATE_LIMIT_STATUS = (429,)
+
+LimiterStatus = namedtuple('LimiterStatus', ['rate', 'max_rate', 'tokens', 'burst', 'wait', 'rate_limited'])
+
+
+class RateLimiter:
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST, min_rate=DEFAULT_MIN_RATE, backoff=DEFAULT_BACKOFF,
+                 cooldown=DEFAULT_COOLDOWN, recovery=DEFAULT_RECOVERY, clock=time.monotonic, sleep=time.sleep):
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min(min_rate, rate)
+        self.backoff = backoff
+        self.cooldown = cooldown
+        self.recovery = recovery
+        self.clock = clock
+        self.sleep = sleep
+        # RATE_LIMIT responses seen so far
+        self.rate_limited = 0
+        self._lock = threading.Lock()
+        # Negative while requests are waiting for tokens (they're handed out in order)
+        self._tokens = burst
+        # Tokens accrue from here on, in the future during a cooldown
+        self._updated = clock()
+        self._rate_changed = self._updated
+
+    def _refill(self, now):
+        if self.rate < self.max_rate and now - self._rate_changed >= self.recovery:
+            # One step back up per recovery period, however long nobody asked
+            periods = int((now - self._rate_changed) // self.recovery)
+            self.rate = min(self.max_rate, self.rate / self.backoff ** periods)
+            self._rate_changed += periods * self.recovery
+        if now > self._updated:
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+
+    def _wait(self, now):
+        return max(0, self._updated - now) + max(0, -self._tokens) / self.rate
+
+    def _wait_for_token(self, now):
+        return max(0, self._updated - now) + max(0, 1 - self._tokens) / self.rate
+
+    def reserve(self):
+        # Takes a token, returns how long to wait before using it
+        with self._lock:
+            now = self.clock()
+            self._refill(now)
+            self._tokens -= 1
+            return self._wait(now)
+
+    def acquire(self):
+        delay = self.reserve()
+        if delay > 0:
+            self.sleep(delay)
+        return delay
+
+    def limited(self):
+        # Rivian answered with RATE_LIMIT: slow down and pause
+        with self._lock:
+            now = self.clock()
+            self._refill(now)
+            self.rate_limited += 1
+            self.rate = max(self.min_rate, self.rate * self.backoff)
+            self._rate_changed = now
+            self._tokens = min(self._tokens, 0)
+            self._updated = max(self._updated, now + self.cooldown)
+
+    def wait_time(self):
+        # Seconds until a request could go out without waiting, 0 when there's a token now
+        with self._lock:
+            now = self.clock()
+            self._refill(now)
+            return self._wait_for_token(now)
+
+    def headroom(self):
+        # Requests that can go out right now without waiting
+        with self._lock:
+            now = self.clock()
+            self._refill(now)
+            return 0 if self._updated > now else max(0, int(self._tokens))
+
+    def status(self):
+        with self._lock:
+            now = self.clock()
+            self._refill(now)
+            return LimiterStatus(self.rate, self.max_rate, self._tokens, self.burst, self._wait_for_token(now),
+                                 self.rate_limited)
@@ -1,14 +1,20 @@
 import os
 import json
 import math
-import polyline
-import plotly.graph_objects as go
-from geopy.geocoders import Nominatim
 
-# Initialize Nominatim geocoder
-geolocator = Nominatim(user_agent="rivian_cli")
+# polyline, plotly and geopy take a while to import, they're only loaded once a trip is planned/shown
+_geolocator = None
+
+def get_geolocator():
+    # Nominatim geocoder, created on first use
+    global _geolocator
+    if _geolocator is None:
+        from geopy.geocoders import Nominatim
+        _geolocator = Nominatim(user_agent="rivian_cli")
+    return _geolocator
 
 def decode_and_map(planned_trip):
+    import polyline
     # route response is a json object embedded as a string so parse it out
     route_response = json.loads(planned_trip['data']['planTrip']['routes'][0]['routeResponse'])
 
@@ -18,6 +24,7 @@ def decode_and_map(planned_trip):
     show_map(route_path, planned_trip['data']['planTrip']['routes'][0]['waypoints'])
 
 def show_map(route, waypoints=[]):
+    import plotly.graph_objects as go
     MAPBOX_API_KEY = os.getenv('MAPBOX_API_KEY')
     
     if MAPBOX_API_KEY is None:
@@ -95,7 +102,7 @@ def destination_hover_info(dest):
 
 # Define function to extract latitude and longitude from input field
 def extract_lat_long(input_field):
-    location = geolocator.geocode(input_field)
+    location = get_geolocator().geocode(input_field)
     lat = location.latitude
     long = location.longitude
     return lat, long
\ No newline at end of file
@@ -0,0 +1,176 @@
+import bisect
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Per operation request metrics. Give Rivian/AsyncRivian a Metrics object (Rivian(metrics=Metrics()))
+# and every request is recorded by (operationName, endpoint): a latency histogram, request and
+# response bytes, status codes and GraphQL error codes. One registry can be shared by many
+# clients (e.g. a fleet), read it with snapshot() or serve it in the Prometheus text format.
+
+# Seconds, Prometheus style upper bounds (a +Inf bucket is implied)
+DEFAULT_BUCKETS = (0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+UNKNOWN_OPERATION = 'unknown'
+
+
+def error_codes(content):
+    # GraphQL error codes in a response body, the body is only parsed when it has errors
+    if b'"errors"' not in content:
+        return []
+    try:
+        errors = json.loads(content).get('errors') or []
+    except (ValueError, AttributeError):
+        return []
+    return [(e.get('extensions') or {}).get('code') or 'UNKNOWN' for e in errors if isinstance(e, dict)]
+
+
+class OperationMetrics:
+    __slots__ = ('buckets', 'bucket_counts', 'count', 'latency_sum', 'request_bytes', 'response_bytes',
+                 'statuses', 'errors')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        # Last one counts everything above the largest bucket
+        self.bucket_counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.latency_sum = 0.0
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.statuses = {}
+        self.errors = {}
+
+    def observe(self, latency, request_bytes, response_bytes, status, codes):
+        self.bucket_counts[bisect.bisect_left(self.buckets, latency)] += 1
+        self.count += 1
+        self.latency_sum += latency
+        self.request_bytes += request_bytes
+        self.response_bytes += response_bytes
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        for code in codes:
+            self.errors[code] = self.errors.get(code, 0) + 1
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'latency_sum': self.latency_sum,
+            'latency_buckets': dict(zip(self.buckets + (float('inf'),), self.bucket_counts)),
+            'request_bytes': self.request_bytes,
+            'response_bytes': self.response_bytes,
+            'statuses': dict(self.statuses),
+            'errors': dict(self.errors),
+        }
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _bound(value):
+    return '+Inf' if value == float('inf') else repr(float(value))
+
+
+class Metrics:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        # (operation, endpoint) -> OperationMetrics
+        self._operations = {}
+
+    def observe(self, operation, endpoint, latency, request_bytes, response_bytes, status, codes=()):
+        key = (operation or UNKNOWN_OPERATION, endpoint)
+        with self._lock:
+            metrics = self._operations.get(key)
+            if metrics is None:
+                metrics = self._operations[key] = OperationMetrics(self.buckets)
+            metrics.observe(latency, request_bytes, response_bytes, status, codes)
+
+    def reset(self):
+        with self._lock:
+            self._operations = {}
+
+    def snapshot(self):
+        # {(operation, endpoint): {'count': ..., 'latency_buckets': {bound: count}, ...}}
+        with self._lock:
+            return {key: metrics.to_dict() for key, metrics in self._operations.items()}
+
+    def prometheus(self):
+        # Prometheus text exposition format (version 0.0.4)
+        lines = [
+            '# HELP rivian_graphql_request_duration_seconds GraphQL request latency',
+            '# TYPE rivian_graphql_request_duration_seconds histogram',
+        ]
+        snapshot = self.snapshot()
+        for (operation, endpoint), metrics in sorted(snapshot.items()):
+            labels = f'operation="{_label(operation)}",endpoint="{_label(endpoint)}"'
+            cumulative = 0
+            for bound, count in metrics['latency_buckets'].items():
+                cumulative += count
+                lines.append(f'rivian_graphql_request_duration_seconds_bucket{{{labels},le="{_bound(bound)}"}} {cumulative}')
+            lines.append(f'rivian_graphql_request_duration_seconds_sum{{{labels}}} {metrics["latency_sum"]}')
+            lines.append(f'rivian_graphql_request_duration_seconds_count{{{labels}}} {metrics["count"]}')
+        for name, key, description in (('request_bytes', 'request_bytes', 'Request body bytes sent'),
+                                       ('response_bytes', 'response_bytes', 'Response body bytes received')):
+            lines.append(f'# HELP rivian_graphql_{name}_total {description}')
+            lines.append(f'# TYPE rivian_graphql_{name}_total counter')
+            for (operation, endpoint), metrics in sorted(snapshot.items()):
+                lines.append(f'rivian_graphql_{name}_total{{operation="{_label(operation)}",'
+                             f'endpoint="{_label(endpoint)}"}} {metrics[key]}')
+        for name, key, label, description in (('responses', 'statuses', 'status', 'Responses by HTTP status'),
+                                              ('errors', 'errors', 'code', 'GraphQL errors by code')):
+            lines.append(f'# HELP rivian_graphql_{name}_total {description}')
+            lines.append(f'# TYPE rivian_graphql_{name}_total counter')
+            for (operation, endpoint), metrics in sorted(snapshot.items()):
+                for value, count in sorted(metrics[key].items(), key=lambda item: str(item[0])):
+                    lines.append(f'rivian_graphql_{name}_total{{operation="{_label(operation)}",'
+                                 f'endpoint="{_label(endpoint)}",{label}="{_label(value)}"}} {count}')
+        return '\n'.join(lines) + '\n'
+
+    def serve(self, port=9100, host='127.0.0.1'):
+        # Prometheus endpoint on http://host:port/metrics in a background thread
+        return MetricsServer(self, host, port).start()
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/', '/metrics'):
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        data = self.server.metrics.prometheus().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MetricsServer:
+    def __init__(self, metrics, host='127.0.0.1', port=9100):
+        self.httpd = ThreadingHTTPServer((host, port), MetricsHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.metrics = metrics
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/metrics"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
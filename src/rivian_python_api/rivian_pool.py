@@ -0,0 +1,69 @@
+import threading
+
+try:
+    from .rivian_api import DEFAULT_POOL_SIZE, RIVIAN_BASE_PATH, Rivian, create_session
+except ImportError:
+    from rivian_api import DEFAULT_POOL_SIZE, RIVIAN_BASE_PATH, Rivian, create_session
+
+# Rivian objects for many accounts in one process. They share one keep-alive session (connection
+# pools only, every account sends its own tokens) and any other client options given here, e.g. one
+# Metrics registry. Each account can get its own rate limiter. Safe to use from many threads.
+
+
+class ClientPool:
+    def __init__(self, pool_size=DEFAULT_POOL_SIZE, session=None, rate_limiter_factory=None, **client_options):
+        # client_options are passed to every Rivian (base_url, metrics, retry_policy, ...)
+        self.client_options = client_options
+        self.rate_limiter_factory = rate_limiter_factory
+        if session is None:
+            session = create_session(pool_size=pool_size, base_path=client_options.get('base_url', RIVIAN_BASE_PATH))
+            self._close_session = True
+        else:
+            self._close_session = False
+        self.session = session
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, access_token="", refresh_token="", user_session_token="", token_callback=None):
+        # Client for an account that's already logged in (see Rivian.login), replaces one of the same name
+        rivian = Rivian(session=self.session,
+                        rate_limiter=self.rate_limiter_factory() if self.rate_limiter_factory else None,
+                        account=name, **self.client_options)
+        rivian.set_tokens(access_token, refresh_token, user_session_token)
+        rivian.token_callback = token_callback
+        with self._lock:
+            self._clients[name] = rivian
+        return rivian
+
+    def get(self, name):
+        with self._lock:
+            return self._clients[name]
+
+    def __getitem__(self, name):
+        return self.get(name)
+
+    def __contains__(self, name):
+        with self._lock:
+            return name in self._clients
+
+    def __len__(self):
+        with self._lock:
+            return len(self._clients)
+
+    def names(self):
+        with self._lock:
+            return list(self._clients)
+
+    def remove(self, name):
+        with self._lock:
+            return self._clients.pop(name, None)
+
+    def close(self):
+        if self._close_session:
+            self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
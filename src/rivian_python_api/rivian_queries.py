@@ -0,0 +1,714 @@
+import hashlib
+import re
+import time
+from collections import namedtuple
+from functools import lru_cache
+
+# GraphQL operations shared by the sync (Rivian) and async (AsyncRivian) clients.
+# Each builder returns the endpoint, the kind of headers it needs and the request body.
+
+# Endpoints, see ENDPOINT_PATHS in rivian_api
+GATEWAY = 'gateway'
+CHARGING = 'chrg'
+ORDERS = 'orders'
+CONTENT = 'content'
+TRANSACTIONS = 't2d'
+
+# Header kinds
+BASE_HEADERS = 'base'
+LOGIN_HEADERS = 'login'
+GATEWAY_HEADERS = 'gateway'
+TRANSACTION_HEADERS = 'transaction'
+
+Operation = namedtuple('Operation', ['endpoint', 'headers', 'query'])
+
+PERSISTED_QUERY_VERSION = 1
+
+
+LOGIN_QUERY = "mutation Login($email: String!, $password: String!) {\n  login(email: $email, password: $password) {\n    __typename\n    ... on MobileLoginResponse {\n      __typename\n      accessToken\n      refreshToken\n      userSessionToken\n    }\n    ... on MobileMFALoginResponse {\n      __typename\n      otpToken\n    }\n  }\n}"
+
+
+def login(username, password):
+    return Operation(GATEWAY, LOGIN_HEADERS, {
+        "operationName": "Login",
+        "query": LOGIN_QUERY,
+        "variables": {"email": username, "password": password},
+    })
+
+
+LOGIN_WITH_OTP_QUERY = "mutation LoginWithOTP($email: String!, $otpCode: String!, $otpToken: String!) {\n  loginWithOTP(email: $email, otpCode: $otpCode, otpToken: $otpToken) {\n    __typename\n    ... on MobileLoginResponse {\n      __typename\n      accessToken\n      refreshToken\n      userSessionToken\n    }\n  }\n}"
+
+
+def login_with_otp(username, otpCode, otpToken):
+    return Operation(GATEWAY, LOGIN_HEADERS, {
+        "operationName": "LoginWithOTP",
+        "query": LOGIN_WITH_OTP_QUERY,
+        "variables": {
+            "email": username,
+            "otpCode": otpCode,
+            "otpToken": otpToken,
+        },
+    })
+
+
+REFRESH_TOKEN_QUERY = "mutation RefreshToken($token: String!) {\n  refreshToken(token: $token) {\n    __typename\n    accessToken\n    refreshToken\n    userSessionToken\n  }\n}"
+
+
+def refresh_token(token):
+    return Operation(GATEWAY, LOGIN_HEADERS, {
+        "operationName": "RefreshToken",
+        "query": REFRESH_TOKEN_QUERY,
+        "variables": {"token": token},
+    })
+
+
+CREATE_CSRF_TOKEN_QUERY = "mutation CreateCSRFToken {createCsrfToken {__typename csrfToken appSessionToken}}"
+
+
+def create_csrf_token():
+    return Operation(GATEWAY, BASE_HEADERS, {
+        "operationName": "CreateCSRFToken",
+        "query": CREATE_CSRF_TOKEN_QUERY,
+        "variables": None,
+    })
+
+
+VEHICLE_ORDERS_QUERY = "query vehicleOrders { orders(input: {orderTypes: [PRE_ORDER, VEHICLE], pageInfo: {from: 0, size: 10000}}) { __typename data { __typename id orderDate state configurationStatus fulfillmentSummaryStatus items { __typename sku } consumerStatuses { __typename isConsumerFlowComplete } } } }"
+
+
+def vehicle_orders():
+    return Operation(GATEWAY, GATEWAY_HEADERS, {
+        "operationName": "vehicleOrders",
+        "query": VEHICLE_ORDERS_QUERY,
+        "variables": {},
+    })
+
+
+DELIVERY_QUERY = "query delivery($orderId: ID!) { delivery(orderId: $orderId) { __typename status carrier deliveryAddress { __typename addressLine1 addressLine2 city state country zipcode } appointmentDetails { __typename appointmentId startDateTime endDateTime timeZone } vehicleVIN } }"
+
+
+def delivery(order_id):
+    return Operation(GATEWAY, GATEWAY_HEADERS, {
+        "operationName": "delivery",
+        "query": DELIVERY_QUERY,
+        "variables": {
+            "orderId": order_id,
+        },
+    })
+
+
+TRANSACTION_STATUS_QUERY = "query transactionStatus($orderId: ID!) { transactionStatus(orderId: $orderId) { titleAndReg { sourceStatus { status details } consumerStatus { displayOrder current complete locked inProgress notStarted error } } tradeIn { sourceStatus { status details } consumerStatus { displayOrder current complete locked inProgress notStarted error } } finance { sourceStatus { status details } consumerStatus { displayOrder current complete locked inProgress notStarted error } } delivery { sourceStatus { status details } consumerStatus { displayOrder current complete locked inProgress notStarted error } } insurance { sourceStatus { status details } consumerStatus { displayOrder current complete locked inProgress notStarted error } } documentUpload { sourceStatus { status details } consumerStatus { displayOrder current complete locked inProgress notStarted error } } contracts { sourceStatus { status details } consumerStatus { displayOrder current complete locked inProgress notStarted error } } payment { sourceStatus { status details } consumerStatus { displayOrder current complete locked inProgress notStarted error } } } }"
+
+
+def transaction_status(order_id):
+    return Operation(TRANSACTIONS, TRANSACTION_HEADERS, {
+        "operationName": "transactionStatus",
+        "query": TRANSACTION_STATUS_QUERY,
+        "variables": {
+            "orderId": order_id
+        },
+    })
+
+
+FINANCE_SUMMARY_QUERY = "query financeSummary($orderId: ID!) { ...FinanceSummaryFragment } fragment FinanceSummaryFragment on Query { financeSummary(orderId: $orderId) { orderId status financeChoice { financeChoice institutionName paymentMethod trackingNumber preApprovedAmount loanOfficerName loanOfficerContact downPayment rate term rateAndTermSkipped } } }"
+
+
+def finance_summary(order_id):
+    return Operation(TRANSACTIONS, TRANSACTION_HEADERS, {
+        "operationName": "financeSummary",
+        "query": FINANCE_SUMMARY_QUERY,
+        "variables": {"orderId": order_id},
+    })
+
+
+ORDER_QUERY = "query order($id: String!) { order(id: $id) { vin state billingAddress { firstName lastName line1 line2 city state country postalCode } shippingAddress { firstName lastName line1 line2 city state country postalCode } orderCancelDate orderEmail currency locale storeId type subtotal discountTotal taxTotal feesTotal paidTotal remainingTotal outstandingBalance costAfterCredits total payments { id intent date method amount referenceNumber status card { last4 expiryDate brand } bank { bankName country last4 } transactionNotes } tradeIns { tradeInReferenceId amount } vehicle { vehicleId vin modelYear model make } items { id discounts { total items {  amount  title  code } } subtotal quantity title productId type unitPrice fees { items {  description  amount  code  type } total } taxes { items {  description  amount  code  rate  type } total } sku shippingAddress { firstName lastName line1 line2 city state country postalCode } configuration { ruleset {  meta {  rulesetId  storeId  country  vehicle  version  effectiveDate  currency  locale  availableLocales  }  defaults {  basePrice  initialSelection  }  groups  options  specs  rules } basePrice version options {  optionId  optionName  optionDetails {  name  attrs  price  visualExterior  visualInterior  hidden  disabled  required  }  groupId  groupName  groupDetails {  name  attrs  multiselect  required  options  }  price } } } }}"
+
+
+def order(order_id):
+    return Operation(ORDERS, TRANSACTION_HEADERS, {
+        "operationName": "order",
+        "query": ORDER_QUERY,
+        "variables": {"id": order_id},
+    })
+
+
+RETAIL_ORDERS_QUERY = "query searchOrders($input: UserOrderSearchInput!) { searchOrders(input: $input) { total data { id type orderDate state fulfillmentSummaryStatus items { id title type sku __typename } __typename } __typename }}"
+
+
+def retail_orders():
+    return Operation(ORDERS, TRANSACTION_HEADERS, {
+        "operationName": "searchOrders",
+        "query": RETAIL_ORDERS_QUERY,
+        "variables": {
+            "input": {
+                "orderTypes": ["RETAIL"],
+                "orderStates": None,
+                "pageInfo": {
+                    "from": 0,
+                    "size": 5
+                },
+                "dateRange": None,
+                "sortFields": {
+                    "orderDate": "DESC"
+                }
+            }
+        },
+    })
+
+
+GET_ORDER_QUERY = "query getOrder($orderId: String!) { order(id: $orderId) { id storeId userId orderDate orderCancelDate type state currency locale subtotal discountTotal taxTotal total shippingAddress { firstName lastName line1 line2 city state country postalCode __typename } payments { method currency status type card { last4 expiryDate brand __typename } __typename } items { id title type sku unitPrice quantity state productDetails { ... on ChildProduct { dimensionValues { name valueName localizedStrings __typename } __typename } __typename } __typename } fulfillmentSummaryStatus fulfillmentInfo { fulfillments { fulfillmentId fulfillmentStatus fulfillmentMethod fulfillmentVendor tracking { status carrier number url shipDate deliveredDate serviceType __typename } estimatedDeliveryWindow { startDate endDate __typename } items { orderItemId quantityFulfilled isPartialFulfillment __typename } __typename } pendingFulfillmentItems { orderItemId quantity __typename } __typename } __typename }}"
+
+
+def get_order(order_id):
+    return Operation(ORDERS, TRANSACTION_HEADERS, {
+        "operationName": "getOrder",
+        "query": GET_ORDER_QUERY,
+        "variables": {
+            "orderId": order_id
+        },
+    })
+
+
+PAYMENT_METHODS_QUERY = "query paymentMethods { paymentMethods { id type default card { lastFour brand expiration postalCode } } }"
+
+
+def payment_methods():
+    return Operation(ORDERS, TRANSACTION_HEADERS, {
+        "operationName": "paymentMethods",
+        "query": PAYMENT_METHODS_QUERY,
+        "variables": {},
+    })
+
+
+GET_USER_INFORMATION_QUERY = "query getUserInfo { currentUser { __typename id firstName lastName email address { __typename country } vehicles { __typename id name owner roles vin vas { __typename vasVehicleId vehiclePublicKey } state createdAt updatedAt vehicle { __typename id vin modelYear make model expectedBuildDate plannedBuildDate expectedGeneralAssemblyStartDate actualGeneralAssemblyDate mobileConfiguration { __typename trimOption { __typename optionId optionName } exteriorColorOption { __typename optionId optionName } interiorColorOption { __typename optionId optionName } } vehicleState { __typename supportedFeatures { __typename name status } } otaEarlyAccessStatus } settings { __typename name { __typename value } } } enrolledPhones { __typename vas { __typename vasPhoneId publicKey } enrolled { __typename deviceType deviceName vehicleId identityId shortName } } pendingInvites { __typename id invitedByFirstName role status vehicleId vehicleModel email } } }"
+
+
+def get_user_information():
+    return Operation(GATEWAY, GATEWAY_HEADERS, {
+        "operationName": "getUserInfo",
+        "query": GET_USER_INFORMATION_QUERY,
+        "variables": None,
+    })
+
+
+GET_VEHICLE_STATE_QUERY = (
+    "query GetVehicleState($vehicleID: String!) { "
+    "vehicleState(id: $vehicleID) { __typename "
+    "cloudConnection { __typename lastSync } "
+    "gnssLocation { __typename latitude longitude timeStamp } "
+    "gnssSpeed { __typename timeStamp value } "
+    "gnssBearing { __typename timeStamp value } "
+    "gnssAltitude { __typename timeStamp value } "
+    "gnssError { __typename timeStamp positionVertical positionHorizontal speed bearing } "
+    "alarmSoundStatus { __typename timeStamp value } "
+    "timeToEndOfCharge { __typename timeStamp value } "
+    "doorFrontLeftLocked { __typename timeStamp value } "
+    "doorFrontLeftClosed { __typename timeStamp value } "
+    "doorFrontRightLocked { __typename timeStamp value } "
+    "doorFrontRightClosed { __typename timeStamp value } "
+    "doorRearLeftLocked { __typename timeStamp value } "
+    "doorRearLeftClosed { __typename timeStamp value } "
+    "doorRearRightLocked { __typename timeStamp value } "
+    "doorRearRightClosed { __typename timeStamp value } "
+    "windowFrontLeftClosed { __typename timeStamp value } "
+    "windowFrontRightClosed { __typename timeStamp value } "
+    "windowRearLeftClosed { __typename timeStamp value } "
+    "windowRearRightClosed { __typename timeStamp value } "
+    "windowFrontLeftCalibrated { __typename timeStamp value } "
+    "windowFrontRightCalibrated { __typename timeStamp value } "
+    "windowRearLeftCalibrated { __typename timeStamp value } "
+    "windowRearRightCalibrated { __typename timeStamp value } "
+    "windowsNextAction { __typename timeStamp value } "
+    "closureFrunkLocked { __typename timeStamp value } "
+    "closureFrunkClosed { __typename timeStamp value } "
+    "closureFrunkNextAction { __typename timeStamp value } "
+    "gearGuardLocked { __typename timeStamp value } "
+    "closureLiftgateLocked { __typename timeStamp value } "
+    "closureLiftgateClosed { __typename timeStamp value } "
+    "closureLiftgateNextAction { __typename timeStamp value } "
+    "windowRearLeftClosed { __typename timeStamp value } "
+    "windowRearRightClosed { __typename timeStamp value } "
+    "closureSideBinLeftLocked { __typename timeStamp value } "
+    "closureSideBinLeftClosed { __typename timeStamp value } "
+    "closureSideBinRightLocked { __typename timeStamp value } "
+    "closureSideBinRightClosed { __typename timeStamp value } "
+    "closureTailgateLocked { __typename timeStamp value } "
+    "closureTailgateClosed { __typename timeStamp value } "
+    "closureTonneauLocked { __typename timeStamp value } "
+    "closureTonneauClosed { __typename timeStamp value } "
+    "wiperFluidState { __typename timeStamp value } "
+    "powerState { __typename timeStamp value } "
+    "batteryHvThermalEventPropagation { __typename timeStamp value } "
+    "vehicleMileage { __typename timeStamp value } "
+    "brakeFluidLow { __typename timeStamp value } "
+    "gearStatus { __typename timeStamp value } "
+    "tirePressureStatusFrontLeft { __typename timeStamp value } "
+    "tirePressureStatusValidFrontLeft { __typename timeStamp value } "
+    "tirePressureStatusFrontRight { __typename timeStamp value } "
+    "tirePressureStatusValidFrontRight { __typename timeStamp value } "
+    "tirePressureStatusRearLeft { __typename timeStamp value } "
+    "tirePressureStatusValidRearLeft { __typename timeStamp value } "
+    "tirePressureStatusRearRight { __typename timeStamp value } "
+    "tirePressureStatusValidRearRight { __typename timeStamp value } "
+    "batteryLevel { __typename timeStamp value } "
+    "chargerState { __typename timeStamp value } "
+    "batteryLimit { __typename timeStamp value } "
+    "batteryCapacity { __typename timeStamp value } "
+    "remoteChargingAvailable { __typename timeStamp value } "
+    "batteryHvThermalEvent { __typename timeStamp value } "
+    "rangeThreshold { __typename timeStamp value } "
+    "distanceToEmpty { __typename timeStamp value } "
+    "otaAvailableVersion { __typename timeStamp value } "
+    "otaAvailableVersionWeek { __typename timeStamp value } "
+    "otaAvailableVersionYear { __typename timeStamp value } "
+    "otaCurrentVersion { __typename timeStamp value } "
+    "otaCurrentVersionNumber { __typename timeStamp value } "
+    "otaCurrentVersionWeek { __typename timeStamp value } "
+    "otaCurrentVersionYear { __typename timeStamp value } "
+    "otaDownloadProgress { __typename timeStamp value } "
+    "otaInstallDuration { __typename timeStamp value } "
+    "otaInstallProgress { __typename timeStamp value } "
+    "otaInstallReady { __typename timeStamp value } "
+    "otaInstallTime { __typename timeStamp value } "
+    "otaInstallType { __typename timeStamp value } "
+    "otaStatus { __typename timeStamp value } "
+    "otaCurrentStatus { __typename timeStamp value } "
+    "cabinClimateInteriorTemperature { __typename timeStamp value } "
+    "cabinPreconditioningStatus { __typename timeStamp value } "
+    "cabinPreconditioningType { __typename timeStamp value } "
+    "petModeStatus { __typename timeStamp value } "
+    "petModeTemperatureStatus { __typename timeStamp value } "
+    "cabinClimateDriverTemperature { __typename timeStamp value } "
+    "gearGuardVideoStatus { __typename timeStamp value } "
+    "gearGuardVideoMode { __typename timeStamp value } "
+    "gearGuardVideoTermsAccepted { __typename timeStamp value } "
+    "defrostDefogStatus { __typename timeStamp value } "
+    "steeringWheelHeat { __typename timeStamp value } "
+    "seatFrontLeftHeat { __typename timeStamp value } "
+    "seatFrontRightHeat { __typename timeStamp value } "
+    "seatRearLeftHeat { __typename timeStamp value } "
+    "seatRearRightHeat { __typename timeStamp value } "
+    "chargerStatus { __typename timeStamp value } "
+    "seatFrontLeftVent { __typename timeStamp value } "
+    "seatFrontRightVent { __typename timeStamp value } "
+    "chargerDerateStatus { __typename timeStamp value } "
+    "driveMode { __typename timeStamp value } "
+    "limitedAccelCold { __typename timeStamp value } "
+    "limitedRegenCold { __typename timeStamp value } "
+    "twelveVoltBatteryHealth { __typename timeStamp value } "
+    "serviceMode { __typename timeStamp value } "
+    "trailerStatus { __typename timeStamp value } "
+    "btmFfHardwareFailureStatus { __typename timeStamp value } "
+    "btmIcHardwareFailureStatus { __typename timeStamp value } "
+    "btmLfdHardwareFailureStatus { __typename timeStamp value } "
+    "btmRfHardwareFailureStatus { __typename timeStamp value } "
+    "btmRfdHardwareFailureStatus { __typename timeStamp value } "
+    "carWashMode { __typename timeStamp value } "
+    "chargePortState { __typename timeStamp value } "
+    "chargingTimeEstimationValidity { __typename timeStamp value } "
+    "rearHitchStatus { __typename timeStamp value } "
+    "} }"
+)
+
+# vehicleState field -> the sub fields it offers, taken from the full query so there's one list to maintain
+VEHICLE_STATE_FIELDS = {}
+for _field, _sub_fields in re.findall(r'(\w+) \{ ([\w ]+) \}', GET_VEHICLE_STATE_QUERY):
+    VEHICLE_STATE_FIELDS[_field] = tuple(f for f in _sub_fields.split() if f != '__typename')
+
+
+def _projection(fields):
+    # Normalized, catalog ordered ((field, sub fields), ...) for a set of "field" or "field.sub" names.
+    # A bare field selects what it has besides timeStamp (e.g. value, or latitude/longitude).
+    if isinstance(fields, str):
+        fields = [fields]
+    selected = {}
+    for name in fields:
+        field, _, sub_field = name.partition('.')
+        if field not in VEHICLE_STATE_FIELDS:
+            raise ValueError(f"Unknown vehicleState field: {field}")
+        available = VEHICLE_STATE_FIELDS[field]
+        if sub_field:
+            if sub_field not in available:
+                raise ValueError(f"Unknown vehicleState field: {name}")
+            wanted = (sub_field,)
+        else:
+            wanted = tuple(f for f in available if f != 'timeStamp') or available
+        selected.setdefault(field, set()).update(wanted)
+    if not selected:
+        raise ValueError("No vehicleState fields selected")
+    return tuple((field, tuple(f for f in VEHICLE_STATE_FIELDS[field] if f in selected[field]))
+                 for field in VEHICLE_STATE_FIELDS if field in selected)
+
+
+@lru_cache(maxsize=256)
+def _compile_vehicle_state_query(projection):
+    selection = " ".join(f"{field} {{ {' '.join(sub_fields)} }}" for field, sub_fields in projection)
+    return f"query GetVehicleState($vehicleID: String!) {{ vehicleState(id: $vehicleID) {{ {selection} }} }}"
+
+
+def vehicle_state_query(fields):
+    # GetVehicleState document selecting only fields, built once per distinct field set
+    return _compile_vehicle_state_query(_projection(fields))
+
+
+# What the CLI poll loop and the fleet poller read
+VEHICLE_STATE_MINIMAL_FIELDS = (
+    'cloudConnection', 'powerState', 'driveMode', 'gearStatus', 'vehicleMileage', 'batteryLevel',
+    'distanceToEmpty', 'gnssLocation', 'gnssSpeed', 'chargerStatus', 'chargerState', 'batteryLimit',
+    'timeToEndOfCharge',
+)
+GET_VEHICLE_STATE_MINIMAL_QUERY = vehicle_state_query(VEHICLE_STATE_MINIMAL_FIELDS)
+
+
+def get_vehicle_state(vehicle_id, minimal=False, fields=None):
+    if fields:
+        query = vehicle_state_query(fields)
+    elif minimal:
+        query = GET_VEHICLE_STATE_MINIMAL_QUERY
+    else:
+        query = GET_VEHICLE_STATE_QUERY
+    return Operation(GATEWAY, GATEWAY_HEADERS, {
+        "operationName": "GetVehicleState",
+        "query": query,
+        "variables": {
+            'vehicleID': vehicle_id,
+        },
+    })
+
+
+GET_VEHICLE_LAST_CONNECTION_QUERY = "query GetVehicleLastConnection($vehicleID: String!) { vehicleState(id: $vehicleID) { __typename cloudConnection { __typename lastSync } } }"
+
+
+def get_vehicle_last_connection(vehicle_id):
+    return Operation(GATEWAY, GATEWAY_HEADERS, {
+        "operationName": "GetVehicleLastConnection",
+        "query": GET_VEHICLE_LAST_CONNECTION_QUERY,
+        "variables": {
+            'vehicleID': vehicle_id,
+        },
+    })
+
+
+PLAN_TRIP_QUERY = "query planTrip($origin: CoordinatesInput!, $destination: CoordinatesInput!, $bearing: Float!, $vehicleId: String!, $startingSoc: Float!, $startingRangeMeters: Float!) { planTrip(bearing: $bearing, vehicleId: $vehicleId, startingSoc: $startingSoc, origin: $origin, destination: $destination, startingRangeMeters: $startingRangeMeters) { routes { routeResponse destinationReached totalChargingDuration arrivalSOC arrivalReachableDistance waypoints { waypointType entityId name latitude longitude maxPower chargeDuration arrivalSOC arrivalReachableDistance departureSOC departureReachableDistance } energyConsumptionOnLeg batteryEmptyToDestinationDistance batteryEmptyLocationLatitude batteryEmptyLocationLongitude } tripPlanStatus chargeStationsAvailable socBelowLimit } }"
+
+
+def plan_trip(vehicle_id, starting_soc, starting_range_meters, origin_lat, origin_long, dest_lat, dest_long):
+    return Operation(GATEWAY, GATEWAY_HEADERS, {
+        "operationName": "planTrip",
+        "query": PLAN_TRIP_QUERY,
+        "variables": {
+            'origin': {
+                'latitude': origin_lat,
+                'longitude': origin_long,
+            },
+            'destination': {
+                'latitude': dest_lat,
+                'longitude': dest_long,
+            },
+            'bearing': 0,
+            'vehicleId': vehicle_id,
+            'startingRangeMeters': starting_range_meters,
+            'startingSoc': starting_soc,
+        },
+    })
+
+
+GET_OTA_DETAILS_QUERY = "query GetVehicle($vehicleId: String!) { getVehicle(id: $vehicleId) { availableOTAUpdateDetails { url version locale } currentOTAUpdateDetails { url version locale } } }"
+
+
+def get_ota_details(vehicle_id):
+    return Operation(GATEWAY, GATEWAY_HEADERS, {
+        "operationName": "GetVehicle",
+        "query": GET_OTA_DETAILS_QUERY,
+        "variables": {
+            'vehicleId': vehicle_id,
+        },
+    })
+
+
+CHECK_BY_RIVIAN_ID_QUERY = "query CheckByRivianId { chargepoint { checkByRivianId } }"
+
+
+def check_by_rivian_id():
+    return Operation(CHARGING, TRANSACTION_HEADERS, {
+        "operationName": "CheckByRivianId",
+        "query": CHECK_BY_RIVIAN_ID_QUERY,
+        "variables": {},
+    })
+
+
+GET_LINKED_EMAIL_FOR_RIVIAN_ID_QUERY = "query getLinkedEmailForRivianId { chargepoint { getLinkedEmailForRivianId { email } } }"
+
+
+def get_linked_email_for_rivian_id():
+    return Operation(CHARGING, TRANSACTION_HEADERS, {
+        "operationName": "getLinkedEmailForRivianId",
+        "query": GET_LINKED_EMAIL_FOR_RIVIAN_ID_QUERY,
+        "variables": {},
+    })
+
+
+GET_PARAMETER_STORE_VALUES_QUERY = "query getParameterStoreValues($keys: [String!]!) { getParameterStoreValues(keys: $keys) { key value } }"
+
+
+def get_parameter_store_values():
+    return Operation(ORDERS, TRANSACTION_HEADERS, {
+        "operationName": "getParameterStoreValues",
+        "query": GET_PARAMETER_STORE_VALUES_QUERY,
+        "variables": {
+            "keys": ["FF_ACCOUNT_ESTIMATED_DELIVERY_WINDOW_STATIC_MSG"]
+        },
+    })
+
+
+GET_VEHICLE_QUERY = "query GetVehicle($getVehicleId: String) { getVehicle(id: $getVehicleId) { invitedUsers { __typename ... on ProvisionedUser { devices { type mappedIdentityId id hrid deviceName isPaired isEnabled } firstName lastName email roles userId } ... on UnprovisionedUser { email inviteId status } } } }"
+
+
+def get_vehicle(vehicle_id):
+    return Operation(GATEWAY, GATEWAY_HEADERS, {
+        "operationName": "GetVehicle",
+        "query": GET_VEHICLE_QUERY,
+        "variables": {
+            "getVehicleId": vehicle_id
+        },
+    })
+
+
+GET_REGISTERED_WALLBOXES_QUERY = "query getRegisteredWallboxes { getRegisteredWallboxes { __typename wallboxId userId wifiId name linked latitude longitude chargingStatus power currentVoltage currentAmps softwareVersion model serialNumber maxPower maxVoltage maxAmps } }"
+
+
+def get_registered_wallboxes():
+    return Operation(CHARGING, GATEWAY_HEADERS, {
+        "operationName": "getRegisteredWallboxes",
+        "query": GET_REGISTERED_WALLBOXES_QUERY,
+        "variables": {},
+    })
+
+
+GET_PROVISIONED_CAMP_SPEAKERS_QUERY = "query GetProvisionedCampSpeakers { currentUser { __typename vehicles { __typename id connectedProducts { __typename ... on CampSpeaker { serialNumber id } } } } }"
+
+
+def get_provisioned_camp_speakers():
+    return Operation(GATEWAY, GATEWAY_HEADERS, {
+        "operationName": "GetProvisionedCampSpeakers",
+        "query": GET_PROVISIONED_CAMP_SPEAKERS_QUERY,
+        "variables": {},
+    })
+
+
+GET_VEHICLE_IMAGES_QUERY = "query getVehicleImages($extension: String!, $resolution: String!) { getVehicleOrderMobileImages(resolution: $resolution, extension: $extension) { __typename orderId url resolution size design placement } getVehicleMobileImages(resolution: $resolution, extension: $extension) { __typename vehicleId url resolution size design placement } }"
+
+
+def get_vehicle_images():
+    return Operation(GATEWAY, GATEWAY_HEADERS, {
+        "operationName": "getVehicleImages",
+        "query": GET_VEHICLE_IMAGES_QUERY,
+        "variables": {
+            "extension": "webp",
+            "resolution": "hdpi"
+        },
+    })
+
+
+USER_QUERY = "query user { user { email { email } phone { formatted } firstName lastName addresses { id type line1 line2 city state country postalCode } newsletterSubscription smsSubscription registrationChannels2FA userId vehicles {id highestPriorityRole __typename } invites (filterStates: [PENDING]) {id inviteState vehicleModel vehicleId creatorFirstName} orderSnapshots(filterTypes: [PRE_ORDER, VEHICLE, RETAIL]) { ...OrderSnapshotsFragment } }} fragment OrderSnapshotsFragment on OrderSnapshot { id total paidTotal subtotal state configurationStatus currency orderDate type fulfillmentSummaryStatus }"
+
+
+def user():
+    return Operation(ORDERS, GATEWAY_HEADERS, {
+        "operationName": "user",
+        "query": USER_QUERY,
+        "variables": {},
+    })
+
+
+GET_CHARGING_SCHEDULE_QUERY = "query GetChargingSchedule($vehicleId: String!) { getVehicle(id: $vehicleId) { chargingSchedules { startTime duration location { latitude longitude } amperage enabled weekDays } } }"
+
+
+def get_charging_schedule(vehicle_id):
+    return Operation(GATEWAY, GATEWAY_HEADERS, {
+        "operationName": "GetChargingSchedule",
+        "query": GET_CHARGING_SCHEDULE_QUERY,
+        "variables": {
+            "vehicleId": vehicle_id
+        },
+    })
+
+
+GET_COMPLETED_SESSION_SUMMARIES_QUERY = "query getCompletedSessionSummaries { getCompletedSessionSummaries { chargerType currencyCode paidTotal startInstant endInstant totalEnergyKwh rangeAddedKm city transactionId vehicleId vehicleName vendor isRoamingNetwork isPublic isHomeCharger meta {  transactionIdGroupingKey  dataSources } }}"
+
+
+def get_completed_session_summaries():
+    return Operation(CHARGING, GATEWAY_HEADERS, {
+        "operationName": "getCompletedSessionSummaries",
+        "query": GET_COMPLETED_SESSION_SUMMARIES_QUERY,
+        "variables": {},
+    })
+
+
+GET_CHARGING_SESSION_STATUS_QUERY = "query GetChargingSessionStatus($jobId: ID!, $userId: ID!) { getSessionStatus(jobId: $jobId, userId: $userId) { status errorMessage errorId sessionId } }"
+
+
+def get_charging_session_status(job_id, user_id):
+    return Operation(CHARGING, GATEWAY_HEADERS, {
+        "operationName": "GetChargingSessionStatus",
+        "query": GET_CHARGING_SESSION_STATUS_QUERY,
+        "variables": {
+            "jobId": "123",
+            "userId": "123"
+        },
+    })
+
+
+GET_NON_RIVIAN_USER_SESSION_QUERY = "query getNonRivianUserSession { getNonRivianUserSession { chargerId transactionId isRivianCharger vehicleChargerState { value updatedAt } } }"
+
+
+def get_non_rivian_user_session():
+    return Operation(CHARGING, GATEWAY_HEADERS, {
+        "operationName": "getNonRivianUserSession",
+        "query": GET_NON_RIVIAN_USER_SESSION_QUERY,
+        "variables": {},
+    })
+
+
+GET_LIVE_SESSION_DATA_QUERY = (
+    "query getLiveSessionData($vehicleId: ID) "
+    "{ getLiveSessionData(vehicleId: $vehicleId) "
+    "{ isRivianCharger isFreeSession vehicleChargerState { value updatedAt } "
+    "chargerId startTime timeElapsed timeRemaining { value updatedAt } kilometersChargedPerHour "
+    "{ value updatedAt } power { value updatedAt } rangeAddedThisSession { value updatedAt } "
+    "totalChargedEnergy { value updatedAt } timeRemaining { value updatedAt } vehicleChargerState "
+    "{ value updatedAt } kilometersChargedPerHour { value updatedAt } "
+    "currentPrice soc { value } currentMiles { value } current { value } } }"
+)
+
+
+def get_live_session_data(vehicle_id):
+    return Operation(CHARGING, GATEWAY_HEADERS, {
+        "operationName": "getLiveSessionData",
+        "query": GET_LIVE_SESSION_DATA_QUERY,
+        "variables": {
+            "vehicleId": vehicle_id
+        },
+    })
+
+
+GET_LIVE_SESSION_HISTORY_QUERY = "query getLiveSessionHistory($vehicleId: ID) { getLiveSessionHistory(vehicleId: $vehicleId) { chartData { kw time } } }"
+
+
+def get_live_session_history(vehicle_id):
+    return Operation(CHARGING, GATEWAY_HEADERS, {
+        "operationName": "getLiveSessionHistory",
+        "query": GET_LIVE_SESSION_HISTORY_QUERY,
+        "variables": {
+            "vehicleId": vehicle_id
+        },
+    })
+
+
+SEND_VEHICLE_COMMAND_QUERY = "mutation sendVehicleCommand($attrs: VehicleCommandAttributes!) { sendVehicleCommand(attrs: $attrs) { __typename id command state } }"
+
+
+def send_vehicle_command(vehicle_id, command, vasPhoneId, deviceId, vehiclePublicKey):
+    return Operation(GATEWAY, GATEWAY_HEADERS, {
+        "operationName": "sendVehicleCommand",
+        "query": SEND_VEHICLE_COMMAND_QUERY,
+        "variables": {
+            "attrs": {
+                "command": command,
+                "hmac": 0, #your-hmac
+                "timestamp": time.time(),
+                "vasPhoneId": vasPhoneId,
+                "deviceId": deviceId,
+                "vehicleId": vehicle_id,
+            }
+        },
+    })
+
+
+GET_ADVENTURE_FEED_QUERY = 'query GetAdventureFeed($locale: String!, $slug: String!) { egAdventureFeedCollection(locale: $locale, limit: 1, where: { slug: $slug } ) { items { slug entryTitle cardsCollection(limit: 15) { items { __typename ... on EgAdventureFeedStoryCard { slug entryTitle title subtitle cover { entryTitle sourcesCollection(limit: 1) { items { entryTitle media auxiliaryData { __typename ... on EgImageAuxiliaryData { altText } } } } } slidesCollection { items { entryTitle duration theme gradient mediaCollection(limit: 2) { items { __typename ... on EgCloudinaryMedia { entryTitle sourcesCollection(limit: 1) { items { entryTitle media auxiliaryData { __typename ... on EgImageAuxiliaryData { altText } } } } } ... on EgLottieAnimation { entryTitle altText media mode } } } } } } ... on EgAdventureFeedEditorialCard { slug entryTitle title subtitle cover { entryTitle sourcesCollection(limit: 1) { items { entryTitle media auxiliaryData { __typename ... on EgImageAuxiliaryData { altText } } } } } sectionsCollection { items { entryTitle theme mediaCollection(limit: 2) { items { __typename ... on EgCloudinaryMedia { entryTitle sourcesCollection(limit: 1) { items { entryTitle media auxiliaryData { __typename ... on EgImageAuxiliaryData { altText } } } } } ... on EgLottieAnimation { entryTitle altText media mode } } } } } } } } } } }'
+
+
+def get_adventure_feed(locale="en_US"):
+    return Operation(CONTENT, GATEWAY_HEADERS, {
+        "operationName": "GetAdventureFeed",
+        "query": GET_ADVENTURE_FEED_QUERY,
+        "variables": {
+            "locale": locale,
+        },
+    })
+
+
+# Automatic persisted queries: a request carries only the sha256 of the (minified) document and
+# the text is sent again only when the server doesn't know the hash yet.
+GRAPHQL_TOKEN_RE = re.compile(r'"(?:[^"\\]|\\.)*"|#[^\n]*|[\s,]+|[^\s,"#]+')
+
+
+def _name_char(c):
+    return c.isalnum() or c == '_'
+
+
+def minify(query):
+    # Drops comments, commas and whitespace, keeping one space only where two names would run together
+    result = []
+    separated = False
+    for match in GRAPHQL_TOKEN_RE.finditer(query):
+        token = match.group(0)
+        if token[0] in '#,' or token[0].isspace():
+            separated = True
+            continue
+        if separated and result and _name_char(result[-1][-1]) and _name_char(token[0]):
+            result.append(' ')
+        separated = False
+        result.append(token)
+    return ''.join(result)
+
+
+OPERATION_TYPE_RE = re.compile(r'\s*(query|mutation|subscription)\b')
+# sha256 -> operation type of documents sent by hash, hash only requests don't carry the document
+_persisted_types = {}
+# Mutations that can be sent twice without harm, retried like queries (a second handshake only replaces the first)
+IDEMPOTENT_MUTATIONS = frozenset({'CreateCSRFToken'})
+
+
+@lru_cache(maxsize=512)
+def operation_type(document):
+    # 'query', 'mutation' or 'subscription'
+    match = OPERATION_TYPE_RE.match(document)
+    return match.group(1) if match else 'query'
+
+
+def request_type(query):
+    # Operation type of a request body, hash only ones included. A hash this module didn't make is
+    # taken for a mutation, nothing is assumed safe to send twice.
+    if "query" in query:
+        return operation_type(query["query"])
+    sha256_hash = ((query.get("extensions") or {}).get("persistedQuery") or {}).get("sha256Hash")
+    return _persisted_types.get(sha256_hash, 'mutation')
+
+
+def repeatable(query):
+    # Whether a request body may be sent again once it may have reached Rivian
+    return request_type(query) != 'mutation' or query.get("operationName") in IDEMPOTENT_MUTATIONS
+
+
+@lru_cache(maxsize=512)
+def persisted_query(query):
+    # (minified document, sha256 hex digest of it)
+    text = minify(query)
+    sha256_hash = hashlib.sha256(text.encode()).hexdigest()
+    _persisted_types[sha256_hash] = operation_type(text)
+    return text, sha256_hash
+
+
+def persisted_request(query):
+    # Request bodies for an operation: (hash only, hash and minified text)
+    text, sha256_hash = persisted_query(query["query"])
+    hashed = {key: value for key, value in query.items() if key != "query"}
+    hashed["extensions"] = {"persistedQuery": {"version": PERSISTED_QUERY_VERSION, "sha256Hash": sha256_hash}}
+    return hashed, dict(hashed, query=text)
+
+
+# Every known document is minified and hashed here, once, so requests only pay a cache lookup
+for _name, _query in list(globals().items()):
+    if _name.endswith('_QUERY') and isinstance(_query, str):
+        persisted_query(_query)
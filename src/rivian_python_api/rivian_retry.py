@@ -0,0 +1,174 @@
+import random
+import threading
+import time
+
+try:
+    from .rivian_limit import RATE_LIMIT_CODES, RATE_LIMIT_STATUS
+    from .rivian_metrics import error_codes
+    from .rivian_timeout import DeadlineExceeded
+except ImportError:
+    from rivian_limit import RATE_LIMIT_CODES, RATE_LIMIT_STATUS
+    from rivian_metrics import error_codes
+    from rivian_timeout import DeadlineExceeded
+
+# Retries and a circuit breaker for Rivian/AsyncRivian requests. Every attempt is classified, a
+# RetryPolicy decides whether (and after how long) to try again: exponential backoff with jitter,
+# bounded by attempts and total elapsed time. Mutations (vehicle commands, logins, token refreshes) are
+# only retried when no connection could be made, once a request may have reached Rivian repeating it
+# could run the command twice. Idempotent ones (the CSRF handshake, see rivian_queries) are retried like
+# queries. A CircuitBreaker shared by many clients (e.g. a fleet) stops sending requests for a while once
+# the API keeps failing, then lets one through to probe it.
+
+NETWORK = 'network'
+SERVER = 'server'
+AUTH = 'auth'
+RATE_LIMIT = 'rate_limit'
+CLIENT = 'client'
+
+AUTH_STATUS = (401, 403)
+AUTH_CODES = ('UNAUTHENTICATED', 'BAD_CURRENT_USER_SESSION', 'INVALID_CSRF_TOKEN')
+
+DEFAULT_RETRY_ON = (NETWORK, SERVER)
+# Failures that mean the API (not this request) is in trouble
+DEFAULT_BREAKER_ON = (NETWORK, SERVER)
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+def classify(response=None, error=None):
+    # Kind of failure of one attempt, None when it succeeded
+    if error is not None:
+        return NETWORK
+    if response.status_code >= 500:
+        return SERVER
+    if response.status_code in RATE_LIMIT_STATUS:
+        return RATE_LIMIT
+    if response.status_code in AUTH_STATUS:
+        return AUTH
+    codes = error_codes(response.content or b'')
+    if any(code in RATE_LIMIT_CODES for code in codes):
+        return RATE_LIMIT
+    if any(code in AUTH_CODES for code in codes):
+        return AUTH
+    if response.status_code >= 400:
+        return CLIENT
+    return None
+
+
+def classify_error(error):
+    # Kind of failure for an exception raised by RetryPolicy.call, None for ones not worth retrying
+    # (bugs, CircuitOpenError, a Deadline running out). requests' errors are OSErrors too.
+    if isinstance(error, OSError) and not isinstance(error, DeadlineExceeded):
+        return NETWORK
+    return None
+
+
+def retryable(repeatable, kind, sent):
+    # Whether a failed attempt may be sent again at all. repeatable: the request is safe to send twice
+    # (rivian_queries.repeatable), sent is False when it never left.
+    return repeatable or (kind == NETWORK and not sent)
+
+
+class RetryPolicy:
+    def __init__(self, max_attempts=5, base_delay=0.5, max_delay=30, multiplier=2, jitter=0.5, max_elapsed=120,
+                 retry_on=DEFAULT_RETRY_ON, clock=time.monotonic, sleep=time.sleep, seed=None):
+        # jitter: share of each delay that's random (1 is full jitter)
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self.jitter = jitter
+        self.max_elapsed = max_elapsed
+        self.retry_on = tuple(retry_on)
+        self.clock = clock
+        self.sleep = sleep
+        self._random = random.Random(seed)
+
+    def delay(self, attempt):
+        # Wait after the given failed attempt (1 based)
+        delay = min(self.max_delay, self.base_delay * self.multiplier ** (attempt - 1))
+        return delay - delay * self.jitter * self._random.random()
+
+    def next_delay(self, kind, attempt, started):
+        # Seconds to wait before the next attempt, None to give up
+        if kind not in self.retry_on or attempt >= self.max_attempts:
+            return None
+        delay = self.delay(attempt)
+        if self.clock() - started + delay > self.max_elapsed:
+            return None
+        return delay
+
+    def call(self, func, classify_result=lambda result: None, classify_error=classify_error):
+        # Runs func until it succeeds or the policy gives up. Exceptions are retried only as far as
+        # classify_error says they're worth it, anything else is raised right away.
+        started = self.clock()
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                result = func()
+            except Exception as e:
+                kind = classify_error(e)
+                delay = None if kind is None else self.next_delay(kind, attempt, started)
+                if delay is None:
+                    raise
+            else:
+                delay = self.next_delay(classify_result(result), attempt, started)
+                if delay is None:
+                    return result
+            self.sleep(delay)
+
+
+class CircuitBreaker:
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30, failure_kinds=DEFAULT_BREAKER_ON,
+                 clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failure_kinds = tuple(failure_kinds)
+        self.clock = clock
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = 0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def retry_after(self):
+        # Seconds until the next probe is let through, 0 while requests can go out
+        with self._lock:
+            if self.state != self.OPEN:
+                return 0
+            return max(0, self._opened_at + self.reset_timeout - self.clock())
+
+    def before_request(self):
+        # Raises CircuitOpenError instead of letting a request through to an API that's down
+        with self._lock:
+            if self.state == self.OPEN:
+                remaining = self._opened_at + self.reset_timeout - self.clock()
+                if remaining > 0:
+                    raise CircuitOpenError(f"Rivian API unavailable, not retrying for {remaining:.0f} seconds")
+                self.state = self.HALF_OPEN
+                self._probing = False
+            if self.state == self.HALF_OPEN:
+                if self._probing:
+                    raise CircuitOpenError("Rivian API unavailable, waiting for a probe request")
+                self._probing = True
+
+    def record(self, kind):
+        # Outcome of a request let through by before_request
+        with self._lock:
+            if kind in self.failure_kinds:
+                self.failures += 1
+                if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                    self.state = self.OPEN
+                    self._opened_at = self.clock()
+                self._probing = False
+            else:
+                self.state = self.CLOSED
+                self.failures = 0
+                self._probing = False
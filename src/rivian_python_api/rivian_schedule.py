@@ -0,0 +1,87 @@
+import time
+
+# Poll timing. A policy picks the next interval from the last vehicle state, the scheduler turns
+# intervals into due times on a monotonic clock. Both clock and sleep can be replaced (e.g. by a
+# fake clock in tests).
+
+# Power state = ready, go, sleep, standby
+# Gear = park, drive, reverse, neutral
+# Charge State = charging_ready or charging_active
+ACTIVE_GEARS = ('drive', 'reverse', 'neutral')
+ACTIVE_CHARGER_STATES = ('charging_active',)
+
+
+def state_value(state, field):
+    # Works for decoded vehicleState dicts and VehicleState-like objects
+    if state is None:
+        return None
+    if isinstance(state, dict):
+        entry = state.get(field)
+        return entry.get('value') if isinstance(entry, dict) else entry
+    return getattr(state, field, None)
+
+
+class FixedPolicy:
+    def __init__(self, interval):
+        self.interval = interval
+
+    def next_interval(self, state, previous_interval):
+        return self.interval
+
+
+class AdaptivePolicy:
+    # fast while driving or charging, normal while awake, exponential backoff while asleep
+    def __init__(self, fast=10, normal=30, sleep=60, sleep_max=30 * 60, backoff=2, error=None):
+        self.fast = fast
+        self.normal = normal
+        self.sleep = sleep
+        self.sleep_max = sleep_max
+        self.backoff = backoff
+        self.error = normal if error is None else error
+
+    def next_interval(self, state, previous_interval):
+        if state is None:
+            return self.error
+        power = state_value(state, 'powerState')
+        if power == 'go' or state_value(state, 'gearStatus') in ACTIVE_GEARS or \
+                state_value(state, 'chargerState') in ACTIVE_CHARGER_STATES:
+            return self.fast
+        if power == 'sleep':
+            if previous_interval is None or previous_interval < self.sleep:
+                return self.sleep
+            return min(previous_interval * self.backoff, self.sleep_max)
+        return self.normal
+
+
+class PollScheduler:
+    def __init__(self, policy, clock=time.monotonic, sleep=time.sleep):
+        self.policy = policy
+        self.clock = clock
+        self.sleep = sleep
+        # key -> (due time of the last poll, interval used for it)
+        self._due = {}
+
+    def next_due(self, key, state):
+        # Next poll time for key after a poll that returned state. Based on when the last poll
+        # was due (not when it finished) so request latency doesn't drift the period.
+        now = self.clock()
+        due, interval = self._due.get(key, (now, None))
+        interval = self.policy.next_interval(state, interval)
+        due = due + interval
+        if due < now:
+            # Overran (slow request or delay), poll now rather than trying to catch up
+            due = now
+        self._due[key] = (due, interval)
+        return due
+
+    def delay(self, key, seconds):
+        # Push the next poll for key back, e.g. to leave the vehicle alone for a while
+        due = self.clock() + seconds
+        _, interval = self._due.get(key, (due, None))
+        self._due[key] = (due, interval)
+        return due
+
+    def wait(self, due):
+        remaining = due - self.clock()
+        if remaining > 0:
+            self.sleep(remaining)
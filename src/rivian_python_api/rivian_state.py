@@ -0,0 +1,112 @@
+import json
+import sys
+from collections import namedtuple
+
+try:
+    from .rivian_queries import VEHICLE_STATE_FIELDS
+except ImportError:
+    from rivian_queries import VEHICLE_STATE_FIELDS
+
+# Compact vehicleState for long poll histories. The response bytes are kept as they are and only
+# decoded on first attribute access, then dropped. Each field becomes one slot holding its value
+# (e.g. state.batteryLevel), fields with several sub fields get a namedtuple
+# (e.g. state.gnssLocation.latitude). __typename/timeStamp are not kept and repeated strings
+# ('sleep', 'park', ...) are interned so a history shares one copy of each.
+
+
+def _sub_fields(field):
+    return tuple(f for f in VEHICLE_STATE_FIELDS[field] if f != 'timeStamp') or VEHICLE_STATE_FIELDS[field]
+
+
+# field -> namedtuple type for fields with more than one sub field
+COMPOUND_FIELDS = {
+    field: namedtuple(field[0].upper() + field[1:], _sub_fields(field))
+    for field in VEHICLE_STATE_FIELDS if len(_sub_fields(field)) > 1
+}
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def field_value(field, entry):
+    # Value of one vehicleState entry as VehicleState holds it
+    if not isinstance(entry, dict):
+        return _intern(entry)
+    compound = COMPOUND_FIELDS.get(field)
+    if compound:
+        return compound(*[_intern(entry.get(f)) for f in compound._fields])
+    return _intern(entry.get(_sub_fields(field)[0]))
+
+
+class VehicleState:
+    FIELDS = tuple(VEHICLE_STATE_FIELDS)
+    __slots__ = ('_raw', '_errors', '_ok') + FIELDS
+
+    def __init__(self, raw):
+        # raw: GetVehicleState response body (bytes or str)
+        self._raw = raw
+        self._errors = None
+        self._ok = False
+
+    @classmethod
+    def from_response(cls, response):
+        return cls(response.content)
+
+    def _decode(self):
+        raw = self._raw
+        self._raw = None
+        try:
+            response_json = json.loads(raw)
+        except ValueError as e:
+            self._errors = [str(e)]
+            return
+        self._errors = response_json.get('errors')
+        state = (response_json.get('data') or {}).get('vehicleState')
+        if not state:
+            self._errors = self._errors or ['No vehicle state returned']
+            return
+        self._ok = True
+        for field, entry in state.items():
+            if field in VEHICLE_STATE_FIELDS:
+                setattr(self, field, field_value(field, entry))
+
+    def __getattr__(self, name):
+        # Only called for slots that aren't set yet: decode once, fields the response didn't have are None
+        if name not in VEHICLE_STATE_FIELDS:
+            raise AttributeError(name)
+        if self._raw is not None:
+            self._decode()
+            return getattr(self, name)
+        return None
+
+    @property
+    def decoded(self):
+        return self._raw is None
+
+    @property
+    def errors(self):
+        if self._raw is not None:
+            self._decode()
+        return self._errors
+
+    @property
+    def ok(self):
+        # A vehicleState came back (there can still be errors for some of its fields)
+        if self._raw is not None:
+            self._decode()
+        return self._ok
+
+    def to_dict(self):
+        # Decoded fields only, compound fields as dicts
+        result = {}
+        for field in self.FIELDS:
+            value = getattr(self, field)
+            if value is not None:
+                result[field] = value._asdict() if field in COMPOUND_FIELDS else value
+        return result
+
+    def __repr__(self):
+        if not self.decoded:
+            return f"VehicleState(<{len(self._raw)} bytes>)"
+        return f"VehicleState({self.to_dict()})"
@@ -0,0 +1,250 @@
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+try:
+    from .rivian_diff import state_values
+    from .rivian_queries import VEHICLE_STATE_FIELDS
+    from .rivian_state import COMPOUND_FIELDS
+except ImportError:
+    from rivian_diff import state_values
+    from rivian_queries import VEHICLE_STATE_FIELDS
+    from rivian_state import COMPOUND_FIELDS
+
+# Time series of poll results and charging history in SQLite. One column per vehicleState field
+# (compound fields get one per part, e.g. gnssLocation_latitude) indexed by (vehicle_id, ts).
+# Writers only queue rows, a background thread writes them in batches (one transaction each), so
+# polling threads never wait on the disk. When the queue is full rows are dropped and counted, as are
+# batches SQLite fails to write (logged, the writer carries on).
+
+log = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_FLUSH_INTERVAL = 1.0
+DEFAULT_MAX_QUEUE = 100000
+
+# Writer wake up without a new row, flush what's pending
+_INTERVAL = object()
+# How often flush/close check that the writer thread is still there while they wait for it
+WRITER_CHECK_INTERVAL = 0.5
+
+# (column, field, index into a compound field's value or None)
+STATE_COLUMNS = []
+for _field in VEHICLE_STATE_FIELDS:
+    if _field in COMPOUND_FIELDS:
+        for _i, _part in enumerate(COMPOUND_FIELDS[_field]._fields):
+            STATE_COLUMNS.append((f"{_field}_{_part}", _field, _i))
+    else:
+        STATE_COLUMNS.append((_field, _field, None))
+
+STATE_TABLE = 'vehicle_state'
+CHARGING_TABLE = 'charging_history'
+
+
+def timestamp(value):
+    # Epoch seconds from epoch seconds, datetimes or ISO strings like the API's '2023-04-18T12:00:00.000Z'
+    if value is None:
+        return time.time()
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, datetime):
+        return value.timestamp()
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        # Variants fromisoformat doesn't take before Python 3.11 (e.g. 2 digit fractions)
+        from dateutil.parser import isoparse
+        return isoparse(value).timestamp()
+
+
+def state_row(vehicle_id, state, ts=None):
+    values = state_values(state)
+    row = [vehicle_id, timestamp(ts)]
+    for _, field, part in STATE_COLUMNS:
+        value = values.get(field)
+        row.append(value if part is None or value is None else value[part])
+    return row
+
+
+class TimeSeriesStore:
+    def __init__(self, path, batch_size=DEFAULT_BATCH_SIZE, flush_interval=DEFAULT_FLUSH_INTERVAL,
+                 max_queue=DEFAULT_MAX_QUEUE):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self.written = 0
+        self._dropped_lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._state_insert = f"INSERT INTO {STATE_TABLE} (vehicle_id, ts, " \
+                             f"{', '.join(c for c, _, _ in STATE_COLUMNS)}) " \
+                             f"VALUES ({', '.join('?' * (len(STATE_COLUMNS) + 2))})"
+        self._charging_insert = f"INSERT OR IGNORE INTO {CHARGING_TABLE} (vehicle_id, ts, kw) VALUES (?, ?, ?)"
+        connection = self._connect()
+        self._create_tables(connection)
+        connection.close()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=30)
+        # Readers (range queries) don't block the writer and vice versa
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        return connection
+
+    def _create_tables(self, connection):
+        with connection:
+            connection.execute(f"CREATE TABLE IF NOT EXISTS {STATE_TABLE} (vehicle_id TEXT NOT NULL, ts REAL NOT NULL)")
+            existing = {row[1] for row in connection.execute(f"PRAGMA table_info({STATE_TABLE})")}
+            # Fields added to the catalog later become new columns
+            for column, _, _ in STATE_COLUMNS:
+                if column not in existing:
+                    connection.execute(f"ALTER TABLE {STATE_TABLE} ADD COLUMN {column}")
+            connection.execute(f"CREATE INDEX IF NOT EXISTS {STATE_TABLE}_vehicle_ts ON {STATE_TABLE} (vehicle_id, ts)")
+            # History is fetched whole each time, the key keeps overlapping fetches from duplicating points
+            connection.execute(f"CREATE TABLE IF NOT EXISTS {CHARGING_TABLE} "
+                               f"(vehicle_id TEXT NOT NULL, ts REAL NOT NULL, kw REAL, PRIMARY KEY (vehicle_id, ts))")
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._send(None)
+            self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _drop(self, count):
+        with self._dropped_lock:
+            self.dropped += count
+
+    def _put(self, item):
+        # Rows are dropped rather than queued for a writer that's gone
+        if not self._thread.is_alive():
+            self._drop(1)
+            return False
+        try:
+            self._queue.put_nowait(item)
+            return True
+        except queue.Full:
+            self._drop(1)
+            return False
+
+    def _send(self, item):
+        # Queues a flush/close for the writer, waiting for room. False when the writer is gone.
+        while self._thread.is_alive():
+            try:
+                self._queue.put(item, timeout=WRITER_CHECK_INTERVAL)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def add_state(self, vehicle_id, state, ts=None):
+        # state: VehicleState or a decoded vehicleState dict, ts defaults to now
+        return self._put((self._state_insert, state_row(vehicle_id, state, ts)))
+
+    def add_result(self, result):
+        # FleetPoller PollResult, failed polls aren't stored
+        if result.state is not None:
+            return self.add_state(result.target.vehicle_id, result.state, result.timestamp)
+        return False
+
+    def add_charging_history(self, vehicle_id, chart_data):
+        # chartData points from get_live_session_history ({'time': ..., 'kw': ...})
+        for point in chart_data:
+            self._put((self._charging_insert, (vehicle_id, timestamp(point['time']), point['kw'])))
+
+    def flush(self, timeout=None):
+        # Waits until everything queued so far is written (or dropped), False on timeout or when the
+        # writer thread is gone
+        done = threading.Event()
+        if not self._send(done):
+            return False
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = WRITER_CHECK_INTERVAL if deadline is None else min(WRITER_CHECK_INTERVAL, deadline - time.monotonic())
+            if done.wait(max(0, wait)):
+                return True
+            if not self._thread.is_alive() or (deadline is not None and time.monotonic() >= deadline):
+                return done.is_set()
+
+    def _run(self):
+        connection = self._connect()
+        try:
+            self._serve(connection)
+        except Exception:
+            log.exception(f"Writer of {self.path} stopped, rows aren't stored anymore")
+        finally:
+            connection.close()
+
+    def _serve(self, connection):
+        pending = {}
+        count = 0
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                item = self._queue.get(timeout=max(0, deadline - time.monotonic()))
+            except queue.Empty:
+                item = _INTERVAL
+            if isinstance(item, tuple):
+                sql, row = item
+                pending.setdefault(sql, []).append(row)
+                count += 1
+                if count < self.batch_size and time.monotonic() < deadline:
+                    continue
+            count = self._write(connection, pending, count)
+            deadline = time.monotonic() + self.flush_interval
+            if isinstance(item, threading.Event):
+                item.set()
+            elif item is None:
+                break
+
+    def _write(self, connection, pending, count):
+        if pending:
+            try:
+                with connection:
+                    for sql, rows in pending.items():
+                        connection.executemany(sql, rows)
+                self.written += count
+            except sqlite3.Error as e:
+                # The whole batch is rolled back, later ones may well go through (disk full, locked, ...)
+                log.warning(f"Writing {count} rows to {self.path} failed, dropped them: {e}")
+                self._drop(count)
+            pending.clear()
+        return 0
+
+    def states(self, vehicle_id, start=None, end=None, columns=None):
+        # Rows for vehicle_id with start <= ts < end, as dicts ordered by time
+        known = [c for c, _, _ in STATE_COLUMNS]
+        for column in columns or []:
+            if column not in known:
+                raise ValueError(f"Unknown vehicle_state column: {column}")
+        columns = ['ts'] + list(columns or known)
+        return self._query(f"SELECT {', '.join(columns)} FROM {STATE_TABLE}", vehicle_id, start, end, columns)
+
+    def charging_history(self, vehicle_id, start=None, end=None):
+        return self._query(f"SELECT ts, kw FROM {CHARGING_TABLE}", vehicle_id, start, end, ['ts', 'kw'])
+
+    def _query(self, select, vehicle_id, start, end, columns):
+        sql = select + " WHERE vehicle_id = ?"
+        parameters = [vehicle_id]
+        if start is not None:
+            sql += " AND ts >= ?"
+            parameters.append(timestamp(start))
+        if end is not None:
+            sql += " AND ts < ?"
+            parameters.append(timestamp(end))
+        connection = self._connect()
+        try:
+            return [dict(zip(columns, row)) for row in connection.execute(sql + " ORDER BY ts", parameters)]
+        finally:
+            connection.close()
@@ -0,0 +1,443 @@
+#!/usr/bin/env python
+# encoding: utf-8
+import argparse
+import hashlib
+import inspect
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+# Canned responses by operationName for offline testing/benchmarks, anything else gets an empty data object
+DEFAULT_RESPONSES = {
+    "CreateCSRFToken": {
+        "data": {
+            "createCsrfToken": {
+                "__typename": "CreateCsrfTokenResponse",
+                "csrfToken": "stub-csrf-token",
+                "appSessionToken": "stub-app-session-token",
+            }
+        }
+    },
+    "GetVehicleState": {
+        "data": {
+            "vehicleState": {
+                "cloudConnection": {"lastSync": "2023-04-18T12:00:00.000Z"},
+                "powerState": {"value": "sleep"},
+                "driveMode": {"value": "everyday"},
+                "gearStatus": {"value": "park"},
+                "vehicleMileage": {"value": 1609000},
+                "batteryLevel": {"value": 80.5},
+                "distanceToEmpty": {"value": 400},
+                "gnssLocation": {"latitude": 42.0772, "longitude": -71.6303},
+                "gnssSpeed": {"value": 0},
+                "chargerStatus": {"value": "chrgr_sts_not_connected"},
+                "chargerState": {"value": "charging_ready"},
+                "batteryLimit": {"value": 85},
+                "timeToEndOfCharge": {"value": 0},
+            }
+        }
+    },
+}
+
+# What Rivian sends back once an account asked for too much too often
+RATE_LIMIT_RESPONSE = {
+    "errors": [
+        {"extensions": {"code": "RATE_LIMIT"}, "message": "See server logs for error details", "path": ["vehicleState"]}
+    ],
+    "data": {"vehicleState": None},
+}
+# Never recorded, their responses carry the account's tokens
+RECORD_EXCLUDED_OPERATIONS = ('Login', 'LoginWithOTP', 'RefreshToken', 'CreateCSRFToken')
+# Replaced in recorded responses (everything below them too): secrets, personal details, where the car is
+SCRUBBED_FIELDS = frozenset((
+    'accessToken', 'refreshToken', 'userSessionToken', 'csrfToken', 'appSessionToken', 'otpToken',
+    'vehiclePublicKey', 'publicKey', 'vasPhoneId', 'identityId', 'deviceName',
+    'email', 'orderEmail', 'phone', 'firstName', 'lastName', 'invitedByFirstName', 'creatorFirstName',
+    'addresses', 'billingAddress', 'shippingAddress', 'line1', 'line2', 'postalCode',
+    'card', 'bank', 'lastFour', 'last4', 'referenceNumber', 'serialNumber', 'vin',
+    'latitude', 'longitude',
+))
+SCRUBBED = 'scrubbed'
+
+
+def scrub(value, fields=SCRUBBED_FIELDS, scrubbing=False):
+    # Copy of a response with the values of fields replaced, keeping its shape so it still replays
+    if isinstance(value, dict):
+        return {key: item if key == '__typename' else scrub(item, fields, scrubbing or key in fields)
+                for key, item in value.items()}
+    if isinstance(value, list):
+        return [scrub(item, fields, scrubbing) for item in value]
+    if not scrubbing or value is None or isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        return SCRUBBED
+    if isinstance(value, (int, float)):
+        return 0
+    return value
+
+
+def load_responses(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+class Recorder:
+    # Captures real responses by operationName (the latest one of each) to replay them with StubServer.
+    # Only successful responses are kept, scrubbed of tokens and personal details, saved after each new
+    # one so an interrupted run keeps them.
+    def __init__(self, path, exclude=RECORD_EXCLUDED_OPERATIONS, scrubbed=SCRUBBED_FIELDS):
+        self.path = path
+        self.exclude = set(exclude)
+        self.scrubbed = frozenset(scrubbed)
+        self._lock = threading.Lock()
+        try:
+            self.responses = load_responses(path)
+        except FileNotFoundError:
+            self.responses = {}
+
+    def attach(self, rivian):
+        # Wraps rivian.raw_graphql_query so every response it gets is recorded, Rivian or AsyncRivian
+        raw_graphql_query = rivian.raw_graphql_query
+
+        if inspect.iscoroutinefunction(raw_graphql_query):
+            async def recording_query(url, query, headers):
+                response = await raw_graphql_query(url=url, query=query, headers=headers)
+                self.record(query.get('operationName'), response)
+                return response
+        else:
+            def recording_query(url, query, headers):
+                response = raw_graphql_query(url=url, query=query, headers=headers)
+                self.record(query.get('operationName'), response)
+                return response
+
+        rivian.raw_graphql_query = recording_query
+        return rivian
+
+    def record(self, operation_name, response):
+        if not operation_name or operation_name in self.exclude or response.status_code != 200:
+            return
+        try:
+            response_json = response.json()
+        except ValueError:
+            return
+        # Persisted query misses and other errors without data aren't worth replaying
+        if response_json.get('data') is None:
+            return
+        with self._lock:
+            self.responses[operation_name] = scrub(response_json, self.scrubbed)
+            self.save()
+
+    def save(self):
+        with open(self.path, 'w') as f:
+            json.dump(self.responses, f, indent=2, sort_keys=True)
+
+
+class StubTransport:
+    # In process stand-in for a requests session (Rivian(session=StubTransport())), answers from the same
+    # responses as StubServer without any sockets so benchmarks measure the client alone
+    def __init__(self, responses=None):
+        self.responses = dict(DEFAULT_RESPONSES, **(responses or {}))
+        self.requests = 0
+        self._lock = threading.Lock()
+        # operationName -> encoded body, built once
+        self._bodies = {}
+
+    def post(self, url, json=None, headers=None, timeout=None):
+        with self._lock:
+            self.requests += 1
+        operation_name = (json or {}).get('operationName')
+        body = self._bodies.get(operation_name)
+        if body is None:
+            body = self._bodies[operation_name] = encode(self.responses.get(operation_name, {"data": {}}))
+        response = requests.Response()
+        response.status_code = 200
+        response.reason = 'OK'
+        response.url = url
+        response.encoding = 'utf-8'
+        response.headers['Content-Type'] = 'application/json'
+        response._content = body
+        return response
+
+    def close(self):
+        pass
+
+
+def encode(payload):
+    return json.dumps(payload).encode()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 so clients can keep connections alive between requests
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately, without this keep-alive clients stall on delayed ACKs
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length)
+        try:
+            request = json.loads(body) if body else {}
+        except ValueError:
+            request = {}
+        with self.server.sessions_lock:
+            self.server.requests += 1
+            self.server.bytes_received += length
+        if self.server.latency:
+            time.sleep(self.server.delay())
+        fault = self.server.fault()
+        if fault == 'error':
+            self.send_error_json(500, "Injected error", "INTERNAL_SERVER_ERROR")
+            return
+        if fault == 'rate_limit':
+            self.send_json(200, RATE_LIMIT_RESPONSE)
+            return
+        persisted = (request.get('extensions') or {}).get('persistedQuery')
+        if persisted and not self.persisted_query(request, persisted):
+            return
+        if self.server.check_sessions:
+            response = self.checked_session(request)
+            if response is None:
+                return
+        else:
+            response = self.server.responses.get(request.get('operationName'), {"data": {}})
+        self.send_json(200, response)
+
+    def checked_session(self, request):
+        # Hands out distinct CSRF/app session pairs and rejects requests mixing tokens of different
+        # handshakes. Response to send, None when an error was sent instead.
+        operation_name = request.get('operationName')
+        response = self.server.responses.get(operation_name, {"data": {}})
+        csrf_token = self.headers.get('Csrf-Token')
+        with self.server.sessions_lock:
+            if operation_name == 'CreateCSRFToken':
+                issued = len(self.server.sessions) + 1
+                csrf_token, app_session_token = f"stub-csrf-token-{issued}", f"stub-app-session-token-{issued}"
+                self.server.sessions[csrf_token] = app_session_token
+                return {"data": {"createCsrfToken": dict(response["data"]["createCsrfToken"],
+                                                         csrfToken=csrf_token, appSessionToken=app_session_token)}}
+            if not csrf_token:
+                return response
+            if self.server.sessions.get(csrf_token) != self.headers.get('A-Sess'):
+                self.server.session_errors += 1
+                self.send_error_json(200, "Bad session", "BAD_CURRENT_USER_SESSION")
+                return None
+            user_session_token = self.headers.get('U-Sess')
+            if user_session_token:
+                self.server.session_users.setdefault(csrf_token, set()).add(user_session_token)
+        return response
+
+    def persisted_query(self, request, persisted):
+        # Automatic persisted queries (Apollo protocol), False when an error was sent instead
+        if not self.server.persisted_queries:
+            self.send_error_json(200, "PersistedQueryNotSupported", "PERSISTED_QUERY_NOT_SUPPORTED")
+            return False
+        sha256_hash = persisted.get('sha256Hash')
+        if 'query' in request:
+            if hashlib.sha256(request['query'].encode()).hexdigest() != sha256_hash:
+                self.send_error_json(400, "provided sha does not match query", "BAD_USER_INPUT")
+                return False
+            with self.server.sessions_lock:
+                self.server.persisted[sha256_hash] = request['query']
+            return True
+        with self.server.sessions_lock:
+            missed = sha256_hash not in self.server.persisted
+            if missed:
+                self.server.persisted_misses += 1
+        if missed:
+            self.send_error_json(200, "PersistedQueryNotFound", "PERSISTED_QUERY_NOT_FOUND")
+            return False
+        return True
+
+    def send_error_json(self, status, message, code):
+        self.send_json(status, {"errors": [{"message": message, "extensions": {"code": code}}]})
+
+    def send_json(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class AccountCheckHandler(StubHandler):
+    # Account i only asks for vehicle-i, a request for another account's vehicle carried its tokens
+    # (counted in wrong_account). Use with check_sessions=True and call_accounts.
+    def checked_session(self, request):
+        response = super().checked_session(request)
+        vehicle_id = (request.get('variables') or {}).get('vehicleID')
+        user_session_token = self.headers.get('U-Sess')
+        if response is not None and vehicle_id and user_session_token:
+            if vehicle_id.rsplit('-', 1)[-1] != user_session_token.rsplit('-', 1)[-1]:
+                with self.server.sessions_lock:
+                    self.server.wrong_account += 1
+        return response
+
+
+def call_accounts(pool, accounts, threads, calls, seed=0):
+    # `threads` threads each getting vehicle-i's state with account i of a ClientPool (accounts 0..accounts-1
+    # with user session tokens ending in -i) `calls` times. Exceptions raised by the calls.
+    failures = []
+
+    def worker(seed):
+        rng = random.Random(seed)
+        for _ in range(calls):
+            account = rng.randrange(accounts)
+            try:
+                pool[account].get_vehicle_state(f"vehicle-{account}")
+            except Exception as e:
+                failures.append(e)
+
+    workers = [threading.Thread(target=worker, args=(seed + i,)) for i in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return failures
+
+
+class StubHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients hanging up on a slow response (timeouts, cancels) aren't a problem of the stub
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    def delay(self):
+        return self.latency + (self.random.uniform(0, self.jitter) if self.jitter else 0)
+
+    def fault(self):
+        # None, 'error' or 'rate_limit' for the current request
+        with self.sessions_lock:
+            return self._fault()
+
+    def _fault(self):
+        if self.rate_limit_after is not None and self.requests > self.rate_limit_after:
+            self.rate_limited += 1
+            return 'rate_limit'
+        if self.error_rate and self.random.random() < self.error_rate:
+            self.errors += 1
+            return 'error'
+        if self.rate_limit_rate and self.random.random() < self.rate_limit_rate:
+            self.rate_limited += 1
+            return 'rate_limit'
+        return None
+
+
+STUB_SETTINGS = ('latency', 'jitter', 'error_rate', 'rate_limit_rate', 'rate_limit_after')
+STUB_ATTRIBUTES = STUB_SETTINGS + ('requests', 'bytes_received', 'persisted_misses', 'errors', 'rate_limited',
+                                   'session_errors', 'wrong_account')
+
+
+class StubServer:
+    def __init__(self, host='127.0.0.1', port=0, responses=None, handler=StubHandler, persisted_queries=True,
+                 latency=0, jitter=0, error_rate=0, rate_limit_rate=0, rate_limit_after=None, seed=None,
+                 check_sessions=False):
+        # latency (+ up to jitter) seconds before each response. error_rate/rate_limit_rate are the chance
+        # of answering with a 500 or RATE_LIMIT instead, after rate_limit_after requests every one is limited.
+        # All of them can be changed while the server runs. check_sessions issues a distinct CSRF/app session
+        # per handshake and counts requests mixing up tokens (see session_errors and shared_sessions).
+        self.httpd = StubHTTPServer((host, port), handler)
+        self.httpd.responses = dict(DEFAULT_RESPONSES, **(responses or {}))
+        self.httpd.requests = 0
+        self.httpd.bytes_received = 0
+        # sha256 -> document for automatic persisted queries
+        self.httpd.persisted_queries = persisted_queries
+        self.httpd.persisted = {}
+        self.httpd.persisted_misses = 0
+        self.httpd.latency = latency
+        self.httpd.jitter = jitter
+        self.httpd.error_rate = error_rate
+        self.httpd.rate_limit_rate = rate_limit_rate
+        self.httpd.rate_limit_after = rate_limit_after
+        self.httpd.random = random.Random(seed)
+        self.httpd.errors = 0
+        self.httpd.rate_limited = 0
+        self.httpd.check_sessions = check_sessions
+        # Guards the counters and sessions below, handlers run on a thread per connection
+        self.httpd.sessions_lock = threading.Lock()
+        # CSRF token -> app session token issued with it, and the user sessions seen using it
+        self.httpd.sessions = {}
+        self.httpd.session_users = {}
+        self.httpd.session_errors = 0
+        # Requests carrying another account's tokens, see AccountCheckHandler
+        self.httpd.wrong_account = 0
+        self._thread = None
+
+    def __getattr__(self, name):
+        # Settings and counters live on the HTTP server the handlers see
+        if name in STUB_ATTRIBUTES:
+            return getattr(self.httpd, name)
+        raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        if name in STUB_SETTINGS:
+            setattr(self.httpd, name, value)
+        else:
+            super().__setattr__(name, value)
+
+    @property
+    def shared_sessions(self):
+        # Handshakes used by more than one user session, one account's tokens sent with another's
+        with self.httpd.sessions_lock:
+            return sum(1 for users in self.httpd.session_users.values() if len(users) > 1)
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/api/gql"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local stub of the Rivian GraphQL endpoints')
+    parser.add_argument('--port', help='Port to listen on', required=False, default=8080, type=int)
+    parser.add_argument('--responses', help='Recorded responses to replay (see RIVIAN_RECORD)', required=False)
+    parser.add_argument('--latency', help='Seconds before each response', required=False, default=0, type=float)
+    parser.add_argument('--jitter', help='Up to this many more seconds of latency', required=False, default=0,
+                        type=float)
+    parser.add_argument('--error_rate', help='Share of requests answered with a 500', required=False, default=0,
+                        type=float)
+    parser.add_argument('--rate_limit_rate', help='Share of requests answered with RATE_LIMIT', required=False,
+                        default=0, type=float)
+    parser.add_argument('--rate_limit_after', help='Answer every request after this many with RATE_LIMIT',
+                        required=False, type=int)
+    args = parser.parse_args()
+    responses = load_responses(args.responses) if args.responses else None
+    stub = StubServer(port=args.port, responses=responses, latency=args.latency, jitter=args.jitter,
+                      error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate,
+                      rate_limit_after=args.rate_limit_after)
+    print(f"Serving on {stub.base_url}, use RIVIAN_BASE_URL={stub.base_url} with the CLI")
+    try:
+        stub.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stub.httpd.server_close()
+
+
+if __name__ == '__main__':
+    main()
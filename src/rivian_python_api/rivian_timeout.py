@@ -0,0 +1,180 @@
+import contextvars
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+# Request timeouts and per operation deadlines. Every request has connect/read timeouts (per
+# endpoint, see Rivian(timeouts=...)). A Deadline bounds everything done inside it, whichever client
+# method is called, including rate limiter waits and retries:
+#
+#     with Deadline(10) as deadline:
+#         rivian.get_vehicle_state(vehicle_id)
+#
+# deadline.cancel() (from any thread) stops it early: waits end right away, an AsyncRivian request in
+# flight is cancelled, a Rivian request in flight has its connection shut down (sessions made by
+# rivian_api.create_session, others run into their deadline capped read timeout).
+
+DEFAULT_CONNECT_TIMEOUT = 10
+DEFAULT_READ_TIMEOUT = 30
+DEFAULT_TIMEOUT = (DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT)
+
+_current = contextvars.ContextVar('rivian_deadline', default=None)
+# (deadline, connections) of the Deadline.cancelling() block around the current request
+_cancelling = contextvars.ContextVar('rivian_cancelling', default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+class Cancelled(DeadlineExceeded):
+    pass
+
+
+def current_deadline():
+    # Deadline of the enclosing `with Deadline(...)` in this thread or task, None if there's none
+    return _current.get()
+
+
+def track_connection(connection):
+    # Called by a connection (anything with a .sock) about to send a request. Inside a
+    # Deadline.cancelling() block, cancelling that deadline shuts the connection down. Returns the
+    # deadline, None when there's none.
+    entry = _cancelling.get()
+    if entry is None:
+        return None
+    deadline, connections = entry
+    with deadline._lock:
+        deadline._connections.add(connection)
+        connections.append(connection)
+    # Cancelled before the request went out, it isn't sent at all
+    deadline.check()
+    return deadline
+
+
+class Deadline:
+    def __init__(self, seconds=None, clock=time.monotonic):
+        # seconds None: no time limit, only cancellation
+        self.clock = clock
+        self.expires_at = None if seconds is None else clock() + seconds
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+        # (loop, task) of AsyncRivian requests in flight, connections of Rivian requests in flight
+        self._tasks = set()
+        self._connections = set()
+        self._token = None
+
+    def __enter__(self):
+        outer = _current.get()
+        if outer is not None and outer.expires_at is not None:
+            # A nested deadline can't outlive the enclosing one
+            self.expires_at = outer.expires_at if self.expires_at is None else min(self.expires_at, outer.expires_at)
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, *exc):
+        _current.reset(self._token)
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        self._cancelled.set()
+        with self._lock:
+            tasks = list(self._tasks)
+            connections = list(self._connections)
+        for loop, task in tasks:
+            loop.call_soon_threadsafe(task.cancel)
+        for connection in connections:
+            # Unless it went back to the pool and another request took it meanwhile
+            sock = getattr(connection, 'sock', None)
+            if sock is not None and getattr(connection, 'deadline', None) is self:
+                try:
+                    # The blocked read returns right away, the request fails with a connection error
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+
+    @contextmanager
+    def cancelling(self):
+        # Connections tracked (see track_connection) by requests inside are shut down by cancel()
+        connections = []
+        token = _cancelling.set((self, connections))
+        try:
+            yield
+        finally:
+            _cancelling.reset(token)
+            with self._lock:
+                self._connections.difference_update(connections)
+
+    def remaining(self):
+        if self.expires_at is None:
+            return None
+        return max(0, self.expires_at - self.clock())
+
+    def check(self):
+        if self.cancelled:
+            raise Cancelled("Operation cancelled")
+        if self.remaining() == 0:
+            raise DeadlineExceeded("Operation deadline exceeded")
+
+    def allows(self, seconds):
+        # Whether waiting this long still leaves time for a request
+        remaining = self.remaining()
+        return remaining is None or seconds < remaining
+
+    def limit(self, timeout):
+        # (connect, read) timeout capped at the time left
+        self.check()
+        remaining = self.remaining()
+        if remaining is None:
+            return timeout
+        return tuple(remaining if t is None else min(t, remaining) for t in timeout)
+
+    def wait(self, seconds):
+        # Sleeps, unless cancelled or the deadline would pass first
+        self.check()
+        if not self.allows(seconds):
+            raise DeadlineExceeded(f"Operation deadline exceeded, {seconds:.1f} second wait needed")
+        if self._cancelled.wait(seconds):
+            raise Cancelled("Operation cancelled")
+
+    async def wait_async(self, seconds):
+        import asyncio
+        self.check()
+        if not self.allows(seconds):
+            raise DeadlineExceeded(f"Operation deadline exceeded, {seconds:.1f} second wait needed")
+        await self.run_async(asyncio.sleep(seconds))
+
+    async def run_async(self, awaitable):
+        # Awaits within the deadline, cancel() from any thread cancels it. asyncio is imported here, the
+        # sync client shouldn't pay for it at startup.
+        import asyncio
+        try:
+            self.check()
+        except DeadlineExceeded:
+            if asyncio.iscoroutine(awaitable):
+                awaitable.close()
+            raise
+        entry = (asyncio.get_running_loop(), asyncio.current_task())
+        with self._lock:
+            self._tasks.add(entry)
+        try:
+            return await asyncio.wait_for(awaitable, self.remaining())
+        except asyncio.CancelledError:
+            if self.cancelled:
+                # Our cancel, not the caller's: the task goes on with Cancelled instead
+                if hasattr(entry[1], 'uncancel'):
+                    entry[1].uncancel()
+                raise Cancelled("Operation cancelled")
+            raise
+        except asyncio.TimeoutError:
+            # Could also be the request's own read timeout
+            if self.remaining() == 0:
+                raise DeadlineExceeded("Operation deadline exceeded")
+            raise
+        finally:
+            with self._lock:
+                self._tasks.discard(entry)
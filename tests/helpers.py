@@ -0,0 +1,15 @@
+class FakeClock:
+    # Stand-in for time.monotonic/time.sleep: time only moves when slept or advanced
+    def __init__(self, now=1000.0):
+        self.now = now
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+    def advance(self, seconds):
+        self.now += seconds
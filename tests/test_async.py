@@ -0,0 +1,88 @@
+import asyncio
+import base64
+import io
+import json
+import time
+
+from rivian_python_api.rivian_async import AsyncRivian
+from rivian_python_api.rivian_stub import StubHandler, StubServer
+
+
+def jwt(expires_at):
+    payload = base64.urlsafe_b64encode(json.dumps({"exp": expires_at}).encode()).decode().rstrip('=')
+    return f"header.{payload}.signature"
+
+
+REFRESHED = {"data": {"refreshToken": {"accessToken": jwt(time.time() + 3600), "refreshToken": "refresh-2",
+                                       "userSessionToken": "session-2"}}}
+
+
+class ExpiredSessionHandler(StubHandler):
+    # Keeps the operationName of every request, turns away user session "session-1" with a 401
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.server.operations.append(json.loads(body).get('operationName'))
+        if self.headers.get('U-Sess') == 'session-1':
+            self.send_error_json(401, "Unauthenticated", "UNAUTHENTICATED")
+            return
+        # The handler reads the next request of the connection from rfile again
+        rfile, self.rfile = self.rfile, io.BytesIO(body)
+        try:
+            super().do_POST()
+        finally:
+            self.rfile = rfile
+
+
+def stub():
+    server = StubServer(handler=ExpiredSessionHandler, responses={'RefreshToken': REFRESHED})
+    server.httpd.operations = []
+    return server
+
+
+def client(base_url, user_session_token="session-2"):
+    # Built outside the event loop, sessions and locks come with the first request
+    rivian = AsyncRivian(base_url=base_url)
+    rivian.set_tokens(jwt(time.time() + 3600), "refresh-1", user_session_token)
+    return rivian
+
+
+def test_handshake_and_vehicle_state():
+    async def run(rivian):
+        async with rivian:
+            state = await rivian.get_vehicle_state('vehicle')
+            sessions = len(rivian._sessions)
+        return state, sessions
+
+    with stub() as server:
+        state, sessions = asyncio.run(run(client(server.base_url)))
+        assert state['data']['vehicleState']['powerState']['value'] == 'sleep'
+        assert server.httpd.operations == ['CreateCSRFToken', 'GetVehicleState']
+        # One keep-alive pool for the one endpoint used
+        assert sessions == 1
+
+
+def test_concurrent_requests_share_one_handshake():
+    async def run(rivian):
+        async with rivian:
+            return await asyncio.gather(*[rivian.vehicle_state('vehicle') for _ in range(5)])
+
+    with stub() as server:
+        states = asyncio.run(run(client(server.base_url)))
+        assert all(state.ok for state in states)
+        assert server.httpd.operations.count('CreateCSRFToken') == 1
+        assert server.httpd.operations.count('GetVehicleState') == 5
+
+
+def test_rejected_session_is_refreshed_and_retried():
+    async def run(rivian):
+        async with rivian:
+            return await rivian.get_vehicle_state('vehicle')
+
+    with stub() as server:
+        rivian = client(server.base_url, user_session_token="session-1")
+        state = asyncio.run(run(rivian))
+        assert state['data']['vehicleState']['powerState']['value'] == 'sleep'
+        # A fresh handshake first, the session is still turned away, so the access token is refreshed
+        assert server.httpd.operations == ['CreateCSRFToken', 'GetVehicleState', 'CreateCSRFToken',
+                                           'GetVehicleState', 'RefreshToken', 'GetVehicleState']
+        assert rivian._refresh_token == 'refresh-2'
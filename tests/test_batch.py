@@ -0,0 +1,85 @@
+from rivian_python_api import rivian_queries as queries
+from rivian_python_api.rivian_batch import BATCH_OPERATION_NAME, merge_results, plan_batches
+from rivian_python_api.rivian_queries import Operation
+
+
+def operation(document, variables=None, endpoint=queries.GATEWAY, headers=queries.GATEWAY_HEADERS):
+    return Operation(endpoint, headers, {"operationName": "Op", "query": document, "variables": variables or {}})
+
+
+VEHICLE = operation("query GetVehicle($id: String!) { getVehicle(id: $id) { name } }", {"id": "v1"})
+OTHER_VEHICLE = operation("query GetVehicle($id: String!) { getVehicle(id: $id) { name } }", {"id": "v2"})
+USER = operation("query User { currentUser { firstName } }")
+
+
+def test_compatible_queries_share_one_request():
+    batches = plan_batches([VEHICLE, OTHER_VEHICLE, USER])
+    assert len(batches) == 1
+    query = batches[0].operation().query
+    assert query["operationName"] == BATCH_OPERATION_NAME
+    # Same variable and field names, renamed apart
+    assert query["variables"] == {"op0_id": "v1", "op1_id": "v2"}
+    assert "op0_getVehicle: getVehicle(id: $op0_id)" in query["query"]
+    assert "op1_getVehicle: getVehicle(id: $op1_id)" in query["query"]
+    assert "op2_currentUser: currentUser" in query["query"]
+
+
+def test_results_come_back_per_operation_in_order():
+    batches = plan_batches([VEHICLE, OTHER_VEHICLE, USER])
+    response = {"data": {"op0_getVehicle": {"name": "R1T"}, "op1_getVehicle": {"name": "R1S"},
+                         "op2_currentUser": {"firstName": "Ada"}}}
+    assert merge_results(batches, [response], 3) == [
+        {"data": {"getVehicle": {"name": "R1T"}}},
+        {"data": {"getVehicle": {"name": "R1S"}}},
+        {"data": {"currentUser": {"firstName": "Ada"}}},
+    ]
+
+
+def test_incompatible_operations_are_sent_apart():
+    charging = operation("query Live($id: ID) { getLiveSessionData(vehicleId: $id) { isCharging } }",
+                         {"id": "v1"}, endpoint=queries.CHARGING)
+    transaction = operation("query User { currentUser { id } }", headers=queries.TRANSACTION_HEADERS)
+    mutation = operation("mutation Cmd { sendVehicleCommand { id } }")
+    spread = operation("query Spread { ...Fields } fragment Fields on Query { currentUser { id } }")
+    operations = [VEHICLE, charging, transaction, mutation, spread, USER]
+    batches = plan_batches(operations)
+    assert [b.indexes for b in batches] == [[0, 5], [1], [2], [3], [4]]
+    # Operations on their own are sent unchanged
+    assert batches[3].operation() is mutation
+    assert batches[4].operation() is spread
+
+
+def test_conflicting_fragments_start_a_new_batch():
+    first = operation("query A { currentUser { ...F } } fragment F on User { id }")
+    second = operation("query B { currentUser { ...F } } fragment F on User { email }")
+    same = operation("query C { currentUser { ...F } } fragment F on User { id }")
+    assert [b.indexes for b in plan_batches([first, second])] == [[0], [1]]
+    batches = plan_batches([first, same])
+    assert [b.indexes for b in batches] == [[0, 1]]
+    # The shared fragment is sent once
+    assert batches[0].operation().query["query"].count("fragment F") == 1
+
+
+def test_errors_go_to_the_operation_they_belong_to():
+    batches = plan_batches([VEHICLE, USER])
+    response = {
+        "data": {"op0_getVehicle": None, "op1_currentUser": {"firstName": "Ada"}},
+        "errors": [
+            {"message": "Not found", "path": ["op0_getVehicle", "name"]},
+            {"message": "Rate limited", "extensions": {"code": "RATE_LIMIT"}},
+        ],
+    }
+    vehicle, user = merge_results(batches, [response], 2)
+    assert vehicle["data"] == {"getVehicle": None}
+    assert [e["message"] for e in vehicle["errors"]] == ["Not found", "Rate limited"]
+    assert vehicle["errors"][0]["path"] == ["getVehicle", "name"]
+    # Errors not tied to a field apply to every operation of the batch
+    assert [e["message"] for e in user["errors"]] == ["Rate limited"]
+
+
+def test_failed_batch_fails_every_operation():
+    batches = plan_batches([VEHICLE, USER])
+    response = {"data": None, "errors": [{"message": "Unauthenticated"}]}
+    for result in merge_results(batches, [response], 2):
+        assert result["data"] is None
+        assert result["errors"] == [{"message": "Unauthenticated"}]
@@ -0,0 +1,135 @@
+import json
+import multiprocessing
+import os
+
+import requests
+
+from rivian_python_api import rivian_queries as queries
+from rivian_python_api.rivian_api import Rivian
+from rivian_python_api.rivian_cache import CachedResponse, ResponseCache
+from rivian_python_api.rivian_stub import StubTransport
+
+ORDERS = {"data": {"orders": {"data": []}}}
+
+
+class Clock:
+    now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def client(cache, **options):
+    transport = StubTransport({"vehicleOrders": ORDERS})
+    rivian = Rivian(session=transport, cache=cache, **options)
+    rivian._csrf_token = rivian._app_session_token = 'token'
+    rivian._csrf_expires_at = float('inf')
+    return rivian, transport
+
+
+def refresh(rivian, user_session_token):
+    response = requests.Response()
+    response.status_code = 200
+    response._content = json.dumps({"data": {"refreshToken": {
+        "accessToken": "access", "refreshToken": "refresh", "userSessionToken": user_session_token}}}).encode()
+    rivian.apply_refresh(response)
+
+
+def test_entries_expire_after_their_ttl():
+    clock = Clock()
+    rivian, transport = client(ResponseCache(clock=clock, ttls={'vehicleOrders': 60}))
+    rivian.set_tokens("access", "refresh", "session")
+    assert rivian.vehicle_orders() == ORDERS
+    assert rivian.vehicle_orders() == ORDERS
+    assert transport.requests == 1
+    clock.now += 61
+    rivian.vehicle_orders()
+    assert transport.requests == 2
+
+
+def test_token_refresh_keeps_the_cache_warm():
+    rivian, transport = client(ResponseCache())
+    rivian.set_tokens("access", "refresh", "session-1")
+    rivian.vehicle_orders()
+    refresh(rivian, "session-2")
+    rivian.vehicle_orders()
+    assert transport.requests == 1
+
+
+def test_accounts_are_kept_apart():
+    cache = ResponseCache()
+    first, first_transport = client(cache, account='first')
+    second, second_transport = client(cache, account='second')
+    first.set_tokens("access", "refresh", "session-1")
+    second.set_tokens("access", "refresh", "session-2")
+    first.vehicle_orders()
+    second.vehicle_orders()
+    assert (first_transport.requests, second_transport.requests) == (1, 1)
+    # Same account, other tokens (e.g. a later run after a refresh)
+    again, again_transport = client(cache, account='first')
+    again.set_tokens("access", "refresh", "session-3")
+    again.vehicle_orders()
+    assert again_transport.requests == 0
+
+
+def test_file_is_private_and_read_by_later_runs(tmp_path):
+    path = str(tmp_path / "cache.json")
+    rivian, _ = client(ResponseCache(path), account='me')
+    rivian.vehicle_orders()
+    assert os.stat(path).st_mode & 0o777 == 0o600
+    rivian, transport = client(ResponseCache(path), account='me')
+    assert rivian.vehicle_orders() == ORDERS
+    assert transport.requests == 0
+
+
+def test_failed_responses_are_not_cached():
+    cache = ResponseCache()
+    rivian, transport = client(cache, account='me')
+    transport.responses['vehicleOrders'] = {"errors": [{"message": "failed"}], "data": None}
+    rivian.vehicle_orders()
+    rivian.vehicle_orders()
+    assert transport.requests == 2
+    assert not cache.cacheable(queries.get_vehicle_state('vehicle').query['operationName'])
+
+
+def query(name, index=0):
+    return {'operationName': name, 'variables': {'index': index}}
+
+
+def write(path, writer):
+    cache = ResponseCache(path)
+    for i in range(20):
+        cache.put(f"writer-{writer}", query('user', i), CachedResponse(b'{"data": {}}'))
+
+
+def test_processes_sharing_the_file_keep_each_others_entries(tmp_path):
+    path = str(tmp_path / "cache.json")
+    context = multiprocessing.get_context('spawn')
+    processes = [context.Process(target=write, args=(path, writer)) for writer in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+    cache = ResponseCache(path)
+    assert all(cache.get(f"writer-{writer}", query('user', i)) for writer in range(4) for i in range(20))
+
+
+def test_invalidate_and_expiry_reach_the_file(tmp_path):
+    path = str(tmp_path / "cache.json")
+    clock = Clock()
+    first = ResponseCache(path, clock=clock, ttls={'user': 60, 'paymentMethods': 600})
+    second = ResponseCache(path, clock=clock, ttls={'user': 60, 'paymentMethods': 600})
+    first.put('me', query('user'), CachedResponse(b'{"data": {}}'))
+    second.put('me', query('paymentMethods'), CachedResponse(b'{"data": {}}'))
+    # first never saw the other's entry, it's dropped from the file all the same
+    first.invalidate(account='me')
+    second.put('you', query('paymentMethods'), CachedResponse(b'{"data": {}}'))
+    with open(path) as f:
+        assert [key.split(':')[:2] for key in json.load(f)] == [['you', 'paymentMethods']]
+    first.put('me', query('user'), CachedResponse(b'{"data": {}}'))
+    clock.now += 61
+    second.put('me', query('paymentMethods', 1), CachedResponse(b'{"data": {}}'))
+    with open(path) as f:
+        assert sorted(key.split(':')[0] for key in json.load(f)) == ['me', 'you']
+    assert first.get('me', query('user')) is None
@@ -0,0 +1,82 @@
+from rivian_python_api.rivian_charging import ChargePoint, ChargingHistory, follow_charging_history
+
+
+def chart(*points):
+    return [{"time": time, "kw": kw} for time, kw in points]
+
+
+def data_point(p):
+    return ChargePoint(p['time'], p['kw'])
+
+
+def test_new_points_in_time_order():
+    history = ChargingHistory()
+    new = history.update(chart(("2023-04-18T12:00:02.000Z", 3), ("2023-04-18T12:00:00.000Z", 1),
+                               ("2023-04-18T12:00:01.000Z", 2)))
+    assert [p.kw for p in new] == [1, 2, 3]
+    # The whole history again with one more point
+    new = history.update(chart(("2023-04-18T12:00:01.000Z", 2), ("2023-04-18T12:00:03.000Z", 4),
+                               ("2023-04-18T12:00:00.000Z", 1), ("2023-04-18T12:00:02.000Z", 3)))
+    assert new == [ChargePoint("2023-04-18T12:00:03.000Z", 4)]
+    assert history.update(chart(("2023-04-18T12:00:03.000Z", 4))) == []
+
+
+def test_times_compare_as_times_not_strings():
+    # As strings '...:05Z' > '...:05.500Z' and '...T13:00:00+01:00' > '...T12:00:01Z'
+    history = ChargingHistory()
+    new = history.update(chart(("2023-04-18T12:00:05Z", 1), ("2023-04-18T12:00:05.500Z", 2),
+                               ("2023-04-18T13:00:00+01:00", 0)))
+    assert [p.kw for p in new] == [0, 1, 2]
+    assert history.update(chart(("2023-04-18T12:00:05.000Z", 1), ("2023-04-18T12:00:06Z", 3))) == \
+        [ChargePoint("2023-04-18T12:00:06Z", 3)]
+
+
+def test_watermark_from_an_earlier_run():
+    data = chart(("2023-04-18T12:00:00.000Z", 1), ("2023-04-18T12:00:01.000Z", 2))
+    assert ChargingHistory(watermark="2023-04-18T12:00:00Z").update(data) == [data_point(data[1])]
+    # Epoch seconds
+    assert ChargingHistory(watermark=1681819200).update(data) == [data_point(data[1])]
+
+
+class Response:
+    def __init__(self, data):
+        self.data = data
+
+    def json(self):
+        return {"data": {"getLiveSessionHistory": {"chartData": self.data}}}
+
+
+class FakeRivian:
+    def __init__(self, responses):
+        self.responses = iter(responses)
+        self.pauses = 0
+
+    def execute(self, operation):
+        return Response(next(self.responses))
+
+    def pause(self, seconds, sleep):
+        self.pauses += 1
+
+
+def test_follow_ends_after_idle_polls():
+    first = chart(("2023-04-18T12:00:00.000Z", 1))
+    second = first + chart(("2023-04-18T12:00:30.000Z", 2))
+    rivian = FakeRivian([first, second, second, second])
+    points = list(follow_charging_history(rivian, "vehicle", interval=30, max_idle=2))
+    assert [p.kw for p in points] == [1, 2]
+    assert rivian.pauses == 3
+
+
+def test_keeps_the_latest_points():
+    history = ChargingHistory(maxlen=2)
+    history.update(chart(("2023-04-18T12:00:00.000Z", 1), ("2023-04-18T12:00:01.000Z", 2)))
+    history.update(chart(("2023-04-18T12:00:02.000Z", 3)))
+    assert [p.kw for p in history.points] == [2, 3]
+
+
+def test_any_iso_precision():
+    # fromisoformat only takes 3 or 6 digits before Python 3.11
+    history = ChargingHistory(watermark="2023-04-18T12:00:05.25Z")
+    assert history.update(chart(("2023-04-18T12:00:05.2Z", 1), ("2023-04-18T12:00:05.3Z", 2),
+                                ("2023-04-18T12:00:05.250001Z", 3))) == \
+        [ChargePoint("2023-04-18T12:00:05.250001Z", 3), ChargePoint("2023-04-18T12:00:05.3Z", 2)]
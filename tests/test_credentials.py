@@ -0,0 +1,122 @@
+import json
+import multiprocessing
+import os
+
+import requests
+
+from rivian_python_api.rivian_api import Rivian
+from rivian_python_api.rivian_credentials import (Credentials, FileCredentialStore, MemoryCredentialStore, attach,
+                                                  credentials_of, merge)
+
+WRITERS = 4
+SAVES = 25
+
+
+def test_merge_keeps_tokens_refreshed_elsewhere():
+    expected = Credentials('access-1', 'refresh-1', 'session-1', 'csrf-1', 'app-1', 1)
+    stored = Credentials('access-2', 'refresh-2', 'session-2', 'csrf-1', 'app-1', 1)
+    # Only the handshake changed here, the refreshed tokens stay
+    handshake = expected._replace(csrf_token='csrf-2', app_session_token='app-2', csrf_expires_at=2)
+    assert merge(stored, handshake, expected) == Credentials('access-2', 'refresh-2', 'session-2', 'csrf-2', 'app-2', 2)
+    # Tokens changed here too (a login or refresh), they win
+    login = Credentials('access-3', 'refresh-3', 'session-3', 'csrf-2', 'app-2', 2)
+    assert merge(stored, login, expected) == login
+    assert merge(None, login, expected) == login
+
+
+def write(path, writer):
+    store = FileCredentialStore(path)
+    for i in range(SAVES):
+        # Each writer's own account
+        store.save(f"writer-{writer}", Credentials(f"access-{writer}-{i}", f"refresh-{writer}-{i}", f"session-{writer}"))
+        # Writer 0 keeps refreshing the shared account's tokens, the others save new handshakes for it
+        shared = store.load('shared')
+        if writer == 0:
+            store.save('shared', shared._replace(access_token=f"access-{i}"), expected=shared)
+        else:
+            store.save('shared', shared._replace(csrf_token=f"csrf-{writer}-{i}"), expected=shared)
+
+
+def test_concurrent_writers_lose_nothing(tmp_path):
+    path = str(tmp_path / 'auth.json')
+    FileCredentialStore(path).save('shared', Credentials('access', 'refresh', 'session'))
+    context = multiprocessing.get_context('spawn')
+    processes = [context.Process(target=write, args=(path, writer)) for writer in range(WRITERS)]
+    for process in processes:
+        process.start()
+    # Readers never see a partly written file
+    reader = FileCredentialStore(path)
+    while any(process.is_alive() for process in processes):
+        assert reader.load('shared').refresh_token == 'refresh'
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+    store = FileCredentialStore(path)
+    assert store.accounts() == sorted(['shared'] + [f"writer-{writer}" for writer in range(WRITERS)])
+    for writer in range(WRITERS):
+        assert store.load(f"writer-{writer}").access_token == f"access-{writer}-{SAVES - 1}"
+    # No handshake save undid a refresh
+    assert tokens_of(store.load('shared')) == (f"access-{SAVES - 1}", 'refresh', 'session')
+    assert os.stat(path).st_mode & 0o777 == 0o600
+    with open(path) as f:
+        assert json.load(f)['version'] == 1
+
+
+def tokens_of(credentials):
+    return credentials[:3]
+
+
+class RefreshSession:
+    def __init__(self):
+        self.operations = []
+
+    def post(self, url, json=None, headers=None, timeout=None):
+        self.operations.append(json['operationName'])
+        response = requests.Response()
+        response.status_code = 200
+        response._content = b'{"data": {"refreshToken": {"accessToken": "access-3", "refreshToken": "refresh-3", ' \
+                            b'"userSessionToken": "session-3"}}}'
+        return response
+
+
+def attached(store):
+    session = RefreshSession()
+    rivian = Rivian(session=session)
+    attach(rivian, store)
+    rivian._csrf_token = rivian._app_session_token = 'token'
+    rivian._csrf_expires_at = float('inf')
+    return rivian, session
+
+
+def test_attach_uses_tokens_another_process_refreshed():
+    store = MemoryCredentialStore({'default': Credentials('access-1', 'refresh-1', 'session-1')})
+    rivian, session = attached(store)
+    store.save('default', Credentials('access-2', 'refresh-2', 'session-2'))
+    rivian.refresh_access_token()
+    assert session.operations == []
+    assert tokens_of(credentials_of(rivian)) == ('access-2', 'refresh-2', 'session-2')
+
+
+def test_attach_saves_refreshed_tokens():
+    store = MemoryCredentialStore({'default': Credentials('access-1', 'refresh-1', 'session-1')})
+    rivian, session = attached(store)
+    rivian.refresh_access_token()
+    assert session.operations == ['RefreshToken']
+    assert tokens_of(store.load('default')) == ('access-3', 'refresh-3', 'session-3')
+
+
+def test_attach_keeps_a_refresh_made_meanwhile_over_a_handshake():
+    store = MemoryCredentialStore({'default': Credentials('access-1', 'refresh-1', 'session-1')})
+    rivian, _ = attached(store)
+    store.save('default', Credentials('access-2', 'refresh-2', 'session-2'))
+    # A new handshake here is saved without undoing the other process's refresh
+    rivian._csrf_token = 'csrf-2'
+    rivian.token_callback(rivian)
+    assert store.load('default') == Credentials('access-2', 'refresh-2', 'session-2', 'csrf-2', 'token', float('inf'))
+    assert tokens_of(credentials_of(rivian)) == ('access-2', 'refresh-2', 'session-2')
+
+
+def test_missing_account_is_not_attached():
+    rivian = Rivian()
+    assert attach(rivian, MemoryCredentialStore(), 'nobody') is None
+    assert rivian.refresh_callback is None
@@ -0,0 +1,37 @@
+import time
+
+from rivian_python_api.rivian_api import Rivian
+from rivian_python_api.rivian_credentials import Credentials, apply_credentials, credentials_of
+from rivian_python_api.rivian_stub import StubServer
+
+# A handshake saved by an earlier run, the server doesn't know it (any more)
+SAVED = Credentials("access", "refresh", "user-session", "saved-csrf-token", "saved-app-session-token",
+                    time.time() + 3600)
+
+
+def handshakes(server):
+    with server.httpd.sessions_lock:
+        return len(server.httpd.sessions)
+
+
+def test_rejected_handshake_is_replaced_once():
+    with StubServer(check_sessions=True) as server:
+        with Rivian(base_url=server.base_url) as rivian:
+            apply_credentials(rivian, SAVED)
+            state = rivian.get_vehicle_state('vehicle')
+            assert state['data']['vehicleState']['powerState']['value'] == 'sleep'
+            assert server.session_errors == 1
+            assert handshakes(server) == 1
+            assert credentials_of(rivian).csrf_token == "stub-csrf-token-1"
+            # The new one is kept for the following requests
+            rivian.get_vehicle_state('vehicle')
+            rivian.get_vehicle_state('vehicle')
+            assert server.requests == 5
+            assert handshakes(server) == 1
+            saved = credentials_of(rivian)
+        # And by the next run
+        with Rivian(base_url=server.base_url) as rivian:
+            apply_credentials(rivian, saved)
+            rivian.get_vehicle_state('vehicle')
+        assert server.session_errors == 1
+        assert handshakes(server) == 1
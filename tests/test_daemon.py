@@ -0,0 +1,91 @@
+import os
+import socket
+import subprocess
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from rivian_python_api.rivian_credentials import Credentials, FileCredentialStore
+from rivian_python_api.rivian_daemon import CLIDaemon, forward, request
+from rivian_python_api.rivian_stub import StubServer
+
+pytestmark = pytest.mark.skipif(not hasattr(socket, 'AF_UNIX'), reason="Unix domain sockets only")
+
+CLI_PATH = os.path.join(os.path.dirname(__file__), '..', 'src', 'rivian_python_api', 'rivian_cli.py')
+
+
+def echo(argv):
+    return 0, ' '.join(argv), ''
+
+
+def test_answers_commands_from_the_same_directory_and_settings(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('RIVIAN_ACCOUNT', 'work')
+    with CLIDaemon(echo, path=str(tmp_path / 'd.sock')) as daemon:
+        assert request(['--query'], daemon.path) == {'status': 0, 'stdout': '--query', 'stderr': ''}
+        # Where the socket is isn't a setting commands see
+        monkeypatch.setenv('RIVIAN_DAEMON_SOCKET', daemon.path)
+        assert forward(['--query']) == 0
+
+
+def test_refuses_other_settings(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('RIVIAN_ACCOUNT', 'work')
+    with CLIDaemon(echo, path=str(tmp_path / 'd.sock')) as daemon:
+        monkeypatch.setenv('RIVIAN_DAEMON_SOCKET', daemon.path)
+        monkeypatch.setenv('RIVIAN_ACCOUNT', 'home')
+        assert 'refused' in request(['--query'], daemon.path)
+        # Run here instead
+        assert forward(['--query']) is None
+        monkeypatch.delenv('RIVIAN_ACCOUNT')
+        assert forward(['--query']) is None
+        monkeypatch.setenv('RIVIAN_ACCOUNT', 'work')
+        monkeypatch.setenv('RIVIAN_AUTHORIZATION', 'a;r;u')
+        assert forward(['--query']) is None
+
+
+def test_refuses_other_directories(tmp_path, monkeypatch):
+    # Relative --store and RIVIAN_RECORD paths, the credential and cache files would be the daemon's
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'elsewhere').mkdir()
+    with CLIDaemon(echo, path=str(tmp_path / 'd.sock')) as daemon:
+        monkeypatch.setenv('RIVIAN_DAEMON_SOCKET', daemon.path)
+        monkeypatch.chdir(tmp_path / 'elsewhere')
+        assert forward(['--query']) is None
+
+
+def test_commands_run_at_the_same_time(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    both_running = threading.Barrier(2, timeout=5)
+
+    def run(argv):
+        both_running.wait()
+        return 0, argv[0], ''
+
+    with CLIDaemon(run, path=str(tmp_path / 'd.sock')) as daemon, ThreadPoolExecutor(2) as executor:
+        answers = list(executor.map(lambda name: request([name], daemon.path), ['a', 'b']))
+    assert [answer['stdout'] for answer in answers] == ['a', 'b']
+
+
+def test_each_command_gets_its_own_output(tmp_path, monkeypatch):
+    with StubServer(latency=0.2) as stub:
+        monkeypatch.chdir(tmp_path)
+        monkeypatch.setenv('RIVIAN_BASE_URL', stub.base_url)
+        monkeypatch.delenv('RIVIAN_DAEMON_SOCKET', raising=False)
+        FileCredentialStore('rivian_auth.json').save('default', Credentials("access", "refresh", "session"))
+        daemon = subprocess.Popen([sys.executable, CLI_PATH, '--daemon'], stdout=subprocess.PIPE, text=True)
+        try:
+            # Up once it says so
+            daemon.stdout.readline()
+            commands = [['--query', '--vehicle_id', 'vehicle'], ['--no_such_option']]
+            with ThreadPoolExecutor(2) as executor:
+                query, bad = executor.map(request, commands)
+        finally:
+            daemon.terminate()
+            daemon.wait()
+    assert query['status'] == 0
+    assert query['stdout'].startswith('timestamp,Power') and query['stderr'] == ''
+    assert bad['status'] == 2
+    assert bad['stdout'] == '' and 'unrecognized arguments' in bad['stderr']
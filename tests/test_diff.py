@@ -0,0 +1,78 @@
+import json
+
+from rivian_python_api.rivian_diff import Change, StateDiff, changed
+from rivian_python_api.rivian_state import VehicleState
+
+
+def state(battery=80.0, latitude=42.0, longitude=-71.0, gear='park', sync='2023-01-01T00:00:00.000Z'):
+    return {
+        'cloudConnection': {'lastSync': sync},
+        'batteryLevel': {'value': battery},
+        'gnssLocation': {'latitude': latitude, 'longitude': longitude},
+        'gearStatus': {'value': gear},
+    }
+
+
+def fields(changes):
+    return sorted(change.field for change in changes)
+
+
+def test_first_update_reports_every_field_but_ignored_ones():
+    diff = StateDiff()
+    assert fields(diff.update(state())) == ['batteryLevel', 'gearStatus', 'gnssLocation']
+    assert diff.update(state(sync='2023-01-01T00:01:00.000Z')) == []
+
+
+def test_changes_within_tolerance_are_not_reported():
+    diff = StateDiff()
+    diff.update(state())
+    assert diff.update(state(battery=80.4, latitude=42.00005)) == []
+    assert diff.update(state(battery=80.6)) == [Change('batteryLevel', 80.0, 80.6)]
+
+
+def test_slow_drift_is_reported_against_the_last_reported_value():
+    diff = StateDiff()
+    diff.update(state())
+    # Each step is within tolerance, together they aren't
+    assert diff.update(state(battery=80.3)) == []
+    assert diff.update(state(battery=80.6)) == [Change('batteryLevel', 80.0, 80.6)]
+    assert diff.update(state(battery=80.9)) == []
+
+
+def test_compound_fields_apply_the_tolerance_to_each_number():
+    diff = StateDiff()
+    diff.update(state())
+    changes = diff.update(state(longitude=-71.001))
+    assert fields(changes) == ['gnssLocation']
+    assert changes[0].new == (42.0, -71.001)
+
+
+def test_custom_tolerances_and_ignored_fields():
+    diff = StateDiff(tolerances={'batteryLevel': 5}, ignore=('gearStatus',))
+    assert fields(diff.update(state())) == ['batteryLevel', 'cloudConnection', 'gnssLocation']
+    assert fields(diff.update(state(battery=84, gear='drive'))) == []
+    assert fields(diff.update(state(battery=86))) == ['batteryLevel']
+
+
+def test_reset_reports_every_field_again():
+    diff = StateDiff()
+    diff.update(state())
+    diff.reset()
+    assert fields(diff.update(state())) == ['batteryLevel', 'gearStatus', 'gnssLocation']
+
+
+def test_vehicle_state_objects_diff_like_dicts():
+    diff = StateDiff()
+    diff.update(VehicleState(json.dumps({'data': {'vehicleState': state()}})))
+    assert diff.update(VehicleState(json.dumps({'data': {'vehicleState': state(gear='drive')}}))) == \
+        [Change('gearStatus', 'park', 'drive')]
+
+
+def test_changed():
+    assert not changed(1.0, 1.4, 0.5)
+    assert changed(1.0, 1.6, 0.5)
+    assert changed(None, 1.0, 0.5)
+    assert changed('park', 'drive', 0.5)
+    assert changed((1.0, 2.0), (1.0, 2.0, 3.0), 0.5)
+    # Booleans are not numbers, any flip is a change
+    assert changed(True, False, 5)
@@ -0,0 +1,21 @@
+from rivian_python_api.rivian_fleet import FleetPoller
+
+STATE = {'batteryLevel': {'timeStamp': '2023-01-01T00:00:00.000Z', 'value': 80.0}}
+
+
+class FakeRivian:
+    rate_limiter = None
+
+    def get_vehicle_state(self, vehicle_id, minimal=True, fields=None):
+        return {'data': {'vehicleState': STATE}}
+
+
+def test_equal_targets_are_diffed_apart():
+    rivian = FakeRivian()
+    poller = FleetPoller([(rivian, 'vehicle', 60), (rivian, 'vehicle', 60)], diff=True)
+    with poller:
+        results = [poller.results.get(timeout=5) for _ in range(2)]
+    # Each target reports the state it saw first, the other target's poll doesn't hide it
+    for result in results:
+        assert result.error is None
+        assert [change.field for change in result.changes] == ['batteryLevel']
@@ -0,0 +1,118 @@
+import pytest
+
+from rivian_python_api.rivian_limit import RateLimiter
+from tests.helpers import FakeClock
+
+
+def limiter(clock, **settings):
+    settings = dict(dict(rate=2, burst=4, min_rate=0.25, backoff=0.5, cooldown=10, recovery=30), **settings)
+    return RateLimiter(clock=clock, sleep=clock.sleep, **settings)
+
+
+def test_burst_then_one_token_per_interval():
+    clock = FakeClock()
+    rate_limiter = limiter(clock)
+    assert [rate_limiter.reserve() for _ in range(4)] == [0, 0, 0, 0]
+    # Waiting requests are handed tokens in order
+    assert [rate_limiter.reserve() for _ in range(3)] == [0.5, 1.0, 1.5]
+    assert rate_limiter.acquire() == 2.0
+    assert clock.sleeps == [2.0]
+
+
+def test_refill_is_capped_at_burst():
+    clock = FakeClock()
+    rate_limiter = limiter(clock)
+    for _ in range(4):
+        rate_limiter.reserve()
+    assert rate_limiter.headroom() == 0
+    assert rate_limiter.wait_time() == 0.5
+    clock.advance(1)
+    assert rate_limiter.headroom() == 2
+    assert rate_limiter.wait_time() == 0
+    clock.advance(60)
+    assert rate_limiter.headroom() == 4
+    clock.advance(0.25)
+    rate_limiter.reserve()
+    assert rate_limiter.status().tokens == 3
+
+
+def test_rate_limited_halves_the_rate_and_pauses():
+    clock = FakeClock()
+    rate_limiter = limiter(clock)
+    rate_limiter.limited()
+    assert rate_limiter.rate == 1
+    assert rate_limiter.rate_limited == 1
+    # Nothing goes out during the cooldown, tokens left before it are gone
+    assert rate_limiter.headroom() == 0
+    assert rate_limiter.wait_time() == 11
+    assert rate_limiter.reserve() == 11
+    assert rate_limiter.reserve() == 12
+    clock.advance(12)
+    assert rate_limiter.wait_time() == 1
+    assert rate_limiter.status().wait == 1
+
+
+def test_rate_never_drops_below_min_rate():
+    clock = FakeClock()
+    rate_limiter = limiter(clock)
+    rates = []
+    for _ in range(5):
+        rate_limiter.limited()
+        rates.append(rate_limiter.rate)
+    assert rates == [1, 0.5, 0.25, 0.25, 0.25]
+    assert rate_limiter.status().rate_limited == 5
+
+
+def test_recovers_a_step_per_quiet_period():
+    clock = FakeClock()
+    rate_limiter = limiter(clock)
+    rate_limiter.limited()
+    rate_limiter.limited()
+    assert rate_limiter.rate == 0.5
+    clock.advance(29)
+    rate_limiter.wait_time()
+    assert rate_limiter.rate == 0.5
+    clock.advance(1)
+    rate_limiter.wait_time()
+    assert rate_limiter.rate == 1
+    clock.advance(29)
+    rate_limiter.wait_time()
+    assert rate_limiter.rate == 1
+    clock.advance(1)
+    rate_limiter.wait_time()
+    assert rate_limiter.rate == 2
+    clock.advance(300)
+    assert rate_limiter.status().rate == 2
+
+
+def test_recovery_counts_periods_nobody_asked_in():
+    clock = FakeClock()
+    rate_limiter = limiter(clock)
+    for _ in range(3):
+        rate_limiter.limited()
+    assert rate_limiter.rate == 0.25
+    # Two periods and a bit: two steps, the next one a period after the second
+    clock.advance(65)
+    rate_limiter.wait_time()
+    assert rate_limiter.rate == 1
+    clock.advance(25)
+    rate_limiter.wait_time()
+    assert rate_limiter.rate == 2
+
+
+def test_another_rate_limit_restarts_recovery():
+    clock = FakeClock()
+    rate_limiter = limiter(clock)
+    rate_limiter.limited()
+    clock.advance(20)
+    rate_limiter.limited()
+    clock.advance(20)
+    rate_limiter.wait_time()
+    assert rate_limiter.rate == 0.5
+    clock.advance(10)
+    rate_limiter.wait_time()
+    assert rate_limiter.rate == 1
+
+
+def test_min_rate_above_rate():
+    assert limiter(FakeClock(), rate=0.1).min_rate == pytest.approx(0.1)
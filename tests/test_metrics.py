@@ -0,0 +1,84 @@
+import requests
+
+from rivian_python_api.rivian_api import Rivian
+from rivian_python_api.rivian_metrics import Metrics, OperationMetrics, error_codes
+from rivian_python_api.rivian_stub import StubTransport
+
+
+def test_histogram_buckets():
+    metrics = OperationMetrics((0.1, 0.5, 1))
+    # A latency on a bound counts in its bucket (le), above the largest in +Inf
+    for latency in (0.05, 0.1, 0.3, 1, 7):
+        metrics.observe(latency, 10, 100, 200, ())
+    assert metrics.to_dict()['latency_buckets'] == {0.1: 2, 0.5: 1, 1: 1, float('inf'): 1}
+    assert metrics.count == 5
+    assert metrics.request_bytes == 50
+    assert metrics.response_bytes == 500
+
+
+def test_statuses_and_error_codes():
+    metrics = Metrics(buckets=(1,))
+    metrics.observe('GetVehicleState', 'gateway', 0.1, 1, 1, 200, ['RATE_LIMIT'])
+    metrics.observe('GetVehicleState', 'gateway', 0.1, 1, 1, 200, ['RATE_LIMIT', 'UNKNOWN'])
+    metrics.observe(None, 'gateway', 0.1, 1, 1, 500)
+    snapshot = metrics.snapshot()
+    assert snapshot[('GetVehicleState', 'gateway')]['statuses'] == {200: 2}
+    assert snapshot[('GetVehicleState', 'gateway')]['errors'] == {'RATE_LIMIT': 2, 'UNKNOWN': 1}
+    assert snapshot[('unknown', 'gateway')]['statuses'] == {500: 1}
+    metrics.reset()
+    assert metrics.snapshot() == {}
+
+
+def test_error_codes():
+    assert error_codes(b'{"data": {}}') == []
+    assert error_codes(b'{"errors": [{"extensions": {"code": "RATE_LIMIT"}}, {"message": "x"}]}') == \
+        ['RATE_LIMIT', 'UNKNOWN']
+    assert error_codes(b'"errors" but not json') == []
+
+
+def test_prometheus_text():
+    metrics = Metrics(buckets=(0.5, 0.1))
+    metrics.observe('Get"State\\', 'gate\nway', 0.05, 7, 70, 200)
+    metrics.observe('Get"State\\', 'gate\nway', 0.2, 3, 30, 200, ['RATE_LIMIT'])
+    metrics.observe('Get"State\\', 'gate\nway', 2, 1, 10, 503)
+    lines = metrics.prometheus().splitlines()
+    labels = 'operation="Get\\"State\\\\",endpoint="gate\\nway"'
+    # Buckets sorted and cumulative, +Inf equals the count
+    assert [line for line in lines if '_bucket' in line] == [
+        f'rivian_graphql_request_duration_seconds_bucket{{{labels},le="0.1"}} 1',
+        f'rivian_graphql_request_duration_seconds_bucket{{{labels},le="0.5"}} 2',
+        f'rivian_graphql_request_duration_seconds_bucket{{{labels},le="+Inf"}} 3',
+    ]
+    assert f'rivian_graphql_request_duration_seconds_sum{{{labels}}} 2.25' in lines
+    assert f'rivian_graphql_request_duration_seconds_count{{{labels}}} 3' in lines
+    assert f'rivian_graphql_request_bytes_total{{{labels}}} 11' in lines
+    assert f'rivian_graphql_response_bytes_total{{{labels}}} 110' in lines
+    assert f'rivian_graphql_responses_total{{{labels},status="200"}} 2' in lines
+    assert f'rivian_graphql_responses_total{{{labels},status="503"}} 1' in lines
+    assert f'rivian_graphql_errors_total{{{labels},code="RATE_LIMIT"}} 1' in lines
+    assert '# TYPE rivian_graphql_request_duration_seconds histogram' in lines
+    # One line per sample, escaped newlines don't break the format
+    assert all(line.startswith(('#', 'rivian_graphql_')) for line in lines)
+
+
+def test_clients_record_requests():
+    metrics = Metrics()
+    with Rivian(session=StubTransport(), metrics=metrics) as rivian:
+        rivian.create_csrf_token()
+        rivian.get_vehicle_state('vehicle')
+    operations = {operation: value['count'] for (operation, _), value in metrics.snapshot().items()}
+    assert operations == {'CreateCSRFToken': 1, 'GetVehicleState': 1}
+
+
+def test_served_endpoint():
+    metrics = Metrics()
+    metrics.observe('GetVehicleState', 'gateway', 0.1, 1, 1, 200)
+    server = metrics.serve(port=0)
+    try:
+        response = requests.get(server.url, timeout=5)
+        assert response.status_code == 200
+        assert response.headers['Content-Type'].startswith('text/plain; version=0.0.4')
+        assert response.text == metrics.prometheus()
+        assert requests.get(server.url.replace('/metrics', '/other'), timeout=5).status_code == 404
+    finally:
+        server.stop()
@@ -0,0 +1,58 @@
+import requests
+
+from rivian_python_api import rivian_queries as queries
+from rivian_python_api.rivian_api import Rivian
+from rivian_python_api.rivian_stub import StubServer
+
+
+def response(status_code, body):
+    result = requests.Response()
+    result.status_code = status_code
+    result._content = body
+    return result
+
+
+def test_miss_resends_the_document_once():
+    with StubServer() as stub, Rivian(base_url=stub.base_url, persisted_queries=True) as rivian:
+        rivian.create_csrf_token()
+        requests_before = stub.requests
+        misses_before = stub.persisted_misses
+        first = rivian.get_vehicle_state('vehicle')
+        # Hash only request, PersistedQueryNotFound, then hash and document
+        assert stub.persisted_misses - misses_before == 1
+        assert stub.requests - requests_before == 2
+        second = rivian.get_vehicle_state('vehicle')
+        assert stub.persisted_misses - misses_before == 1
+        assert stub.requests - requests_before == 3
+        assert first == second
+        assert first['data']['vehicleState']['powerState']['value'] == 'sleep'
+
+
+def test_unsupported_endpoint_goes_back_to_documents():
+    with StubServer(persisted_queries=False) as stub, \
+            Rivian(base_url=stub.base_url, persisted_queries=True) as rivian:
+        # Hash only request turned away, then the plain document
+        rivian.create_csrf_token()
+        assert stub.requests == 2
+        assert not rivian.use_persisted_query(queries.get_vehicle_state('vehicle'))
+        # Only this endpoint stopped using hashes
+        assert rivian.use_persisted_query(queries.get_live_session_data('vehicle'))
+        assert rivian.get_vehicle_state('vehicle')['data']['vehicleState']
+        assert stub.requests == 3
+
+
+def test_rejected_hash_only_request_counts_as_unsupported():
+    rivian = Rivian(persisted_queries=True)
+    operation = queries.get_vehicle_state('vehicle')
+    assert rivian.persisted_query_missed(operation, response(400, b'{"errors": [{"message": "Bad Request"}]}'))
+    assert not rivian.use_persisted_query(operation)
+
+
+def test_answered_hash_only_request_is_not_a_miss():
+    rivian = Rivian(persisted_queries=True)
+    operation = queries.get_vehicle_state('vehicle')
+    assert not rivian.persisted_query_missed(operation, response(200, b'{"data": {"vehicleState": {}}}'))
+    # Other errors are the operation's own, not a reason to resend it
+    assert not rivian.persisted_query_missed(
+        operation, response(200, b'{"errors": [{"extensions": {"code": "RATE_LIMIT"}}], "data": null}'))
+    assert rivian.use_persisted_query(operation)
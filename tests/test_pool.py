@@ -0,0 +1,35 @@
+from rivian_python_api.rivian_pool import ClientPool
+from rivian_python_api.rivian_stub import AccountCheckHandler, StubServer, call_accounts
+
+ACCOUNTS = 20
+THREADS = 8
+CALLS = 50
+
+
+def stub():
+    return StubServer(handler=AccountCheckHandler, check_sessions=True)
+
+
+def add_accounts(pool):
+    for i in range(ACCOUNTS):
+        pool.add(i, access_token=f"access-{i}", user_session_token=f"user-session-{i}")
+
+
+def test_accounts_never_see_each_others_tokens():
+    with stub() as server, ClientPool(pool_size=THREADS, base_url=server.base_url) as pool:
+        add_accounts(pool)
+        assert call_accounts(pool, ACCOUNTS, THREADS, CALLS) == []
+        assert server.wrong_account == 0
+        assert server.session_errors == 0
+        assert server.shared_sessions == 0
+        # Every account did its own handshake
+        assert len(server.httpd.sessions) == ACCOUNTS
+
+
+def test_the_check_catches_a_leak():
+    with stub() as server, ClientPool(pool_size=THREADS, base_url=server.base_url) as pool:
+        add_accounts(pool)
+        # Account 1 sends account 0's user session, as a client sharing headers would
+        pool[1].set_tokens("access-0", "", "user-session-0")
+        pool[1].get_vehicle_state("vehicle-1")
+        assert server.wrong_account == 1
@@ -0,0 +1,38 @@
+import pytest
+
+from rivian_python_api import rivian_queries as queries
+
+
+def test_subset_document():
+    assert queries.vehicle_state_query(['powerState', 'gnssLocation', 'batteryLevel.timeStamp']) == (
+        "query GetVehicleState($vehicleID: String!) { vehicleState(id: $vehicleID) { "
+        "gnssLocation { latitude longitude } powerState { value } batteryLevel { timeStamp } } }")
+    # Sub fields merge and follow the catalog order
+    assert queries.vehicle_state_query(['batteryLevel.value', 'batteryLevel.timeStamp']) == \
+        queries.vehicle_state_query(['batteryLevel.timeStamp', 'batteryLevel.value'])
+    assert "batteryLevel { timeStamp value }" in queries.vehicle_state_query(['batteryLevel.value',
+                                                                            'batteryLevel.timeStamp'])
+    assert queries.vehicle_state_query('powerState') == queries.vehicle_state_query(['powerState'])
+
+
+def test_operation_uses_the_subset():
+    operation = queries.get_vehicle_state('vehicle', fields=['powerState'])
+    assert operation.query['query'] == queries.vehicle_state_query(['powerState'])
+    assert operation.query['variables'] == {'vehicleID': 'vehicle'}
+    assert queries.get_vehicle_state('vehicle', minimal=True).query['query'] == queries.GET_VEHICLE_STATE_MINIMAL_QUERY
+    assert queries.get_vehicle_state('vehicle').query['query'] == queries.GET_VEHICLE_STATE_QUERY
+
+
+@pytest.mark.parametrize('fields', [['powerStat'], ['powerState.nope'], ['gnssLocation.value'], []])
+def test_unknown_fields_raise(fields):
+    with pytest.raises(ValueError):
+        queries.vehicle_state_query(fields)
+
+
+def test_equal_field_sets_share_one_document():
+    queries._compile_vehicle_state_query.cache_clear()
+    first = queries.vehicle_state_query(['powerState', 'batteryLevel', 'gnssLocation'])
+    second = queries.vehicle_state_query(['gnssLocation', 'powerState', 'batteryLevel', 'powerState'])
+    assert first is second
+    info = queries._compile_vehicle_state_query.cache_info()
+    assert (info.hits, info.misses) == (1, 1)
@@ -0,0 +1,87 @@
+import base64
+import json
+import time
+from json import dumps
+
+import requests
+
+from rivian_python_api.rivian_api import ACCESS_TOKEN_REFRESH_MARGIN, Rivian
+
+
+def jwt(expires_at):
+    payload = base64.urlsafe_b64encode(json.dumps({"exp": expires_at}).encode()).decode().rstrip('=')
+    return f"header.{payload}.signature"
+
+
+class Session:
+    # Answers RefreshToken with new tokens, other operations with 401 until the session is the refreshed one
+    def __init__(self, refresh_status=200):
+        self.refresh_status = refresh_status
+        self.operations = []
+
+    def post(self, url, json=None, headers=None, timeout=None):
+        operation_name = json.get('operationName')
+        self.operations.append(operation_name)
+        response = requests.Response()
+        if operation_name == 'CreateCSRFToken':
+            response.status_code = 200
+            body = {"data": {"createCsrfToken": {"csrfToken": "csrf-2", "appSessionToken": "app-session-2"}}}
+        elif operation_name == 'RefreshToken':
+            response.status_code = self.refresh_status
+            body = {"data": {"refreshToken": {"accessToken": jwt(time.time() + 3600), "refreshToken": "refresh-2",
+                                              "userSessionToken": "session-2"}}}
+            if self.refresh_status != 200:
+                body = {"errors": [{"message": "failed"}], "data": None}
+        elif headers.get('U-Sess') == 'session-2':
+            response.status_code = 200
+            body = {"data": {"vehicleState": {}}}
+        else:
+            response.status_code = 401
+            body = {"errors": [{"extensions": {"code": "UNAUTHENTICATED"}}], "data": None}
+        response._content = dumps(body).encode()
+        return response
+
+
+def client(session, access_token):
+    rivian = Rivian(session=session)
+    rivian.set_tokens(access_token, "refresh-1", "session-1")
+    rivian._csrf_token = rivian._app_session_token = 'token'
+    rivian._csrf_expires_at = float('inf')
+    return rivian
+
+
+def test_expiring_token_is_refreshed_before_the_request():
+    session = Session()
+    rivian = client(session, jwt(time.time() + ACCESS_TOKEN_REFRESH_MARGIN / 2))
+    assert rivian.get_vehicle_state('vehicle')['data']['vehicleState'] == {}
+    assert session.operations == ['RefreshToken', 'GetVehicleState']
+    assert rivian._refresh_token == 'refresh-2'
+
+
+def test_rejected_session_is_refreshed_once_and_retried():
+    session = Session()
+    rivian = client(session, jwt(time.time() + 3600))
+    assert rivian.get_vehicle_state('vehicle')['data']['vehicleState'] == {}
+    # A fresh handshake first, the session is still turned away, so the access token is refreshed
+    assert session.operations == ['GetVehicleState', 'CreateCSRFToken', 'GetVehicleState', 'RefreshToken',
+                                  'GetVehicleState']
+
+
+def test_refresh_by_someone_else_is_used_without_refreshing_again():
+    session = Session()
+    rivian = client(session, jwt(time.time() + 3600))
+    rivian.set_tokens(jwt(time.time() + 3600), "refresh-2", "session-2")
+    assert rivian.ensure_access_token(rejected="session-1")
+    assert session.operations == []
+
+
+def test_failed_refresh_is_not_tried_again_right_away():
+    session = Session(refresh_status=500)
+    rivian = client(session, jwt(time.time() + 3600))
+    assert not rivian.ensure_access_token(rejected="session-1")
+    assert not rivian.ensure_access_token(rejected="session-1")
+    assert session.operations == ['RefreshToken']
+    # Proactive refreshes wait just as long
+    rivian._access_expires_at = time.time()
+    assert not rivian.ensure_access_token()
+    assert session.operations == ['RefreshToken']
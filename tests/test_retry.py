@@ -0,0 +1,143 @@
+import pytest
+import requests
+from urllib3.exceptions import ProtocolError
+
+from rivian_python_api import rivian_queries as queries
+from rivian_python_api.rivian_api import Rivian
+from rivian_python_api.rivian_retry import NETWORK, SERVER, CircuitBreaker, RetryPolicy, classify_error
+from rivian_python_api.rivian_timeout import DeadlineExceeded
+
+COMMAND = queries.send_vehicle_command('vehicle', 'WAKE_VEHICLE', 'phone', 'device', 'key')
+STATE = queries.get_vehicle_state('vehicle')
+
+
+class FailingSession:
+    # Answers every request with the given exception or status code
+    def __init__(self, failure):
+        self.failure = failure
+        self.requests = 0
+
+    def post(self, url, json=None, headers=None, timeout=None):
+        self.requests += 1
+        if isinstance(self.failure, Exception):
+            raise self.failure
+        response = requests.Response()
+        response.status_code = self.failure
+        response._content = b'{"errors": [{"message": "failed"}]}'
+        return response
+
+
+def policy():
+    return RetryPolicy(max_attempts=3, sleep=lambda seconds: None)
+
+
+def client(session):
+    rivian = Rivian(session=session, retry_policy=policy(), circuit_breaker=CircuitBreaker(failure_threshold=100))
+    # Handshake done, requests go straight out
+    rivian._csrf_token = rivian._app_session_token = 'token'
+    rivian._csrf_expires_at = float('inf')
+    return rivian
+
+
+LOST_RESPONSE = requests.ConnectionError(ProtocolError('Connection aborted.', ConnectionResetError()))
+
+
+@pytest.mark.parametrize('failure', [500, LOST_RESPONSE, requests.ReadTimeout()])
+def test_queries_are_retried(failure):
+    session = FailingSession(failure)
+    try:
+        client(session).send_operation(STATE)
+    except requests.RequestException:
+        pass
+    assert session.requests == 3
+
+
+@pytest.mark.parametrize('failure', [500, LOST_RESPONSE, requests.ReadTimeout()])
+def test_mutations_that_may_have_been_sent_are_not_retried(failure):
+    session = FailingSession(failure)
+    try:
+        client(session).send_operation(COMMAND)
+    except requests.RequestException:
+        pass
+    assert session.requests == 1
+
+
+@pytest.mark.parametrize('persisted_queries', [False, True])
+def test_mutations_are_retried_when_no_connection_was_made(persisted_queries):
+    # Nothing listens on port 1
+    rivian = Rivian(base_url='http://127.0.0.1:1/api/gql', retry_policy=policy(),
+                    persisted_queries=persisted_queries)
+    rivian._csrf_token = rivian._app_session_token = 'token'
+    rivian._csrf_expires_at = float('inf')
+    attempts = []
+    send = rivian.send
+    rivian.send = lambda *args: attempts.append(1) or send(*args)
+    with pytest.raises(requests.ConnectionError):
+        rivian.send_operation(COMMAND)
+    assert len(attempts) == 3
+
+
+@pytest.mark.parametrize('failure', [500, LOST_RESPONSE, requests.ReadTimeout()])
+def test_handshake_is_retried(failure):
+    # A mutation, but a second handshake only replaces the first
+    session = FailingSession(failure)
+    rivian = Rivian(session=session, retry_policy=policy(), circuit_breaker=CircuitBreaker(failure_threshold=100))
+    try:
+        rivian.create_csrf_token()
+    except Exception:
+        pass
+    assert session.requests == 3
+
+
+def test_repeatable():
+    csrf = queries.create_csrf_token()
+    assert queries.request_type(csrf.query) == 'mutation'
+    assert queries.repeatable(csrf.query)
+    assert queries.repeatable(queries.persisted_request(csrf.query)[0])
+    assert queries.repeatable(STATE.query)
+    assert not queries.repeatable(COMMAND.query)
+
+
+def test_request_type():
+    assert queries.request_type(COMMAND.query) == 'mutation'
+    assert queries.request_type(STATE.query) == 'query'
+    # Hash only requests are known by their hash
+    assert queries.request_type(queries.persisted_request(COMMAND.query)[0]) == 'mutation'
+    assert queries.request_type(queries.persisted_request(STATE.query)[0]) == 'query'
+    assert queries.request_type({"extensions": {"persistedQuery": {"sha256Hash": "unknown"}}}) == 'mutation'
+
+
+def test_call_retries_network_errors_only():
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise ConnectionResetError()
+        return 'done'
+
+    assert policy().call(flaky) == 'done'
+    assert len(calls) == 3
+
+    for error in (KeyError('csrfToken'), DeadlineExceeded('deadline'), ValueError('bad json')):
+        calls = []
+
+        def broken():
+            calls.append(1)
+            raise error
+
+        with pytest.raises(type(error)):
+            policy().call(broken)
+        assert len(calls) == 1
+
+
+def test_classify_error():
+    assert classify_error(requests.ConnectionError()) == NETWORK
+    assert classify_error(TimeoutError()) == NETWORK
+    assert classify_error(DeadlineExceeded()) is None
+    assert classify_error(TypeError()) is None
+
+
+def test_call_classifies_results():
+    results = iter([500, 500, 200])
+    assert policy().call(lambda: next(results), lambda result: SERVER if result >= 500 else None) == 200
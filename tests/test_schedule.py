@@ -0,0 +1,70 @@
+from rivian_python_api.rivian_schedule import AdaptivePolicy, FixedPolicy, PollScheduler
+from tests.helpers import FakeClock
+
+
+def state(**values):
+    return {field: {'timeStamp': '2023-01-01T00:00:00.000Z', 'value': value} for field, value in values.items()}
+
+
+def test_adaptive_policy_follows_vehicle_state():
+    policy = AdaptivePolicy(fast=10, normal=30, sleep=60, sleep_max=300, backoff=2, error=45)
+    assert policy.next_interval(state(powerState='go'), None) == 10
+    assert policy.next_interval(state(powerState='ready', gearStatus='drive'), None) == 10
+    assert policy.next_interval(state(powerState='ready', chargerState='charging_active'), None) == 10
+    assert policy.next_interval(state(powerState='ready', gearStatus='park'), None) == 30
+    assert policy.next_interval(None, 10) == 45
+
+
+def test_adaptive_policy_backs_off_while_asleep():
+    policy = AdaptivePolicy(sleep=60, sleep_max=300, backoff=2)
+    asleep = state(powerState='sleep')
+    intervals = []
+    interval = None
+    for _ in range(5):
+        interval = policy.next_interval(asleep, interval)
+        intervals.append(interval)
+    assert intervals == [60, 120, 240, 300, 300]
+    # Waking up goes back to the fast interval right away
+    assert policy.next_interval(state(powerState='go'), interval) == policy.fast
+
+
+def test_scheduler_does_not_drift_with_latency():
+    clock = FakeClock()
+    scheduler = PollScheduler(FixedPolicy(30), clock=clock, sleep=clock.sleep)
+    start = scheduler.next_due('vehicle', None) - 30
+    scheduler.wait(start + 30)
+    for poll in range(2, 5):
+        # Each poll takes 2 seconds, the next one is still due on the 30 second grid
+        clock.now += 2
+        due = scheduler.next_due('vehicle', None)
+        assert due == start + 30 * poll
+        scheduler.wait(due)
+        assert clock.now == due
+    assert clock.sleeps == [30, 28, 28, 28]
+
+
+def test_scheduler_polls_now_after_an_overrun():
+    clock = FakeClock()
+    scheduler = PollScheduler(FixedPolicy(30), clock=clock, sleep=clock.sleep)
+    assert scheduler.next_due('vehicle', None) == clock.now + 30
+    clock.now += 100
+    assert scheduler.next_due('vehicle', None) == clock.now
+    scheduler.wait(clock.now)
+    assert clock.sleeps == []
+
+
+def test_scheduler_keeps_intervals_per_key():
+    clock = FakeClock()
+    scheduler = PollScheduler(AdaptivePolicy(sleep=60, sleep_max=300), clock=clock, sleep=clock.sleep)
+    asleep = state(powerState='sleep')
+    assert scheduler.next_due('a', asleep) == clock.now + 60
+    assert scheduler.next_due('a', asleep) == clock.now + 60 + 120
+    assert scheduler.next_due('b', asleep) == clock.now + 60
+
+
+def test_scheduler_delay_pushes_the_next_poll_back():
+    clock = FakeClock()
+    scheduler = PollScheduler(FixedPolicy(30), clock=clock, sleep=clock.sleep)
+    scheduler.next_due('vehicle', None)
+    assert scheduler.delay('vehicle', 600) == clock.now + 600
+    assert scheduler.next_due('vehicle', None) == clock.now + 630
@@ -0,0 +1,84 @@
+import io
+import os
+import sys
+import threading
+
+import pytest
+
+# rivian_cli is a script importing its siblings as top level modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'rivian_python_api'))
+import rivian_cli  # noqa: E402
+
+TIMEOUT = 5
+
+
+def printing(text, wait_for=None, then=None, result=None):
+    def section(args, ctx):
+        if wait_for:
+            assert wait_for.wait(TIMEOUT)
+        print(text)
+        if then:
+            then.set()
+        return result
+    return section
+
+
+def failing(wait_for=None):
+    def section(args, ctx):
+        if wait_for:
+            assert wait_for.wait(TIMEOUT)
+        raise RuntimeError("section failed")
+    return section
+
+
+def run(monkeypatch, sections, workers=4):
+    stdout = io.StringIO()
+    monkeypatch.setattr(sys, 'stdout', stdout)
+    monkeypatch.setattr(rivian_cli, 'SECTIONS', sections)
+    return rivian_cli.run_sections(None, {}, workers), stdout.getvalue()
+
+
+def test_output_in_declaration_order(monkeypatch):
+    # Each section only finishes after the one declared after it
+    c_done, b_done = threading.Event(), threading.Event()
+    sections = [
+        ('a', printing('a', wait_for=b_done), []),
+        ('b', printing('b', wait_for=c_done, then=b_done), []),
+        ('c', printing('c', then=c_done), []),
+        ('d', printing('d'), ['a']),
+    ]
+    assert run(monkeypatch, sections) == (None, 'a\nb\nc\nd\n')
+
+
+def test_exit_code_stops_later_sections(monkeypatch):
+    b_done = threading.Event()
+    sections = [
+        ('a', printing('a', wait_for=b_done, result=2), []),
+        ('b', printing('b', then=b_done), []),
+        ('c', printing('c'), ['a']),
+    ]
+    # b already ran but isn't shown, c never starts
+    assert run(monkeypatch, sections) == (2, 'a\n')
+
+
+def test_failing_dependency(monkeypatch):
+    b_done = threading.Event()
+    ran = []
+    sections = [
+        ('a', printing('a'), []),
+        ('b', failing(wait_for=b_done), []),
+        ('c', printing('c', then=b_done), []),
+        ('d', lambda args, ctx: ran.append('d'), ['b']),
+    ]
+    stdout = io.StringIO()
+    monkeypatch.setattr(sys, 'stdout', stdout)
+    monkeypatch.setattr(rivian_cli, 'SECTIONS', sections)
+    with pytest.raises(RuntimeError, match="section failed"):
+        rivian_cli.run_sections(None, {}, 4)
+    assert stdout.getvalue() == 'a\n'
+    assert ran == []
+
+
+def test_single_worker(monkeypatch):
+    sections = [(name, printing(name), []) for name in 'abc']
+    assert run(monkeypatch, sections, workers=1) == (None, 'a\nb\nc\n')
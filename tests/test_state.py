@@ -0,0 +1,93 @@
+import json
+import sys
+
+import pytest
+
+from rivian_python_api.rivian_state import VehicleState
+
+
+def body(state, errors=None):
+    response = {"data": {"vehicleState": state}}
+    if errors:
+        response["errors"] = errors
+    return json.dumps(response).encode()
+
+
+STATE = {
+    "__typename": "VehicleState",
+    "powerState": {"__typename": "TimeStamped", "timeStamp": "2023-04-18T12:00:00.000Z", "value": "sleep"},
+    "batteryLevel": {"timeStamp": "2023-04-18T12:00:00.000Z", "value": 80.5},
+    "gnssLocation": {"latitude": 42.0, "longitude": -71.0, "timeStamp": "2023-04-18T12:00:00.000Z"},
+    "gnssError": {"positionVertical": 1, "positionHorizontal": 2, "speed": None, "bearing": 4},
+    "cloudConnection": {"lastSync": "2023-04-18T12:00:00.000Z"},
+    "chargerState": None,
+    "notAField": {"value": 1},
+}
+
+
+def test_decodes_on_first_access_only():
+    state = VehicleState(body(STATE))
+    assert not state.decoded
+    assert repr(state).startswith('VehicleState(<')
+    assert state.batteryLevel == 80.5
+    assert state.decoded
+    # The bytes aren't kept once decoded
+    assert state._raw is None
+    assert state.powerState == 'sleep'
+
+
+def test_compound_fields_are_namedtuples():
+    state = VehicleState(body(STATE))
+    assert state.gnssLocation.latitude == 42.0
+    assert state.gnssLocation == (42.0, -71.0)
+    assert state.gnssError._fields == ('positionVertical', 'positionHorizontal', 'speed', 'bearing')
+    assert state.gnssError.speed is None
+    assert state.to_dict()['gnssLocation'] == {'latitude': 42.0, 'longitude': -71.0}
+    # One sub field besides timeStamp: its value
+    assert state.cloudConnection == "2023-04-18T12:00:00.000Z"
+
+
+def test_missing_and_null_fields_are_none():
+    state = VehicleState(body(STATE))
+    assert state.chargerState is None
+    assert state.gearStatus is None
+    assert 'chargerState' not in state.to_dict()
+    assert state.ok
+    assert state.errors is None
+    with pytest.raises(AttributeError):
+        state.notAField
+
+
+def test_strings_are_interned():
+    first, second = VehicleState(body(STATE)), VehicleState(body(STATE))
+    assert first.powerState is second.powerState is sys.intern('sleep')
+
+
+def test_malformed_body():
+    state = VehicleState(b'{"data": ')
+    assert not state.ok
+    assert len(state.errors) == 1
+    assert state.batteryLevel is None
+
+
+def test_no_state():
+    errors = [{"message": "Rate limited", "extensions": {"code": "RATE_LIMIT"}}]
+    state = VehicleState(body(None, errors))
+    assert not state.ok
+    assert state.errors == errors
+    assert VehicleState(json.dumps({"data": {}}).encode()).errors == ['No vehicle state returned']
+
+
+def test_partial_errors_keep_the_state():
+    errors = [{"message": "Field failed", "path": ["vehicleState", "gnssLocation"]}]
+    state = VehicleState(body(STATE, errors))
+    assert state.ok
+    assert state.errors == errors
+    assert state.batteryLevel == 80.5
+
+
+def test_from_response_takes_the_body():
+    class Response:
+        content = body(STATE)
+
+    assert VehicleState.from_response(Response).powerState == 'sleep'
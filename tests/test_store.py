@@ -0,0 +1,122 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from rivian_python_api.rivian_store import CHARGING_TABLE, TimeSeriesStore
+
+STATE = {
+    "batteryLevel": {"timeStamp": "2023-04-18T12:00:00.000Z", "value": 80.5},
+    "gnssLocation": {"latitude": 42.0, "longitude": -71.0, "timeStamp": "2023-04-18T12:00:00.000Z"},
+}
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'rivian.db')
+
+
+def test_writes_full_batches_without_waiting_for_the_interval(path):
+    with TimeSeriesStore(path, batch_size=3, flush_interval=60) as store:
+        for ts in range(5):
+            store.add_state('vehicle', STATE, ts)
+        wait_for(lambda: store.written == 3)
+        time.sleep(0.1)
+        # The rest waits for the interval, a flush or close
+        assert store.written == 3
+        assert store.flush()
+        assert store.written == 5
+
+
+def test_writes_after_the_interval(path):
+    with TimeSeriesStore(path, batch_size=100, flush_interval=0.05) as store:
+        store.add_state('vehicle', STATE, 1)
+        wait_for(lambda: store.written == 1)
+
+
+def test_range_queries(path):
+    with TimeSeriesStore(path) as store:
+        for ts in range(10):
+            store.add_state('vehicle', dict(STATE, batteryLevel={"value": ts}), ts)
+        store.add_state('other', STATE, 5)
+        store.add_charging_history('vehicle', [{"time": "2023-04-18T12:00:00.000Z", "kw": 100},
+                                               {"time": "2023-04-18T12:00:30.5Z", "kw": 90}])
+        # Fetched whole again, the points aren't stored twice
+        store.add_charging_history('vehicle', [{"time": "2023-04-18T12:00:00.000Z", "kw": 100},
+                                               {"time": "2023-04-18T12:01:00.25Z", "kw": 80}])
+        store.flush()
+        rows = store.states('vehicle', start=3, end=6, columns=['batteryLevel', 'gnssLocation_latitude'])
+        assert rows == [{'ts': ts, 'batteryLevel': ts, 'gnssLocation_latitude': 42.0} for ts in (3.0, 4.0, 5.0)]
+        assert len(store.states('vehicle')) == 10
+        assert store.states('vehicle', start=20) == []
+        with pytest.raises(ValueError):
+            store.states('vehicle', columns=['nope'])
+        history = store.charging_history('vehicle', start="2023-04-18T12:00:10Z")
+        assert [row['kw'] for row in history] == [90, 80]
+        assert history[0]['ts'] == 1681819230.5
+        assert [row['kw'] for row in store.charging_history('vehicle')] == [100, 90, 80]
+
+
+def test_drops_rows_when_the_queue_is_full(path):
+    store = TimeSeriesStore(path, batch_size=1, max_queue=2)
+    writing = threading.Event()
+    release = threading.Event()
+    write = store._write
+
+    def slow_write(*args):
+        writing.set()
+        release.wait()
+        return write(*args)
+
+    store._write = slow_write
+    try:
+        assert store.add_state('vehicle', STATE, 1)
+        # The writer holds the first row, two more fit the queue
+        writing.wait(5)
+        assert store.add_state('vehicle', STATE, 2)
+        assert store.add_state('vehicle', STATE, 3)
+        assert not store.add_state('vehicle', STATE, 4)
+        assert not store.add_state('vehicle', STATE, 5)
+        assert store.dropped == 2
+    finally:
+        release.set()
+        store.close()
+    assert [row['ts'] for row in store.states('vehicle', columns=['batteryLevel'])] == [1.0, 2.0, 3.0]
+
+
+def test_write_errors_drop_the_batch_and_keep_the_writer(path, caplog):
+    with TimeSeriesStore(path) as store:
+        connection = sqlite3.connect(path)
+        with connection:
+            connection.execute(f"DROP TABLE {CHARGING_TABLE}")
+        store.add_charging_history('vehicle', [{"time": 1, "kw": 100}, {"time": 2, "kw": 90}])
+        assert store.flush(5)
+        assert store.dropped == 2
+        assert 'failed' in caplog.text
+        store.add_state('vehicle', STATE, 1)
+        assert store.flush(5)
+        assert store.written == 1
+        connection.close()
+
+
+def test_flush_and_close_notice_a_dead_writer(path, caplog):
+    store = TimeSeriesStore(path)
+
+    def broken_write(*args):
+        raise RuntimeError("broken")
+
+    store._write = broken_write
+    store.add_state('vehicle', STATE, 1)
+    assert not store.flush(timeout=None)
+    assert 'stopped' in caplog.text
+    assert not store.add_state('vehicle', STATE, 2)
+    assert store.dropped == 1
+    store.close()
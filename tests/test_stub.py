@@ -0,0 +1,87 @@
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from rivian_python_api.rivian_api import Rivian
+from rivian_python_api.rivian_async import AsyncRivian
+from rivian_python_api.rivian_stub import SCRUBBED, Recorder, StubServer, StubTransport, scrub
+
+
+def response(payload, status_code=200):
+    result = requests.Response()
+    result.status_code = status_code
+    result._content = json.dumps(payload).encode()
+    return result
+
+
+USER = {"data": {"user": {
+    "__typename": "User",
+    "email": {"email": "ada@example.com"},
+    "phone": {"formatted": "+1 555 0100"},
+    "firstName": "Ada",
+    "addresses": [{"id": "a1", "city": "Boston", "postalCode": "02101"}],
+    "newsletterSubscription": True,
+    "vehicles": [{"id": "v1", "highestPriorityRole": "owner"}],
+}}}
+
+
+def test_scrub_replaces_personal_fields_and_keeps_the_shape():
+    user = scrub(USER)["data"]["user"]
+    assert user["__typename"] == "User"
+    assert user["email"] == {"email": SCRUBBED}
+    assert user["phone"] == {"formatted": SCRUBBED}
+    assert user["firstName"] == SCRUBBED
+    assert user["addresses"] == [{"id": SCRUBBED, "city": SCRUBBED, "postalCode": SCRUBBED}]
+    assert user["newsletterSubscription"] is True
+    assert user["vehicles"] == [{"id": "v1", "highestPriorityRole": "owner"}]
+
+
+def test_scrub_zeroes_locations():
+    state = {"gnssLocation": {"latitude": 42.0772, "longitude": -71.6303}, "batteryLevel": {"value": 80.5}}
+    assert scrub(state) == {"gnssLocation": {"latitude": 0, "longitude": 0}, "batteryLevel": {"value": 80.5}}
+
+
+def test_recorder_skips_token_responses_and_scrubs_the_rest(tmp_path):
+    path = tmp_path / "responses.json"
+    recorder = Recorder(str(path))
+    recorder.record("CreateCSRFToken", response(
+        {"data": {"createCsrfToken": {"csrfToken": "secret", "appSessionToken": "secret"}}}))
+    recorder.record("Login", response({"data": {"login": {"accessToken": "secret"}}}))
+    recorder.record("RefreshToken", response({"data": {"refreshToken": {"refreshToken": "secret"}}}))
+    recorder.record("user", response(USER))
+    recorder.record("paymentMethods", response(
+        {"data": {"paymentMethods": [{"id": "p1", "card": {"lastFour": "4242", "brand": "visa"}}]}}))
+    text = path.read_text()
+    assert "secret" not in text
+    assert "ada@example.com" not in text
+    assert "4242" not in text
+    assert sorted(json.loads(text)) == ["paymentMethods", "user"]
+
+
+def test_recorder_attaches_to_both_clients(tmp_path):
+    with StubServer() as server:
+        sync_path, async_path = tmp_path / "sync.json", tmp_path / "async.json"
+        with Recorder(str(sync_path)).attach(Rivian(base_url=server.base_url)) as rivian:
+            rivian.get_vehicle_state('vehicle')
+
+        async def run():
+            async with Recorder(str(async_path)).attach(AsyncRivian(base_url=server.base_url)) as rivian:
+                await rivian.get_vehicle_state('vehicle')
+
+        asyncio.run(run())
+        assert sorted(json.loads(sync_path.read_text())) == ["GetVehicleState"]
+        assert json.loads(async_path.read_text()) == json.loads(sync_path.read_text())
+
+
+def test_counters_under_concurrent_requests():
+    transport = StubTransport()
+    with StubServer() as server, ThreadPoolExecutor(max_workers=8) as executor:
+        def post(i):
+            transport.post(server.base_url)
+            return requests.post(server.base_url, json={"operationName": "GetVehicleState"}, timeout=5).status_code
+
+        assert set(executor.map(post, range(200))) == {200}
+        assert server.requests == 200
+        assert transport.requests == 200
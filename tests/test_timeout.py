@@ -0,0 +1,76 @@
+import threading
+import time
+
+import pytest
+
+from rivian_python_api import rivian_queries as queries
+from rivian_python_api.rivian_api import Rivian, create_session
+from rivian_python_api.rivian_retry import RetryPolicy
+from rivian_python_api.rivian_stub import StubServer
+from rivian_python_api.rivian_timeout import Cancelled, Deadline, DeadlineExceeded
+
+
+def client(stub, **options):
+    rivian = Rivian(base_url=stub.base_url, **options)
+    rivian.create_csrf_token()
+    return rivian
+
+
+def cancel_later(deadline, seconds):
+    timer = threading.Timer(seconds, deadline.cancel)
+    timer.start()
+    return timer
+
+
+@pytest.mark.parametrize('operation', [queries.get_vehicle_state('vehicle'),
+                                       queries.send_vehicle_command('vehicle', 'WAKE_VEHICLE', 'p', 'd', 'k')])
+def test_cancel_aborts_a_request_in_flight(operation):
+    with StubServer() as stub, client(stub, retry_policy=RetryPolicy()) as rivian:
+        stub.latency = 5
+        started = time.monotonic()
+        with Deadline(None) as deadline:
+            cancel_later(deadline, 0.2)
+            with pytest.raises(Cancelled):
+                rivian.execute(operation)
+        assert time.monotonic() - started < 2
+
+
+def test_connections_outlive_their_deadline():
+    with StubServer() as stub, client(stub) as rivian:
+        with Deadline(None) as deadline:
+            rivian.get_vehicle_state('vehicle')
+        # A later cancel leaves the pooled connection alone
+        deadline.cancel()
+        requests_before = stub.requests
+        assert rivian.get_vehicle_state('vehicle')['data']['vehicleState']
+        assert stub.requests == requests_before + 1
+
+
+def test_cancel_leaves_other_requests_on_a_shared_session_alone():
+    with StubServer(latency=0.5) as stub:
+        session = create_session(base_path=stub.base_url)
+        cancelled, other = client(stub, session=session), client(stub, session=session)
+        results = {}
+
+        def poll():
+            results['other'] = other.get_vehicle_state('vehicle')
+
+        thread = threading.Thread(target=poll)
+        thread.start()
+        with Deadline(None) as deadline:
+            cancel_later(deadline, 0.2)
+            with pytest.raises(Cancelled):
+                cancelled.get_vehicle_state('vehicle')
+        thread.join()
+        assert results['other']['data']['vehicleState']
+        session.close()
+
+
+def test_deadline_bounds_a_slow_request():
+    with StubServer() as stub, client(stub) as rivian:
+        stub.latency = 5
+        started = time.monotonic()
+        with pytest.raises(DeadlineExceeded):
+            with Deadline(0.3):
+                rivian.get_vehicle_state('vehicle')
+        assert time.monotonic() - started < 2